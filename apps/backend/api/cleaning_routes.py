@@ -42,7 +42,7 @@ cleaning_status = {
 
 
 @router.post("/clean", response_model=CleanResponse)
-async def clean_data(
+def clean_data(
     request: CleanRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -85,7 +85,7 @@ async def clean_data(
 
 
 @router.get("/status")
-async def get_cleaning_status():
+def get_cleaning_status():
     """
     Get current cleaning status
     """
@@ -93,7 +93,7 @@ async def get_cleaning_status():
 
 
 @router.get("/stats")
-async def get_cleaning_stats(db: Session = Depends(get_db)):
+def get_cleaning_stats(db: Session = Depends(get_db)):
     """
     Get cleaning statistics
     """
@@ -163,7 +163,7 @@ async def get_cleaning_stats(db: Session = Depends(get_db)):
 
 
 @router.post("/validate")
-async def validate_cleaning_results(
+def validate_cleaning_results(
     sample_size: int = 10,
     db: Session = Depends(get_db)
 ):
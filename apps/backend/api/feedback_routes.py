@@ -22,7 +22,7 @@ router = APIRouter(prefix="/api/feedback", tags=["feedback"])
 
 
 @router.post("/validate", response_model=FeedbackOut, status_code=status.HTTP_201_CREATED)
-async def validate_issue(
+def validate_issue(
     request: UserValidationRequest,
     db: Session = Depends(get_db)
 ):
@@ -100,7 +100,7 @@ async def validate_issue(
 
 
 @router.post("/expert-review", response_model=FeedbackOut, status_code=status.HTTP_201_CREATED)
-async def expert_review(
+def expert_review(
     request: ExpertReviewRequest,
     db: Session = Depends(get_db)
 ):
@@ -179,7 +179,7 @@ async def expert_review(
 
 
 @router.post("/resolution", response_model=FeedbackOut, status_code=status.HTTP_201_CREATED)
-async def track_resolution(
+def track_resolution(
     request: ResolutionTrackingRequest,
     db: Session = Depends(get_db)
 ):
@@ -256,7 +256,7 @@ async def track_resolution(
 
 
 @router.get("", response_model=List[FeedbackOut])
-async def get_feedbacks(
+def get_feedbacks(
     issue_id: Optional[int] = None,
     feedback_type: Optional[str] = None,
     limit: int = 100,
@@ -285,7 +285,7 @@ async def get_feedbacks(
 
 
 @router.get("/stats", response_model=dict)
-async def get_feedback_stats(
+def get_feedback_stats(
     db: Session = Depends(get_db)
 ):
     """
@@ -326,7 +326,7 @@ async def get_feedback_stats(
 
 
 @router.get("/{issue_id}", response_model=List[FeedbackOut])
-async def get_issue_feedbacks(
+def get_issue_feedbacks(
     issue_id: int,
     db: Session = Depends(get_db)
 ):
@@ -2,11 +2,11 @@
 API routes for managing detected issues
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from database.connection import get_db
-from services.issue_service import IssueService
+from database.connection import get_async_db
+from services.issue_service import AsyncIssueService
 from schemas.issue import IssueCreate, IssueOut, IssueUpdate
 
 router = APIRouter(prefix="/api/issues", tags=["issues"])
@@ -15,14 +15,14 @@ router = APIRouter(prefix="/api/issues", tags=["issues"])
 @router.post("", response_model=IssueOut, status_code=status.HTTP_201_CREATED)
 async def create_issue(
     issue_data: IssueCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new issue record from detected problem
     """
     try:
-        issue_service = IssueService(db)
-        issue = issue_service.create_issue(issue_data)
+        issue_service = AsyncIssueService(db)
+        issue = await issue_service.create_issue(issue_data)
         return issue
     except Exception as e:
         raise HTTPException(
@@ -37,15 +37,15 @@ async def get_issues(
     severity: Optional[str] = None,
     location: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all issues with optional filters
     """
     try:
-        issue_service = IssueService(db)
+        issue_service = AsyncIssueService(db)
         severity_enum = severity if severity in ["low", "medium", "high"] else None
-        issues = issue_service.get_all_issues(
+        issues = await issue_service.get_all_issues(
             limit=limit,
             resolved=resolved,
             severity=severity_enum,
@@ -67,14 +67,14 @@ async def get_issues(
 @router.get("/{issue_id}", response_model=IssueOut)
 async def get_issue(
     issue_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get a specific issue by ID
     """
     try:
-        issue_service = IssueService(db)
-        issue = issue_service.get_issue(issue_id)
+        issue_service = AsyncIssueService(db)
+        issue = await issue_service.get_issue(issue_id)
         if not issue:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -94,14 +94,14 @@ async def get_issue(
 async def update_issue(
     issue_id: int,
     update_data: IssueUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update an issue (e.g., mark as resolved)
     """
     try:
-        issue_service = IssueService(db)
-        issue = issue_service.update_issue(issue_id, update_data)
+        issue_service = AsyncIssueService(db)
+        issue = await issue_service.update_issue(issue_id, update_data)
         if not issue:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -120,14 +120,14 @@ async def update_issue(
 @router.delete("/{issue_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_issue(
     issue_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete an issue
     """
     try:
-        issue_service = IssueService(db)
-        success = issue_service.delete_issue(issue_id)
+        issue_service = AsyncIssueService(db)
+        success = await issue_service.delete_issue(issue_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -146,14 +146,14 @@ async def delete_issue(
 async def get_issues_by_component(
     component: str,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get issues for a specific component
     """
     try:
-        issue_service = IssueService(db)
-        issues = issue_service.get_issues_by_component(component, limit)
+        issue_service = AsyncIssueService(db)
+        issues = await issue_service.get_issues_by_component(component, limit)
         return issues
     except Exception as e:
         raise HTTPException(
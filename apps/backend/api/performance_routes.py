@@ -15,7 +15,7 @@ router = APIRouter(prefix="/api/performance", tags=["performance"])
 
 
 @router.get("/detection")
-async def get_detection_performance(
+def get_detection_performance(
     model_version: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
@@ -34,7 +34,7 @@ async def get_detection_performance(
 
 
 @router.get("/severity")
-async def get_severity_performance(
+def get_severity_performance(
     model_version: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
@@ -53,7 +53,7 @@ async def get_severity_performance(
 
 
 @router.get("/recommendation")
-async def get_recommendation_performance(
+def get_recommendation_performance(
     model_version: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
@@ -72,7 +72,7 @@ async def get_recommendation_performance(
 
 
 @router.get("/overall")
-async def get_overall_performance(
+def get_overall_performance(
     db: Session = Depends(get_db)
 ):
     """
@@ -90,7 +90,7 @@ async def get_overall_performance(
 
 
 @router.post("/ab-test/start")
-async def start_ab_test(
+def start_ab_test(
     model_type: str,
     version_a_id: int,
     version_b_id: int,
@@ -112,7 +112,7 @@ async def start_ab_test(
 
 
 @router.post("/ab-test/auto-switch")
-async def auto_switch_best_model(
+def auto_switch_best_model(
     model_type: str,
     improvement_threshold: float = 0.05,
     db: Session = Depends(get_db)
@@ -132,7 +132,7 @@ async def auto_switch_best_model(
 
 
 @router.post("/learning-cycle")
-async def run_learning_cycle(
+def run_learning_cycle(
     db: Session = Depends(get_db)
 ):
     """
@@ -150,7 +150,7 @@ async def run_learning_cycle(
 
 
 @router.get("/learning-cycle/status")
-async def get_learning_cycle_status(
+def get_learning_cycle_status(
     db: Session = Depends(get_db)
 ):
     """
@@ -6,15 +6,24 @@ Provides endpoints for camera photo analysis with RAG system integration
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
-import requests
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import copy
+import httpx
 import json
+import orjson
 import os
 import base64
 from datetime import datetime
 
-from database.connection import get_db
-from utils.context_injection import build_sensor_context
+from database.connection import get_async_db
+from services.http_clients import http_clients
+from services.stream_sampler import sensor_anomaly, stream_sampler
+from services.vision_cache import cache_scope, frame_hash, vision_cache
+from services.vision_flights import vision_flights
+from services.vision_preprocess import prepare_frame
+from utils.context_injection import build_sensor_context_async
 
 router = APIRouter(prefix="/api/rag", tags=["RAG"])
 
@@ -33,6 +42,7 @@ class RealtimeStreamRequest(BaseModel):
     location: str = "current_inspection_site"
     timestamp: str
     quality: str = "medium"
+    streamId: Optional[str] = None  # Sampling session; defaults to location and stream type
 
 
 class DocumentResult(BaseModel):
@@ -57,12 +67,14 @@ class RealtimeStreamResponse(BaseModel):
     frameAnalysis: Dict[str, Any]
     ragContext: Dict[str, Any]
     timestamp: str
+    frameStatus: str = "analyzed"  # "analyzed" or "skipped"
+    sampling: Optional[Dict[str, Any]] = None
 
 
 @router.post("/analyze-photo", response_model=RAGAnalysisResponse)
 async def analyze_photo_with_rag(
     request: PhotoAnalysisRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyze a photo using RAG system with home inspection documents
@@ -70,12 +82,14 @@ async def analyze_photo_with_rag(
     """
     try:
         # Get sensor context
-        sensor_context = build_sensor_context(
+        sensor_context = await build_sensor_context_async(
             component=request.component,
             location_prefix=request.location,
             window_sec=request.windowSec,
             db=db
         )
+        # Return the connection to the pool before waiting on the RAG service
+        await db.close()
 
         # Prepare RAG query with photo and sensor context
         rag_query = {
@@ -87,13 +101,9 @@ async def analyze_photo_with_rag(
             "timestamp": datetime.utcnow().isoformat()
         }
 
-        # Call RAG service (assuming it's running on port 3001)
+        # Call RAG service (RAG_SERVICE_URL, port 3001 by default)
         try:
-            rag_response = requests.post(
-                "http://localhost:3001/api/rag/analyze",
-                json=rag_query,
-                timeout=30
-            )
+            rag_response = await http_clients.rag.post("/api/rag/analyze", json=rag_query)
 
             if rag_response.status_code == 200:
                 rag_data = rag_response.json()
@@ -125,7 +135,7 @@ async def analyze_photo_with_rag(
                     detail=f"RAG service error: {rag_response.text}"
                 )
 
-        except requests.exceptions.RequestException:
+        except httpx.HTTPError:
             # Fallback: return basic analysis without RAG service
             return create_fallback_analysis(request, sensor_context)
 
@@ -196,7 +206,7 @@ async def rag_health_check():
     """
     try:
         # Check if RAG service is running
-        response = requests.get("http://localhost:3001/health", timeout=5)
+        response = await http_clients.rag.get("/health", timeout=5)
         if response.status_code == 200:
             return {"status": "healthy", "rag_service": "connected"}
         else:
@@ -208,14 +218,14 @@ async def rag_health_check():
 @router.post("/analyze-realtime-stream", response_model=RealtimeStreamResponse)
 async def analyze_realtime_stream(
     request: RealtimeStreamRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyze real-time camera stream frames using RAG system
     """
     try:
         # Get sensor context for real-time analysis
-        sensor_context = build_sensor_context(
+        sensor_context = await build_sensor_context_async(
             component="realtime_inspection",
             location_prefix=request.location,
             window_sec=60,  # 1 minute window for real-time
@@ -234,9 +244,35 @@ async def analyze_realtime_stream(
             "analysis_type": "realtime_stream"
         }
 
+        # Skip frames that show the same view as the stream's last analyzed one;
+        # photos are taken on purpose and always analyzed
+        fingerprint = await asyncio.to_thread(frame_hash, request.frame) if request.frame else None
+        stream_id = stream_key(request)
+        decision = stream_sampler.decide(
+            stream_id,
+            fingerprint,
+            anomaly=sensor_anomaly(sensor_context),
+            force=request.streamType == "photo_inspection"
+        )
+        if not decision.analyze:
+            return create_skipped_frame_response(sensor_context, decision.dict())
+
+        # Load the optimized prompt, then return the connection to the pool: the
+        # vision queue and API call can take far longer than any query
+        prompt_template = await load_prompt_template(db) if request.frame else None
+        await db.close()
+
         # For real-time streaming, use OpenAI Vision API directly (skip RAG service)
         # This provides faster, more reliable analysis for live camera streams
-        result = create_realtime_fallback_analysis(request, sensor_context)
+        try:
+            result = await create_realtime_fallback_analysis(request, sensor_context, fingerprint, prompt_template)
+        except BaseException:
+            stream_sampler.revert(stream_id, decision)
+            raise
+        if request.frame and not result.frameAnalysis["image_analysis_used"]:
+            # The vision call failed or timed out; the frame must not become the reference
+            stream_sampler.revert(stream_id, decision)
+        result.sampling = decision.dict()
         
         # Auto-create training data for learning (background task)
         # This will be processed by cleaning service later
@@ -256,34 +292,48 @@ async def analyze_realtime_stream(
         )
 
 
-def analyze_image_with_openai(frame_base64: str, db: Session = None) -> Dict[str, Any]:
+def stream_key(request: RealtimeStreamRequest) -> str:
+    """The stream a frame belongs to, for sampling and fair queueing"""
+    return request.streamId or f"{request.location}:{request.streamType}"
+
+
+async def load_prompt_template(db: AsyncSession) -> Optional[str]:
+    """
+    Prompt of the latest deployed detection model, if it has one
+    """
+    try:
+        from models.model_version import ModelVersion
+        latest_model = (await db.scalars(
+            select(ModelVersion).where(
+                ModelVersion.model_type == "detection",
+                ModelVersion.deployed == True
+            ).order_by(ModelVersion.id.desc()).limit(1)
+        )).first()
+        return latest_model.prompt_template if latest_model else None
+    except Exception as e:
+        print(f"⚠️  Could not load optimized prompt: {e}")
+        return None
+
+
+async def analyze_image_with_openai(
+    frame_base64: str,
+    prompt_template: Optional[str] = None,
+    fingerprint: Optional[int] = None,
+    client: str = "default"
+) -> Dict[str, Any]:
     """
     Analyze image using OpenAI Vision API
-    Uses optimized prompt from latest trained model if available
+    prompt_template is the latest trained model's optimized prompt (see
+    load_prompt_template), loaded by the caller so no database connection is
+    held during the call; the default prompt is used without one.
+    fingerprint is the frame's perceptual hash, when the caller already has it;
+    client is the stream the frame belongs to, for fair queueing
     """
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
         return None
 
     try:
-        # Get latest optimized prompt if available
-        prompt_template = None
-        if db:
-            try:
-                from models.model_version import ModelVersion
-                from sqlalchemy import and_
-                latest_model = db.query(ModelVersion).filter(
-                    and_(
-                        ModelVersion.model_type == "detection",
-                        ModelVersion.deployed == True
-                    )
-                ).order_by(ModelVersion.id.desc()).first()
-                
-                if latest_model and latest_model.prompt_template:
-                    prompt_template = latest_model.prompt_template
-            except Exception as e:
-                print(f"⚠️  Could not load optimized prompt: {e}")
-        
         # Use optimized prompt or fallback to default
         if not prompt_template:
             prompt_template = """請仔細分析這張房屋檢查照片，特別注意檢測以下問題：
@@ -333,15 +383,55 @@ def analyze_image_with_openai(frame_base64: str, db: Session = None) -> Dict[str
 
 如果沒有檢測到任何問題，返回空列表 []。如果檢測到問題，必須在 detected_issues 中包含詳細信息。"""
         
+        model = os.getenv("OPENAI_VISION_MODEL", "gpt-4o-mini")  # Default to gpt-4o-mini for cost optimization
+        
+        # Near-identical frames reuse an analysis made with the same prompt and model
+        scope, frame = cache_scope(prompt_template, model), fingerprint
+        if frame is None:
+            frame = await asyncio.to_thread(frame_hash, frame_base64)
+        if frame is not None and vision_cache.enabled:
+            cached = await vision_cache.get(scope, frame)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
+        # Identical frames requested at once share one vision call, and calls
+        # queue fairly per client for the provider's concurrency limit
+        async def call():
+            analysis = await request_vision_analysis(frame_base64, prompt_template, model, openai_api_key)
+            return await cache_analysis(scope, frame, analysis) if analysis else None
+
+        analysis = await vision_flights.run((scope, frame) if frame is not None else None, client, call)
+        return copy.deepcopy(analysis)
+
+    except Exception as e:
+        print(f"OpenAI Vision API error: {str(e)}")
+        return None
+
+
+async def request_vision_analysis(
+    frame_base64: str,
+    prompt_template: str,
+    model: str,
+    api_key: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Call the vision API with a prepared frame and parse its answer
+    """
+    try:
+        # Send a downscaled, metadata-free frame; one that cannot be decoded goes as it came
+        prepared = await asyncio.to_thread(prepare_frame, frame_base64)
+        image_url = prepared.data_url if prepared else f"data:image/jpeg;base64,{frame_base64}"
+        
         # Use OpenAI Vision API to analyze the image
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+        response = await http_clients.vision.post(
+            "/chat/completions",
             headers={
-                "Authorization": f"Bearer {openai_api_key}",
+                "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
             },
-            json={
-                "model": os.getenv("OPENAI_VISION_MODEL", "gpt-4o-mini"),  # Default to gpt-4o-mini for cost optimization
+            # orjson writes the multi-megabyte image string in one pass
+            content=orjson.dumps({
+                "model": model,
                 "messages": [
                     {
                         "role": "user",
@@ -353,7 +443,7 @@ def analyze_image_with_openai(frame_base64: str, db: Session = None) -> Dict[str
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{frame_base64}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -361,8 +451,7 @@ def analyze_image_with_openai(frame_base64: str, db: Session = None) -> Dict[str
                 ],
                 "max_tokens": 2000,  # Increased to ensure complete analysis for multiple issues
                 "temperature": 0.3  # Lower temperature for more focused detection
-            },
-            timeout=60  # Increased timeout for better reliability
+            })
         )
 
         if response.status_code == 200:
@@ -435,9 +524,53 @@ def analyze_image_with_openai(frame_base64: str, db: Session = None) -> Dict[str
         return None
 
 
-def create_realtime_fallback_analysis(
+async def cache_analysis(scope: str, frame: Optional[int], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cache a vision analysis under its frame hash (when the frame could be hashed) and return it
+    """
+    if frame is not None and vision_cache.enabled:
+        await vision_cache.put(scope, frame, copy.deepcopy(analysis))
+    return analysis
+
+
+def create_skipped_frame_response(
+    sensor_context: List[Dict],
+    sampling: Dict[str, Any]
+) -> RealtimeStreamResponse:
+    """
+    Response for a frame showing the same view as the last analyzed one
+    Carries no issues, so clients do not report the last frame's issues again
+    """
+    frame_analysis = {
+        "issues": [],
+        "detected_issues": [],
+        "detectedProblems": [],
+        "objects": [],
+        "image_analysis_used": False,
+        "analysis_status": "skipped",
+        "analysis_method": "frame_dedup",
+        "analysis_summary": "畫面與上次分析相同，已略過"
+    }
+    rag_context = {
+        "relevantDocuments": [],
+        "sensorData": sensor_context,
+        "recommendations": [],
+        "imageAnalysis": None
+    }
+    return RealtimeStreamResponse(
+        frameAnalysis=frame_analysis,
+        ragContext=rag_context,
+        timestamp=datetime.utcnow().isoformat(),
+        frameStatus="skipped",
+        sampling=sampling
+    )
+
+
+async def create_realtime_fallback_analysis(
     request: RealtimeStreamRequest,
-    sensor_context: List[Dict]
+    sensor_context: List[Dict],
+    fingerprint: Optional[int] = None,
+    prompt_template: Optional[str] = None
 ) -> RealtimeStreamResponse:
     """
     Create fallback analysis for real-time stream when RAG service is unavailable
@@ -451,13 +584,8 @@ def create_realtime_fallback_analysis(
     image_analysis = None
     
     if frame_base64:
-        # Pass db session to use optimized prompt
-        from database.connection import SessionLocal
-        db_session = SessionLocal()
-        try:
-            image_analysis = analyze_image_with_openai(frame_base64, db_session)
-        finally:
-            db_session.close()
+        image_analysis = await analyze_image_with_openai(
+            frame_base64, prompt_template, fingerprint, client=stream_key(request))
     
     if image_analysis:
         # Use OpenAI analysis results
@@ -557,16 +685,37 @@ def create_realtime_fallback_analysis(
     )
 
 
+@router.get("/vision-cache")
+async def get_vision_cache_stats():
+    """
+    Get hit rates and size of the vision analysis cache
+    """
+    return vision_cache.stats()
+
+
+@router.get("/vision-calls")
+async def get_vision_call_stats():
+    """
+    Get in-flight, coalesced and queued vision API calls
+    """
+    return vision_flights.stats()
+
+
+@router.get("/stream-sampling")
+async def get_stream_sampling_stats():
+    """
+    Get analyzed and skipped frame counts of realtime streams
+    """
+    return stream_sampler.stats()
+
+
 @router.get("/documents/count")
 async def get_document_count():
     """
     Get count of documents in RAG system
     """
     try:
-        response = requests.get(
-            "http://localhost:3001/api/documents/count",
-            timeout=10
-        )
+        response = await http_clients.rag.get("/api/documents/count", timeout=10)
         if response.status_code == 200:
             return response.json()
         else:
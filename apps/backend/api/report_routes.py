@@ -23,7 +23,7 @@ REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.post("/generate")
-async def generate_report(
+def generate_report(
     report_data: dict,
     db: Session = Depends(get_db)
 ):
@@ -111,7 +111,7 @@ async def generate_report(
 
 
 @router.get("/{report_id}")
-async def get_report(report_id: str):
+def get_report(report_id: str):
     """
     Get report content as JSON (for viewing in browser)
     """
@@ -140,7 +140,7 @@ async def get_report(report_id: str):
 
 
 @router.get("/download/{report_id}")
-async def download_report(report_id: str):
+def download_report(report_id: str):
     """
     Download a generated inspection report
     """
@@ -170,7 +170,7 @@ async def download_report(report_id: str):
 
 
 @router.get("/list")
-async def list_reports(limit: int = 20):
+def list_reports(limit: int = 20):
     """
     List all available reports
     """
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
+import uuid
 
-from database.connection import get_db
-from services.sensor_service import SensorService
-from services.readings_service import ReadingsService
+from database.connection import AsyncSessionLocal, get_async_db
+from services.current_readings import CURRENT_HISTORY_SIZE, current_readings
+from services.sensor_service import AsyncSensorService
+from services.ingest_buffer import ingest_buffer
+from services.readings_service import AsyncReadingsService, next_cursor
+from services.reading_bus import reading_bus
+from services.reading_export import EXPORT_MEDIA_TYPES, aencode_chunks, check_export_format, export_chunk_size
+from services.rollup_service import AsyncRollupService, parse_resolution
+from services.sensor_id_cache import sensor_id_cache
 from schemas.sensor import SensorData, SensorOut
 from schemas.reading import ReadingData, ReadingOut, ReadingFilter, SensorDataBatch
 
@@ -15,54 +23,128 @@ router = APIRouter(prefix="/sensor", tags=["sensor"])
 @router.post("/data", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def post_sensor_data(
     data: SensorDataBatch,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Receive single or multiple sensor data entries.
-    First upserts sensors, then writes readings.
+    First upserts sensors, then writes readings, in a single transaction.
+    With INGEST_DURABILITY=group the batch shares a group commit with other
+    requests; with buffered it is queued and acknowledged with 202 and a
+    batch id to look up under /batches/{batch_id}.
     """
+    if ingest_buffer.durability != "sync":
+        return await _post_sensor_data_buffered(data, response)
     try:
         # Initialize services
-        sensor_service = SensorService(db)
-        readings_service = ReadingsService(db)
+        sensor_service = AsyncSensorService(db)
+        readings_service = AsyncReadingsService(db)
         
-        # Upsert sensors first
-        sensors = sensor_service.upsert_sensors(data.sensors)
+        # Upsert sensors first; the readings write commits both
+        sensors = await sensor_service.upsert_sensors(data.sensors, commit=False)
+        sensor_ids = [s.sensor_id for s in sensors]
         
         # Add readings
-        readings = readings_service.append_many(data.readings)
-        
-        return {
-            "message": "Sensor data processed successfully",
-            "sensors_processed": len(sensors),
-            "readings_processed": len(readings),
-            "sensor_ids": [s.sensor_id for s in sensors],
-            "reading_ids": [r.id for r in readings]
-        }
-        
+        readings = await readings_service.append_many(data.readings)
     except ValueError as e:
+        # The batch was rolled back, so ids cached by the upsert may not exist
+        sensor_id_cache.invalidate(*[s.sensor_id for s in data.sensors])
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
+        sensor_id_cache.invalidate(*[s.sensor_id for s in data.sensors])
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error: {str(e)}"
         )
 
+    # Push the committed batch to live dashboards; past the commit, a failure
+    # here must not turn into an error for data that is already stored
+    try:
+        reading_bus.publish_readings(readings, [r.sensor_id for r in data.readings])
+    except Exception as e:
+        print(f"⚠️ Could not publish committed readings: {e}")
+
+    return {
+        "message": "Sensor data processed successfully",
+        "sensors_processed": len(sensors),
+        "readings_processed": len(readings),
+        "sensor_ids": sensor_ids,
+        "reading_ids": [r.id for r in readings]
+    }
+
+
+async def _post_sensor_data_buffered(data: SensorDataBatch, response: Response) -> dict:
+    """
+    Hand a batch to the ingest buffer, waiting for its group commit unless
+    durability is "buffered"
+    """
+    if ingest_buffer.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest queue is full",
+            headers={"Retry-After": "1"}
+        )
+    batch_id = uuid.uuid4().hex
+    future = await ingest_buffer.submit(data.sensors, data.readings, batch_id=batch_id)
+
+    if ingest_buffer.durability == "buffered":
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Sensor data accepted",
+            "batch_id": batch_id,
+            "readings_accepted": len(data.readings),
+            "status_url": f"/api/sensor/batches/{batch_id}"
+        }
+
+    try:
+        result = await future
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+    return {
+        "message": "Sensor data processed successfully",
+        "batch_id": batch_id,
+        "sensors_processed": result.sensors_processed,
+        "readings_processed": len(result.reading_ids),
+        "sensor_ids": list(dict.fromkeys(s.sensor_id for s in data.sensors)),
+        "reading_ids": result.reading_ids
+    }
+
+
+@router.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """
+    Outcome of a batch accepted with 202: pending, committed (with reading
+    ids) or failed. Batches are tracked by the worker that accepted them,
+    for the last INGEST_BATCH_HISTORY batches.
+    """
+    batch = ingest_buffer.batch_status(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Batch {batch_id} not found")
+    return batch
+
 
 @router.get("/latest", response_model=List[ReadingOut])
 async def get_sensor_latest(
+    response: Response,
     type: Optional[str] = None,
     location: Optional[str] = None,
     since: Optional[datetime] = None,
     limit: Optional[int] = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get latest sensor readings with optional filtering.
     Supports query by type, location, since timestamp, and limit.
+    Pages continue from the X-Next-Cursor header via the cursor parameter.
     """
     try:
         # Create filter object
@@ -70,15 +152,22 @@ async def get_sensor_latest(
             type=type,
             location=location,
             since=since,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
         # Get readings
-        readings_service = ReadingsService(db)
-        readings = readings_service.get_latest(filter_params)
+        readings_service = AsyncReadingsService(db)
+        readings = await readings_service.get_latest(filter_params)
         
+        _set_next_cursor(response, readings, filter_params.limit)
         return readings
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -86,14 +175,32 @@ async def get_sensor_latest(
         )
 
 
+@router.get("/current")
+async def get_sensor_current(
+    sensor_id: Optional[str] = None,
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    history: int = Query(0, ge=0, le=CURRENT_HISTORY_SIZE - 1, description="Earlier readings per stream")
+):
+    """
+    Get the current value of every sensor stream (sensor, type, location),
+    most recently updated first, optionally with its last few readings.
+    Served from memory, kept current by ingest; no database query.
+    """
+    return Response(
+        content=current_readings.render(sensor_id, type, location, history),
+        media_type="application/json"
+    )
+
+
 @router.get("/sensors", response_model=List[SensorOut])
-async def get_all_sensors(db: Session = Depends(get_db)):
+async def get_all_sensors(db: AsyncSession = Depends(get_async_db)):
     """
     Get all registered sensors
     """
     try:
-        sensor_service = SensorService(db)
-        sensors = sensor_service.get_all_sensors()
+        sensor_service = AsyncSensorService(db)
+        sensors = await sensor_service.get_all_sensors()
         return sensors
         
     except Exception as e:
@@ -106,17 +213,26 @@ async def get_all_sensors(db: Session = Depends(get_db)):
 @router.get("/sensors/{sensor_id}/readings", response_model=List[ReadingOut])
 async def get_sensor_readings(
     sensor_id: str,
+    response: Response,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get readings for a specific sensor
+    Get readings for a specific sensor, newest first.
+    Pages continue from the X-Next-Cursor header via the cursor parameter.
     """
     try:
-        readings_service = ReadingsService(db)
-        readings = readings_service.get_readings_by_sensor(sensor_id, limit)
+        readings_service = AsyncReadingsService(db)
+        readings = await readings_service.get_readings_by_sensor(sensor_id, limit, cursor)
+        _set_next_cursor(response, readings, limit)
         return readings
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -124,23 +240,159 @@ async def get_sensor_readings(
         )
 
 
+def _set_next_cursor(response: Response, readings: List, limit: Optional[int]) -> None:
+    """Expose the keyset cursor for the following page, if there is one"""
+    cursor = next_cursor(readings, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
+
+async def _sensor_pk(db: AsyncSession, sensor_id: Optional[str]) -> Optional[int]:
+    """Primary key for an external sensor_id filter, raising 404 for unknown sensors"""
+    if not sensor_id:
+        return None
+    sensor = await AsyncSensorService(db).get_sensor_by_id(sensor_id)
+    if not sensor:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sensor with ID {sensor_id} not found"
+        )
+    return sensor.id
+
+
+def _split_param(value: Optional[str]) -> List[str]:
+    """Split a comma-separated query parameter"""
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
 @router.get("/stats")
 async def get_sensor_stats(
     sensor_id: Optional[str] = None,
     type: Optional[str] = None,
     location: Optional[str] = None,
-    db: Session = Depends(get_db)
+    group_by: Optional[str] = Query(None, description="Comma-separated: type, location, sensor"),
+    percentiles: Optional[str] = Query(None, description="Comma-separated percentiles, e.g. 50,95,99"),
+    stddev: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get sensor reading statistics
+    Get sensor reading statistics.
+    Aggregated in the database, optionally per group, with percentiles and stddev.
     """
     try:
-        readings_service = ReadingsService(db)
-        stats = readings_service.get_reading_stats(sensor_id, type, location)
+        try:
+            pcts = [float(p) for p in _split_param(percentiles)]
+        except ValueError:
+            raise ValueError("percentiles must be comma-separated numbers")
+
+        readings_service = AsyncReadingsService(db)
+        stats = await readings_service.get_reading_stats(
+            sensor_id, type, location,
+            group_by=_split_param(group_by),
+            percentiles=pcts,
+            include_stddev=stddev
+        )
         return stats
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving statistics: {str(e)}"
         )
+
+
+@router.get("/export")
+async def export_readings(
+    format: str = Query("ndjson", description="ndjson, csv, arrow (Arrow IPC stream) or parquet"),
+    sensor_id: Optional[str] = None,
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream every matching reading, oldest first, as NDJSON, CSV, Arrow or Parquet.
+    Rows are read from a server-side cursor in chunks, so memory use does not
+    grow with the size of the export; Arrow and Parquet get one record batch per chunk.
+    """
+    try:
+        check_export_format(format)
+        sensor_pk = await _sensor_pk(db, sensor_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except ImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e)
+        )
+
+    async def body():
+        # The stream outlives the request handler, so it reads through its own
+        # session; its encoder is created here too, and closed if the client goes away
+        async with AsyncSessionLocal() as export_db:
+            chunks = AsyncReadingsService(export_db).stream_readings(
+                sensor_pk, type, location, start, end, chunk_size=export_chunk_size(format)
+            )
+            async for data in aencode_chunks(chunks, format):
+                yield data
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="readings.{format}"'}
+    )
+
+
+@router.get("/history")
+async def get_sensor_history(
+    sensor_id: Optional[str] = None,
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("raw", description="raw, 1m, 1h, or the coarsest acceptable bucket in seconds"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get readings for a time range (default: the last 24 hours).
+    Served from the coarsest rollup tier that satisfies the requested resolution.
+    """
+    try:
+        sensor_pk = await _sensor_pk(db, sensor_id)
+        rollup_service = AsyncRollupService(db)
+        return await rollup_service.get_history(
+            sensor_pk, type, location, start, end,
+            resolution_seconds=parse_resolution(resolution),
+            limit=limit
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving sensor history: {str(e)}"
+        )
+
+
+@router.get("/cache/stats")
+async def get_sensor_cache_stats():
+    """
+    Get hit/miss counters for the sensor-id resolution cache
+    """
+    return sensor_id_cache.stats()
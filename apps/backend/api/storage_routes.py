@@ -17,7 +17,7 @@ REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.get("/images")
-async def list_images():
+def list_images():
     """
     List all stored inspection images
     """
@@ -46,7 +46,7 @@ async def list_images():
 
 
 @router.get("/images/{filename}")
-async def get_image(filename: str):
+def get_image(filename: str):
     """
     Download a specific inspection image
     """
@@ -81,7 +81,7 @@ async def get_image(filename: str):
 
 
 @router.get("/info")
-async def get_storage_info():
+def get_storage_info():
     """
     Get storage information and locations
     """
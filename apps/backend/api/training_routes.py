@@ -37,7 +37,7 @@ training_status = {
 
 
 @router.post("/train")
-async def train_model(
+def train_model(
     request: TrainRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -96,7 +96,7 @@ async def train_model(
 
 
 @router.get("/status")
-async def get_training_status():
+def get_training_status():
     """
     Get current training status
     """
@@ -104,7 +104,7 @@ async def get_training_status():
 
 
 @router.get("/models")
-async def get_models(
+def get_models(
     model_type: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
@@ -143,7 +143,7 @@ async def get_models(
 
 
 @router.post("/deploy")
-async def deploy_model(
+def deploy_model(
     request: DeployRequest,
     db: Session = Depends(get_db)
 ):
@@ -172,7 +172,7 @@ async def deploy_model(
 
 
 @router.get("/performance")
-async def get_performance(
+def get_performance(
     model_type: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
@@ -210,7 +210,7 @@ async def get_performance(
 
 
 @router.get("/latest/{model_type}")
-async def get_latest_model(
+def get_latest_model(
     model_type: str,
     db: Session = Depends(get_db)
 ):
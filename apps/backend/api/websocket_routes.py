@@ -1,82 +1,180 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from typing import Dict, Any, Optional
 import asyncio
+import orjson
+import os
 from datetime import datetime
 
-from database.connection import get_db
-from services.readings_service import ReadingsService
-from schemas.reading import ReadingOut
+from services.connection_manager import ConnectionManager
+from services.ingest_buffer import ingest_buffer
+from services.reading_bus import Broadcast, encode_message, reading_bus
+from schemas.reading import IngestMessage, ReadingOut, StreamSubscription
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
-# Store active WebSocket connections
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-    
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except:
-            self.disconnect(websocket)
-    
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
-
 # Global connection manager
 manager = ConnectionManager()
 
+# Ingest messages a device may have awaiting acks before the server stops reading from it
+INGEST_MAX_IN_FLIGHT = int(os.getenv("WS_INGEST_MAX_IN_FLIGHT", "16"))
+
 
 @router.websocket("/sensor/stream")
-async def websocket_sensor_stream(websocket: WebSocket):
+async def websocket_sensor_stream(
+    websocket: WebSocket,
+    protocol: str = Query("json", pattern="^(json|compact)$"),
+    batch_ms: int = Query(0, ge=0, le=10000)
+):
     """
     WebSocket endpoint for real-time sensor data streaming.
-    Broadcasts new readings to all connected clients.
+    Clients receive every new reading until they send a subscription:
+    {"type": "subscribe", "sensor_ids": [...], "types": [...],
+     "location_prefixes": [...], "min_interval": seconds}
+    after which only matching readings are pushed. {"type": "unsubscribe"}
+    goes back to receiving everything.
+
+    ?protocol=compact sends readings as reading_deltas frames (changed fields
+    only), and ?batch_ms=N flushes at most one frame every N ms.
+    permessage-deflate is negotiated by the server when the client offers it.
     """
-    await manager.connect(websocket)
+    await manager.connect(websocket, compact=protocol == "compact", batch_ms=batch_ms)
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            reply = handle_client_message(websocket, message)
+            if reply:
+                await manager.send_personal_message(reply, websocket)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 
+def handle_client_message(websocket: WebSocket, message: str) -> Optional[str]:
+    """
+    Apply a subscribe/unsubscribe message, returning the serialized reply.
+    Anything else (e.g. keepalive pings) is ignored.
+    """
+    try:
+        payload = orjson.loads(message)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get("type") not in ("subscribe", "unsubscribe"):
+        return None
+
+    try:
+        if payload["type"] == "unsubscribe":
+            subscription = StreamSubscription()
+        else:
+            subscription = StreamSubscription(**{k: v for k, v in payload.items() if k != "type"})
+    except (TypeError, ValueError) as e:
+        return encode_message("error", {"detail": str(e)})
+
+    manager.subscribe(websocket, subscription)
+    return encode_message("subscribed", subscription.model_dump())
+
+
+@router.websocket("/sensor/ingest")
+async def websocket_sensor_ingest(websocket: WebSocket):
+    """
+    Ingest channel for devices that keep one connection open.
+    Each message is {"seq": n, "sensors": [...], "readings": [...]}, with
+    sensors needed only until they have been sent once. Messages are
+    micro-batched with other devices' into shared transactions and acked in
+    order once committed: {"type": "ack", "data": {"seq": n, "reading_ids":
+    [...], "backpressure": bool}}, or {"type": "error", ...} for a rejected
+    message (binary frames included). With INGEST_MAX_IN_FLIGHT messages
+    unacked, or the buffer full, the server stops reading until writes catch up.
+    If acks can no longer be sent the connection is closed.
+    """
+    await websocket.accept()
+    acks: asyncio.Queue = asyncio.Queue(maxsize=INGEST_MAX_IN_FLIGHT)
+    acker = asyncio.create_task(send_ingest_acks(websocket, acks))
+    try:
+        while True:
+            message = await _unless_stopped(websocket.receive(), acker)
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is None:
+                reply = encode_message("error", {"seq": None, "detail": "Ingest messages must be JSON text frames"})
+                await _unless_stopped(acks.put((None, reply)), acker)
+                continue
+            try:
+                submission = IngestMessage.model_validate_json(message["text"])
+            except ValueError as e:
+                reply = encode_message("error", {"seq": None, "detail": str(e)})
+                await _unless_stopped(acks.put((None, reply)), acker)
+                continue
+            future = await ingest_buffer.submit(submission.sensors, submission.readings)
+            await _unless_stopped(acks.put((submission.seq, future)), acker)
+    except (WebSocketDisconnect, _AckerStopped):
+        pass
+    finally:
+        error = acker.exception() if acker.done() and not acker.cancelled() else None
+        acker.cancel()
+        if error is not None and not isinstance(error, WebSocketDisconnect):
+            # Messages past the failed ack would never be acked, so drop the device
+            print(f"⚠️ Ingest acks stopped, closing device connection: {error}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+
+class _AckerStopped(Exception):
+    """The ingest ack task finished, so nothing more will be acked"""
+
+
+async def _unless_stopped(awaitable, acker: asyncio.Task):
+    """
+    Await awaitable, unless acker finishes first: then awaitable is cancelled
+    and _AckerStopped raised, instead of waiting on a queue no one drains
+    """
+    step = asyncio.ensure_future(awaitable)
+    await asyncio.wait({step, acker}, return_when=asyncio.FIRST_COMPLETED)
+    if not step.done():
+        step.cancel()
+        raise _AckerStopped()
+    return step.result()
+
+
+async def send_ingest_acks(websocket: WebSocket, acks: asyncio.Queue):
+    """
+    Send each message's ack, or error, in the order the messages arrived
+    """
+    while True:
+        seq, pending = await acks.get()
+        if isinstance(pending, str):
+            await websocket.send_text(pending)
+            continue
+        try:
+            result = await pending
+        except ValueError as e:
+            reply = encode_message("error", {"seq": seq, "detail": str(e)})
+        except Exception as e:
+            reply = encode_message("error", {"seq": seq, "detail": f"Internal server error: {str(e)}"})
+        else:
+            reply = encode_message("ack", {
+                "seq": seq,
+                "sensors_processed": result.sensors_processed,
+                "readings_processed": len(result.reading_ids),
+                "reading_ids": result.reading_ids,
+                "backpressure": ingest_buffer.saturated
+            })
+        await websocket.send_text(reply)
+
+
 async def broadcast_new_reading(reading: ReadingOut):
     """
-    Broadcast a new reading to all connected WebSocket clients.
-    This function should be called when new readings are added.
+    Broadcast a single reading to all connected WebSocket clients, on every worker.
+    Ingest publishes whole batches on the reading bus instead (new_readings).
     """
-    message = {
-        "type": "new_reading",
-        "data": reading.dict(),
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    await manager.broadcast(json.dumps(message))
+    reading_bus.publish(encode_message("new_reading", reading.model_dump()))
 
 
 async def broadcast_sensor_update(sensor_id: str, update_type: str, data: Dict[str, Any]):
     """
-    Broadcast sensor updates to all connected clients.
+    Broadcast sensor updates to all connected clients, on every worker.
     """
     message = {
         "type": "sensor_update",
@@ -85,15 +183,20 @@ async def broadcast_sensor_update(sensor_id: str, update_type: str, data: Dict[s
         "data": data,
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast(json.dumps(message))
+    # A client that falls behind only receives the newest pending update of each kind per sensor
+    reading_bus.publish(Broadcast(orjson.dumps(message).decode(), key=f"sensor_update:{sensor_id}:{update_type}"))
 
 
 @router.get("/connections")
-async def get_connection_count():
+async def get_connection_count(detail: bool = False):
     """
-    Get the number of active WebSocket connections
+    Get the number of active WebSocket connections, with send-queue and lag metrics
+    (per connection when detail=true)
     """
     return {
         "active_connections": len(manager.active_connections),
+        "send": manager.metrics(detail),
+        "bus": reading_bus.stats(),
+        "ingest": ingest_buffer.stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
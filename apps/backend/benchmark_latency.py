@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Load test for GET /api/sensor/latest under concurrent ingest
+Drives the app in-process over ASGI, so any blocking database call stalls
+every in-flight request on the shared event loop.
+
+For comparison the script mounts /bench/latest-blocking, which serves the same
+query the way the routes used to: a synchronous session inside an async handler.
+
+Usage:
+    python benchmark_latency.py
+    BENCH_DURATION=30 BENCH_INGESTERS=8 BENCH_POLLERS=32 python benchmark_latency.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Point the app at a throwaway database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="latency_bench_")
+os.environ["DB_URL"] = os.getenv("BENCH_DB_URL", f"sqlite:///{_tmp_dir}/bench.db")
+
+import httpx
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+import main
+from database.connection import engine, get_db
+from database.migrate import upgrade_database
+from schemas.reading import ReadingFilter
+from services.readings_service import ReadingsService
+
+DURATION = float(os.getenv("BENCH_DURATION", "10"))
+INGESTERS = int(os.getenv("BENCH_INGESTERS", "4"))
+POLLERS = int(os.getenv("BENCH_POLLERS", "16"))
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "200"))
+
+
+@main.app.get("/bench/latest-blocking")
+async def latest_blocking(limit: Optional[int] = 100, db: Session = Depends(get_db)):
+    """The pre-async route shape: sync session calls on the event loop"""
+    return ReadingsService(db).get_latest(ReadingFilter(limit=limit))
+
+
+def make_payload(worker: int) -> dict:
+    sensor_id = f"latency_{worker:02d}"
+    now = datetime.utcnow().isoformat()
+    return {
+        "sensors": [{"sensor_id": sensor_id, "vendor": "Bench", "model": "L-1", "type": "co2"}],
+        "readings": [
+            {
+                "sensor_id": sensor_id,
+                "type": "co2",
+                "location": "basement",
+                "value": 400.0 + i,
+                "unit": "ppm",
+                "confidence": 0.9,
+                "timestamp": now
+            }
+            for i in range(BATCH_SIZE)
+        ]
+    }
+
+
+async def ingest(client: httpx.AsyncClient, worker: int, stop: float, counter: List[int]):
+    while time.perf_counter() < stop:
+        response = await client.post("/api/sensor/data", json=make_payload(worker))
+        response.raise_for_status()
+        counter[0] += BATCH_SIZE
+
+
+async def poll(client: httpx.AsyncClient, path: str, stop: float, latencies: List[float]):
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        response = await client.get(path, params={"limit": 100})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(path: str) -> None:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        stop = time.perf_counter() + DURATION
+        latencies: List[float] = []
+        ingested = [0]
+        await asyncio.gather(
+            *(ingest(client, w, stop, ingested) for w in range(INGESTERS)),
+            *(poll(client, path, stop, latencies) for _ in range(POLLERS)),
+        )
+
+    print(f"\n{path}:")
+    print(f"  requests: {len(latencies)}  ingested: {ingested[0] / DURATION:.0f} readings/sec")
+    print(f"  p50: {statistics.median(latencies) * 1000:8.1f} ms")
+    print(f"  p99: {percentile(latencies, 99) * 1000:8.1f} ms")
+    print(f"  max: {max(latencies) * 1000:8.1f} ms")
+
+
+async def amain():
+    print("📊 /api/sensor/latest latency under concurrent ingest")
+    print(f"   {DURATION:.0f}s per run, {INGESTERS} ingesters x {BATCH_SIZE} readings, {POLLERS} pollers")
+    upgrade_database(engine)
+    await run("/bench/latest-blocking")
+    await run("/api/sensor/latest")
+    await main.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(amain())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write benchmark for SQLite connection PRAGMAs
+Runs bulk ingest writers alongside /api/sensor/latest-style pollers against a
+database file, once with SQLite's defaults (rollback journal, synchronous=FULL)
+and once with the tuned PRAGMAs from database.connection.
+
+Usage:
+    python benchmark_sqlite.py
+    BENCH_DURATION=30 BENCH_WRITERS=4 BENCH_READERS=16 python benchmark_sqlite.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.base import Base
+from database.connection import SQLITE_PRAGMAS, engine_options, sqlite_pragma_hook
+from schemas.reading import ReadingData, ReadingFilter
+from schemas.sensor import SensorData
+from services.readings_service import ReadingsService
+from services.sensor_id_cache import sensor_id_cache
+from services.sensor_service import SensorService
+
+DURATION = float(os.getenv("BENCH_DURATION", "10"))
+WRITERS = int(os.getenv("BENCH_WRITERS", "2"))
+READERS = int(os.getenv("BENCH_READERS", "8"))
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "100"))
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    # Same busy timeout for both runs, so only journaling and caching differ
+    "rollback journal (defaults)": {"busy_timeout": SQLITE_PRAGMAS.get("busy_timeout", "5000"),
+                                    "journal_mode": "DELETE", "synchronous": "FULL"},
+    "WAL + tuned pragmas": SQLITE_PRAGMAS,
+}
+
+
+def make_batch(writer: int, batch_no: int):
+    sensor = SensorData(sensor_id=f"mixed_{writer:02d}", vendor="Bench", model="M-1", type="temperature")
+    base_time = datetime.utcnow() + timedelta(seconds=batch_no)
+    readings = [
+        ReadingData(
+            sensor_id=sensor.sensor_id,
+            type="temperature",
+            location=f"room_{writer}",
+            value=20.0 + (i % 10),
+            unit="C",
+            confidence=0.95,
+            timestamp=base_time + timedelta(milliseconds=i)
+        )
+        for i in range(BATCH_SIZE)
+    ]
+    return [sensor], readings
+
+
+def run(label: str, pragmas: Dict[str, str]) -> None:
+    sensor_id_cache.clear()
+    url = f"sqlite:///{tempfile.mkdtemp(prefix='sqlite_bench_')}/bench.db"
+    options = engine_options(url)
+    options["pool_size"] = WRITERS + READERS
+    engine = create_engine(url, **options)
+    event.listen(engine, "connect", sqlite_pragma_hook(pragmas))
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    stop = time.perf_counter() + DURATION
+    written: List[int] = []
+    latencies: List[float] = []
+    errors: List[Exception] = []
+    lock = threading.Lock()
+
+    def writer(worker: int):
+        batch_no = 0
+        while time.perf_counter() < stop:
+            sensors, readings = make_batch(worker, batch_no)
+            with factory() as db:
+                try:
+                    SensorService(db).upsert_sensors(sensors, commit=False)
+                    ReadingsService(db).append_many(readings)
+                except Exception as e:  # "database is locked" once busy_timeout runs out
+                    db.rollback()
+                    with lock:
+                        errors.append(e)
+                    continue
+            with lock:
+                written.append(len(readings))
+            batch_no += 1
+
+    def reader():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            with factory() as db:
+                try:
+                    ReadingsService(db).get_latest(ReadingFilter(limit=100))
+                except Exception as e:
+                    with lock:
+                        errors.append(e)
+                    continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(WRITERS)]
+    threads += [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    ordered = sorted(latencies) or [0.0]
+    print(f"\n{label}:")
+    print(f"  writes: {sum(written) / DURATION:10.0f} readings/sec")
+    print(f"  reads:  {len(latencies) / DURATION:10.0f} queries/sec")
+    print(f"  read p50: {statistics.median(ordered) * 1000:8.1f} ms   "
+          f"p99: {ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000:8.1f} ms")
+    print(f"  errors: {len(errors)}")
+
+
+def main():
+    print("📊 SQLite mixed read/write throughput")
+    print(f"   {DURATION:.0f}s per run, {WRITERS} writers x {BATCH_SIZE} readings, {READERS} readers")
+    for label, pragmas in PROFILES.items():
+        print(f"   {label}: {pragmas}")
+    for label, pragmas in PROFILES.items():
+        run(label, pragmas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark of frame preprocessing before vision calls
+Builds the vision request body for synthetic camera frames the way
+analyze_image_with_openai used to (the client's frame as sent, serialized
+with json) and the way it does now (prepare_frame, serialized with orjson),
+and reports bytes, CPU time and the upload time they imply per frame.
+
+Usage:
+    python benchmark_vision_preprocess.py
+    BENCH_UPLINK_MBPS=5 BENCH_RUNS=20 VISION_MAX_EDGE=768 python benchmark_vision_preprocess.py
+"""
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import orjson
+from PIL import Image, ImageDraw, ImageFilter
+
+from services.vision_preprocess import VISION_JPEG_QUALITY, VISION_MAX_EDGE, prepare_frame
+
+RUNS = int(os.getenv("BENCH_RUNS", "10"))
+# Upload bandwidth from the backend to the vision API
+UPLINK_MBPS = float(os.getenv("BENCH_UPLINK_MBPS", "20"))
+
+# (label, size, JPEG quality, with EXIF): canvas captures and phone photos
+FRAMES = [
+    ("canvas 640x480", (640, 480), 80, False),
+    ("canvas 1280x720", (1280, 720), 80, False),
+    ("canvas 1920x1080", (1920, 1080), 92, False),
+    ("photo 4032x3024", (4032, 3024), 95, True),
+]
+
+
+def make_frame(size, quality: int, exif: bool) -> str:
+    """A base64 JPEG with photo-like detail: texture, edges and gradients"""
+    width, height = size
+    image = Image.merge("RGB", [
+        Image.effect_noise(size, 40).filter(ImageFilter.GaussianBlur(1)),
+        Image.linear_gradient("L").resize(size),
+        Image.effect_noise(size, 25),
+    ])
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x, y = width * i // 12, height * ((i * 7) % 12) // 12
+        draw.rectangle([x, y, x + width // 10, y + height // 8], outline=(20, 20, 20), width=max(2, width // 400))
+    options = {"format": "JPEG", "quality": quality}
+    if exif:
+        metadata = Image.Exif()
+        metadata[0x0112] = 6  # Orientation: rotate 90° clockwise
+        metadata[0x010F] = "Bench"
+        metadata[0x927C] = bytes(32 * 1024)  # Maker note, as phones write
+        options["exif"] = metadata.tobytes()
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def body(image_url: str) -> dict:
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "請仔細分析這張房屋檢查照片"},
+            {"type": "image_url", "image_url": {"url": image_url}},
+        ]}],
+        "max_tokens": 2000,
+    }
+
+
+def before(frame: str) -> bytes:
+    return json.dumps(body(f"data:image/jpeg;base64,{frame}")).encode()
+
+
+def after(frame: str) -> bytes:
+    return orjson.dumps(body(prepare_frame(frame).data_url))
+
+
+def timed(build, frame: str):
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        payload = build(frame)
+        samples.append(time.perf_counter() - started)
+    return len(payload), statistics.median(samples) * 1000
+
+
+def upload_ms(size: int) -> float:
+    return size * 8 / (UPLINK_MBPS * 1e6) * 1000
+
+
+def main():
+    print("📊 Vision frame preprocessing benchmark")
+    print(f"   max edge {VISION_MAX_EDGE or 'off'}, JPEG quality {VISION_JPEG_QUALITY}, "
+          f"{UPLINK_MBPS:g} Mbit/s uplink, median of {RUNS} runs")
+
+    for label, size, quality, exif in FRAMES:
+        frame = make_frame(size, quality, exif)
+        prepared = prepare_frame(frame)
+        old_bytes, old_ms = timed(before, frame)
+        new_bytes, new_ms = timed(after, frame)
+        old_total, new_total = old_ms + upload_ms(old_bytes), new_ms + upload_ms(new_bytes)
+        print(f"\n{label}{' + EXIF' if exif else ''} -> {prepared.width}x{prepared.height}:")
+        print(f"  before: {old_bytes / 1024:8.0f} KiB body  {old_ms:6.1f} ms build  "
+              f"{upload_ms(old_bytes):7.1f} ms upload")
+        print(f"  after:  {new_bytes / 1024:8.0f} KiB body  {new_ms:6.1f} ms build  "
+              f"{upload_ms(new_bytes):7.1f} ms upload")
+        print(f"  saved:  {(old_bytes - new_bytes) / 1024:8.0f} KiB ({1 - new_bytes / old_bytes:.0%})  "
+              f"{old_total - new_total:+.1f} ms per frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+WebSocket broadcast benchmark
+Fans reading batches out to simulated clients, a few of them slow, once with
+the old sequential broadcast (await send_text per client in turn) and once
+with the ConnectionManager's per-connection queues and writer tasks. Then
+times subscription routing as the number of distinct subscriptions grows, and
+compares bytes per reading for the JSON and compact stream protocols.
+
+Usage:
+    python benchmark_websocket.py
+    BENCH_CLIENTS=5000 BENCH_SLOW_FRACTION=0.05 python benchmark_websocket.py
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import orjson
+
+from schemas.reading import StreamSubscription
+from services.connection_manager import ConnectionManager
+from services.reading_bus import readings_message
+from services.stream_codec import DeltaEncoder
+from services.subscription_index import SubscriptionIndex
+
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "1000"))
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "100"))
+RATE = float(os.getenv("BENCH_RATE", "50"))  # messages per second
+SLOW_FRACTION = float(os.getenv("BENCH_SLOW_FRACTION", "0.005"))
+SLOW_SEND_SECONDS = float(os.getenv("BENCH_SLOW_SEND_MS", "50")) / 1000
+READINGS_PER_MESSAGE = int(os.getenv("BENCH_BATCH_SIZE", "10"))
+
+
+class SimulatedClient:
+    """Accepts frames after a fixed delay (zero for a fast client) and records delivery latency"""
+
+    def __init__(self, send_seconds: float):
+        self.send_seconds = send_seconds
+        self.latencies: List[float] = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, message: str):
+        if self.send_seconds:
+            await asyncio.sleep(self.send_seconds)
+        else:
+            await asyncio.sleep(0)  # a real send yields to the event loop
+        sent_at = float(message[message.index('"sent_at":') + 10:message.index(",")])
+        self.latencies.append(time.perf_counter() - sent_at)
+
+
+class SequentialManager:
+    """The previous broadcast: one send at a time, in connection order"""
+
+    def __init__(self):
+        self.active_connections: List[SimulatedClient] = []
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        self.active_connections.append(websocket)
+
+    async def broadcast(self, message: str):
+        for connection in self.active_connections:
+            await connection.send_text(message)
+
+
+def make_message(seq: int) -> str:
+    base = datetime.utcnow()
+    readings = [
+        {"id": seq * READINGS_PER_MESSAGE + i, "sensor_id": i, "type": "temperature", "location": "lab",
+         "value": 20.0 + i, "unit": "C", "confidence": 0.95,
+         "timestamp": (base + timedelta(milliseconds=i)).isoformat()}
+        for i in range(READINGS_PER_MESSAGE)
+    ]
+    # sent_at leads the frame so clients can time delivery without parsing it all
+    return orjson.dumps({"sent_at": time.perf_counter(), "type": "new_readings", "data": readings}).decode()
+
+
+async def run(label: str, manager) -> None:
+    slow_count = int(CLIENTS * SLOW_FRACTION)
+    clients = [SimulatedClient(SLOW_SEND_SECONDS if i < slow_count else 0.0) for i in range(CLIENTS)]
+    for client in clients:
+        await manager.connect(client)
+
+    start = time.perf_counter()
+    for seq in range(MESSAGES):
+        await manager.broadcast(make_message(seq))
+        await asyncio.sleep(1 / RATE)
+    published = time.perf_counter() - start
+
+    # Let fast clients drain what is already queued
+    fast = clients[slow_count:]
+    deadline = time.perf_counter() + 30
+    while sum(len(c.latencies) for c in fast) < MESSAGES * len(fast) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for c in fast for lat in c.latencies) or [0.0]
+    delivered = sum(len(c.latencies) for c in clients)
+    print(f"\n{label}:")
+    print(f"  publish loop: {published:6.2f}s for {MESSAGES} messages (target {MESSAGES / RATE:.2f}s)")
+    print(f"  delivered:    {delivered / elapsed:10.0f} frames/sec "
+          f"({sum(len(c.latencies) for c in fast)}/{MESSAGES * len(fast)} to fast clients)")
+    print(f"  fast-client latency p50: {statistics.median(latencies) * 1000:8.1f} ms   "
+          f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:8.1f} ms")
+    if isinstance(manager, ConnectionManager):
+        metrics = manager.metrics()
+        print(f"  slow clients: dropped {metrics['dropped']} frames, max lag {metrics['max_lag_seconds']:.2f}s")
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+
+
+def bench_routing() -> None:
+    """Per-reading routing cost with growing numbers of distinct subscriptions"""
+    print("\nsubscription routing:")
+    types = ["co2", "humidity", "temperature", "moisture_level"]
+    readings = [
+        {"id": i, "sensor_id": i % 50, "type": types[i % 4], "location": f"room_{i % 20}_wall",
+         "timestamp": datetime(2026, 3, 1) + timedelta(seconds=i)}
+        for i in range(1000)
+    ]
+    sensor_keys = {pk: f"sensor_{pk}" for pk in range(50)}
+    for count in (10, 100, 1000, 10000):
+        index = SubscriptionIndex()
+        for i in range(count):
+            index.subscribe(i, StreamSubscription(
+                sensor_ids=[f"sensor_{i % 5000}"], types=[types[i % 4]], location_prefixes=[f"room_{i % 20}"]
+            ))
+        start = time.perf_counter()
+        routed = index.route(readings, sensor_keys)
+        elapsed = time.perf_counter() - start
+        print(f"  {index.group_count:6d} groups: {elapsed / len(readings) * 1e6:7.1f} µs per reading "
+              f"({sum(len(r) for _, r in routed)} deliveries)")
+
+
+class PerMessageDeflate:
+    """Compresses frames like permessage-deflate with context takeover (the websockets default)"""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(wbits=-15)
+
+    def __call__(self, message: str) -> bytes:
+        data = self._compressor.compress(message.encode()) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-4]  # the empty-block tail is implied by the protocol
+
+
+def bench_bytes() -> None:
+    """Wire bytes per reading for 40 sensor streams reporting every 2 seconds for 10 minutes"""
+    print("\nstream protocol bytes per reading:")
+    base = datetime(2026, 3, 1, 12)
+    rng = random.Random(0)
+    streams = [(pk, ("co2", "humidity")[pk % 2], f"room_{pk % 8}_wall") for pk in range(40)]
+    ticks = []
+    for tick in range(300):
+        ticks.append([
+            {"id": tick * len(streams) + i, "sensor_id": pk, "type": reading_type, "location": location,
+             "value": round(rng.uniform(400, 1200), 1), "unit": "ppm", "confidence": 0.95,
+             "calibration_json": {"calibrated_at": "2026-01-15T10:00:00Z", "calibration_method": "factory"},
+             "extras_json": {"battery_level": 100 - tick // 60, "signal_strength": 80 + pk % 5,
+                             "surface_type": "drywall"},
+             "timestamp": base + timedelta(seconds=tick * 2, milliseconds=i),
+             "created_at": base + timedelta(seconds=tick * 2, milliseconds=i + 5)}
+            for i, (pk, reading_type, location) in enumerate(streams)
+        ])
+    readings = sum(len(batch) for batch in ticks)
+
+    def per_reading(frames, deflate: bool) -> float:
+        compress = PerMessageDeflate()
+        return sum(len(compress(f)) if deflate else len(f.encode()) for f in frames) / readings
+
+    # One frame per reading (a device posting as it measures) or one per 2 s tick (batch_ms=2000)
+    variants = {
+        "json, frame per reading": [readings_message([r]) for batch in ticks for r in batch],
+        "json, batched": [readings_message(batch) for batch in ticks],
+    }
+    encoder = DeltaEncoder()
+    variants["compact, frame per reading"] = [encoder.encode([r]) for batch in ticks for r in batch]
+    encoder = DeltaEncoder()
+    variants["compact, batched"] = [encoder.encode(batch) for batch in ticks]
+    baseline = per_reading(variants["json, frame per reading"], deflate=False)
+    for label, frames in variants.items():
+        for deflate in (False, True):
+            size = per_reading(frames, deflate)
+            print(f"  {label:28s} {'deflate' if deflate else 'plain  '}: {size:7.1f} B "
+                  f"({baseline / size:5.1f}x less than plain JSON)")
+
+
+def main():
+    print("📊 WebSocket broadcast fan-out")
+    print(f"   {CLIENTS} clients ({SLOW_FRACTION:.1%} taking {SLOW_SEND_SECONDS * 1000:.0f} ms per frame), "
+          f"{MESSAGES} messages of {READINGS_PER_MESSAGE} readings at {RATE:.0f}/s")
+    managers: Dict[str, object] = {
+        "sequential broadcast": SequentialManager(),
+        "per-connection writers": ConnectionManager(),
+    }
+    for label, manager in managers.items():
+        asyncio.run(run(label, manager))
+    bench_routing()
+    bench_bytes()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
 from .base import Base
-from .connection import get_db, engine, SessionLocal
+from .connection import get_db, get_async_db, engine, async_engine, SessionLocal, AsyncSessionLocal
 
-__all__ = ["Base", "get_db", "engine", "SessionLocal"]
+__all__ = ["Base", "get_db", "get_async_db", "engine", "async_engine", "SessionLocal", "AsyncSessionLocal"]
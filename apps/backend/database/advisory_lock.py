@@ -0,0 +1,38 @@
+"""
+PostgreSQL advisory locks, so work that every worker starts at boot (migrations,
+the retention pruner) runs in one worker at a time
+"""
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+# Lock keys, one per job; any 64-bit integer not used elsewhere on the database
+MIGRATION_LOCK_KEY = 7_351_001
+PRUNE_LOCK_KEY = 7_351_002
+
+
+@contextmanager
+def advisory_lock(engine: Engine, key: int, wait: bool = True) -> Iterator[bool]:
+    """
+    Hold a session-level advisory lock on its own connection for the block.
+    Yields whether the lock is held: with wait=False it is False when another
+    process holds it. Other databases have no advisory locks and always yield True.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as connection:
+        if wait:
+            connection.execute(select(func.pg_advisory_lock(key)))
+            acquired = True
+        else:
+            acquired = bool(connection.scalar(select(func.pg_try_advisory_lock(key))))
+        connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(select(func.pg_advisory_unlock(key)))
+                connection.commit()
@@ -1,9 +1,13 @@
 import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-from typing import Generator
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, SingletonThreadPool, StaticPool
+from typing import Any, AsyncGenerator, Callable, Dict, Generator
+
+from .pool_metrics import PoolMetrics
 
 # Get database URL from environment
 DATABASE_URL = os.getenv("DB_URL", "sqlite:///./data/home_inspection.db")
@@ -16,19 +20,144 @@ if DATABASE_URL.startswith("sqlite"):
         db_file = Path(db_path)
         db_file.parent.mkdir(parents=True, exist_ok=True)
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+# Pool settings for QueuePool-backed engines (PostgreSQL, and SQLite files in "queue" mode)
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+}
+
+# SQLite pool mode:
+#   queue  - pool of connections shared across threads (default for database files)
+#   thread - one connection per thread (sync engine only)
+#   null   - open and close a connection per checkout
+#   static - a single shared connection (always used for in-memory databases)
+SQLITE_POOL_MODE = os.getenv("SQLITE_POOL_MODE", "queue").lower()
+
+# PRAGMAs applied to every new SQLite connection, in order. Each one can be
+# overridden with SQLITE_PRAGMA_<NAME> (e.g. SQLITE_PRAGMA_SYNCHRONOUS=FULL);
+# an empty value leaves SQLite's default in place.
+SQLITE_PRAGMA_DEFAULTS = {
+    "busy_timeout": "5000",       # ms to wait on a locked database instead of failing
+    "journal_mode": "WAL",        # readers no longer block behind the writer
+    "synchronous": "NORMAL",      # fsync at checkpoints only; safe with WAL
+    "mmap_size": "268435456",     # 256 MB of memory-mapped reads
+    "cache_size": "-65536",       # 64 MB page cache (negative values are KiB)
+    "temp_store": "MEMORY",       # sorts and temp indexes stay off disk
+}
+
+
+def sqlite_pragmas() -> Dict[str, str]:
+    """
+    SQLite PRAGMA settings after applying SQLITE_PRAGMA_<NAME> overrides
+    """
+    pragmas = {}
+    for name, default in SQLITE_PRAGMA_DEFAULTS.items():
+        value = os.getenv(f"SQLITE_PRAGMA_{name.upper()}", default).strip()
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+SQLITE_PRAGMAS = sqlite_pragmas()
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Build create_engine/create_async_engine keyword arguments for a database URL
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return dict(POOL_SETTINGS)
+
+    options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+    mode = "static" if _is_sqlite_memory(parsed) else SQLITE_POOL_MODE
+
+    if mode == "static":
+        options["poolclass"] = StaticPool
+    elif mode == "null":
+        options["poolclass"] = NullPool
+    elif mode == "thread" and not is_async:
+        options["poolclass"] = SingletonThreadPool
+        options["pool_size"] = POOL_SETTINGS["pool_size"]
+    elif mode in ("queue", "thread"):
+        # aiosqlite already gives each connection its own thread, so
+        # "thread" mode maps onto the regular pool for the async engine
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+        options.update(POOL_SETTINGS)
+    else:
+        raise ValueError(f"Unknown SQLITE_POOL_MODE '{SQLITE_POOL_MODE}'")
+
+    return options
+
+
+def sqlite_pragma_hook(pragmas: Dict[str, str]) -> Callable:
+    """
+    Build a "connect" event listener that applies PRAGMAs to each new connection
+    """
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # In-memory databases report journal_mode "memory" and ignore WAL
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return set_sqlite_pragmas
+
+
 # Create engine with appropriate configuration
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers used for each sync backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Derive the asyncio driver URL for a sync database URL
+    (e.g. "sqlite:///./data/home_inspection.db" -> "sqlite+aiosqlite:///./data/home_inspection.db")
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+# Async engine used by the request-serving routes; DB_ASYNC_URL overrides the derived URL
+ASYNC_DATABASE_URL = os.getenv("DB_ASYNC_URL") or to_async_url(DATABASE_URL)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+
+# Objects stay readable after commit, since lazy reloads are not possible under asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", sqlite_pragma_hook(SQLITE_PRAGMAS))
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", sqlite_pragma_hook(SQLITE_PRAGMAS))
+
+# Pool checkout/wait metrics, served by /health/db
+sync_pool_metrics = PoolMetrics("sync").instrument(engine)
+async_pool_metrics = PoolMetrics("async").instrument(async_engine.sync_engine)
+
 
 def get_db() -> Generator:
     """
@@ -36,6 +165,20 @@ def get_db() -> Generator:
     """
     db = SessionLocal()
     try:
+        # Acquire the connection up front so pool wait time is measured
+        with sync_pool_metrics.measure_wait():
+            db.connection()
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        # Acquire the connection up front so pool wait time is measured
+        with async_pool_metrics.measure_wait():
+            await db.connection()
+        yield db
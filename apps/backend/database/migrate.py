@@ -0,0 +1,65 @@
+"""
+Schema migrations, applied with Alembic at startup (DB_MIGRATE_ON_STARTUP) or
+once before the workers start with `python -m database.migrate [revision]`.
+Revisions live in database/migrations/versions; create new ones with
+`alembic revision --autogenerate -m "..."` from apps/backend.
+"""
+import sys
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.advisory_lock import MIGRATION_LOCK_KEY, advisory_lock
+from database.base import Base
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """
+    Alembic config for the backend, optionally bound to an open connection
+    """
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "database" / "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(engine: Engine, revision: str = "head") -> None:
+    """
+    Upgrade the schema to the given revision.
+    Databases created by create_all have tables but no alembic_version: one
+    that already matches the models (create_all from the current code, as
+    seed_data.py and the benchmarks do) is stamped at head, anything else
+    predates migrations and is stamped at the baseline first.
+    On PostgreSQL, workers starting together wait on an advisory lock and find
+    the schema already upgraded by the first.
+    """
+    with advisory_lock(engine, MIGRATION_LOCK_KEY), engine.begin() as connection:
+        tables = set(inspect(connection).get_table_names())
+        config = alembic_config(connection)
+        if "alembic_version" not in tables and "readings" in tables:
+            if not compare_metadata(MigrationContext.configure(connection), Base.metadata):
+                command.stamp(config, "head")
+            else:
+                command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    from database.connection import engine
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "head"
+    upgrade_database(engine, target)
+    print(f"✅ Database schema migrated to {target}")
@@ -0,0 +1,65 @@
+"""
+Alembic environment
+Runs against the engine from database.connection (DB_URL), or against a
+connection passed in through config.attributes by database.migrate.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.base import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """
+    Emit SQL to stdout instead of running it (alembic upgrade head --sql)
+    """
+    from database.connection import DATABASE_URL
+
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is None:
+        # Command-line run: use the app's logging config and engine
+        if config.config_file_name is not None:
+            fileConfig(config.config_file_name)
+
+        from database.connection import engine
+
+        with engine.connect() as connection:
+            _run_with(connection)
+    else:
+        _run_with(connection)
+
+
+def _run_with(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most things in place; batch mode rebuilds the table
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
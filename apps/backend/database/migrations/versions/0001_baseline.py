@@ -0,0 +1,148 @@
+"""baseline schema
+
+The schema as created by Base.metadata.create_all before migrations were
+introduced, including the self-learning fields from add_learning_fields.py.
+Existing databases are stamped at this revision rather than upgraded through it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_indexes(table: str, columns: Sequence[str]) -> None:
+    for column in columns:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sensors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sensor_id', sa.String(length=100), nullable=False),
+        sa.Column('vendor', sa.String(length=100), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sensor_id', name='uq_sensor_id'),
+    )
+    _create_indexes('sensors', ['id'])
+    op.create_index('ix_sensors_sensor_id', 'sensors', ['sensor_id'], unique=True)
+
+    op.create_table(
+        'readings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sensor_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('location', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('unit', sa.String(length=20), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('calibration_json', sa.JSON(), nullable=True),
+        sa.Column('extras_json', sa.JSON(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['sensor_id'], ['sensors.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_indexes('readings', ['id', 'sensor_id', 'type', 'location', 'timestamp'])
+
+    op.create_table(
+        'issues',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('issue_type', sa.String(length=100), nullable=False),
+        sa.Column('severity', sa.String(length=10), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('recommendation', sa.Text(), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('component', sa.String(length=100), nullable=True),
+        sa.Column('image_data', sa.Text(), nullable=True),
+        sa.Column('metadata_json', sa.JSON(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('resolved', sa.String(length=10), nullable=False),
+        sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('user_validated', sa.Boolean(), nullable=False),
+        sa.Column('user_validation_result', sa.String(length=20), nullable=True),
+        sa.Column('expert_reviewed', sa.Boolean(), nullable=False),
+        sa.Column('expert_feedback', sa.JSON(), nullable=True),
+        sa.Column('actual_severity', sa.String(length=10), nullable=True),
+        sa.Column('resolution_status', sa.String(length=20), nullable=True),
+        sa.Column('resolution_notes', sa.Text(), nullable=True),
+        sa.Column('learning_score', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_indexes('issues', [
+        'id', 'issue_type', 'severity', 'location', 'component', 'detected_at',
+        'user_validated', 'expert_reviewed', 'actual_severity', 'resolution_status', 'learning_score',
+    ])
+
+    op.create_table(
+        'feedbacks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('issue_id', sa.Integer(), nullable=False),
+        sa.Column('feedback_type', sa.String(length=50), nullable=False),
+        sa.Column('original_result', sa.JSON(), nullable=False),
+        sa.Column('actual_result', sa.JSON(), nullable=True),
+        sa.Column('differences', sa.JSON(), nullable=True),
+        sa.Column('feedback_data', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('source', sa.String(length=50), nullable=True),
+        sa.ForeignKeyConstraint(['issue_id'], ['issues.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_indexes('feedbacks', ['id', 'issue_id', 'feedback_type', 'created_at'])
+
+    op.create_table(
+        'training_data',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('issue_id', sa.Integer(), nullable=False),
+        sa.Column('cleaned_status', sa.String(length=20), nullable=False),
+        sa.Column('quality_score', sa.Float(), nullable=True),
+        sa.Column('standardized_data', sa.JSON(), nullable=False),
+        sa.Column('labels', sa.JSON(), nullable=False),
+        sa.Column('used_for_training', sa.Boolean(), nullable=False),
+        sa.Column('training_version', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('cleaned_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['issue_id'], ['issues.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_indexes('training_data', [
+        'id', 'issue_id', 'cleaned_status', 'quality_score', 'used_for_training', 'training_version', 'created_at',
+    ])
+
+    op.create_table(
+        'model_versions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('model_type', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.String(length=20), nullable=False),
+        sa.Column('training_data_range', sa.JSON(), nullable=True),
+        sa.Column('performance_metrics', sa.JSON(), nullable=False),
+        sa.Column('model_file_path', sa.String(length=255), nullable=True),
+        sa.Column('prompt_template', sa.Text(), nullable=True),
+        sa.Column('deployed', sa.Boolean(), nullable=False),
+        sa.Column('deployed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_indexes('model_versions', ['id', 'model_type', 'version', 'deployed', 'created_at'])
+
+
+def downgrade() -> None:
+    for table in ('model_versions', 'training_data', 'feedbacks', 'issues', 'readings', 'sensors'):
+        op.drop_table(table)
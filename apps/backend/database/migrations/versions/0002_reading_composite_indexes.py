@@ -0,0 +1,38 @@
+"""reading composite indexes
+
+Reading queries filter on sensor, type or location and then ORDER BY
+timestamp DESC LIMIT n. A (column, timestamp) index serves both the filter
+and the ordering, so no sort is needed. The single-column sensor_id, type
+and location indexes are prefixes of the new ones and only cost writes, so
+they are dropped.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ('sensor_id', 'type', 'location')
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        op.create_index(f'ix_readings_{column}_timestamp', 'readings', [column, 'timestamp'])
+        op.drop_index(f'ix_readings_{column}', table_name='readings')
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.create_index(f'ix_readings_{column}', 'readings', [column])
+        op.drop_index(f'ix_readings_{column}_timestamp', table_name='readings')
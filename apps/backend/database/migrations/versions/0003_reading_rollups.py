@@ -0,0 +1,47 @@
+"""reading rollups
+
+1-minute and 1-hour aggregates per sensor, type and location, maintained at
+ingest. Run rebuild_rollups.py afterwards to roll up readings that already exist.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reading_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tier', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('sensor_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('location', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum_value', sa.Float(), nullable=False),
+        sa.Column('min_value', sa.Float(), nullable=False),
+        sa.Column('max_value', sa.Float(), nullable=False),
+        sa.Column('sum_confidence', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['sensor_id'], ['sensors.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tier', 'sensor_id', 'bucket_start', 'type', 'location', name='uq_reading_rollups_bucket'),
+    )
+    op.create_index('ix_reading_rollups_tier_bucket_start', 'reading_rollups', ['tier', 'bucket_start'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reading_rollups_tier_bucket_start', table_name='reading_rollups')
+    op.drop_table('reading_rollups')
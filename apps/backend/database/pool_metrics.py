@@ -0,0 +1,127 @@
+"""
+Connection pool instrumentation for sizing pools against real concurrency
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMetrics:
+    """
+    Counters for one engine's connection pool.
+
+    Checkout, checkin and connect counts come from pool events. Wait time is
+    the time a session dependency spends acquiring its first connection, which
+    is where requests queue when the pool is exhausted.
+    """
+
+    def __init__(self, name: str, sample_size: int = 1000):
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=sample_size)
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_hold_seconds = 0.0
+        self.max_hold_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._engine = None
+
+    def instrument(self, engine: Engine) -> "PoolMetrics":
+        """
+        Attach pool event listeners to a (sync) engine
+        """
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        return self
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(0, self.in_use - 1)
+            if checked_out_at is not None:
+                held = time.perf_counter() - checked_out_at
+                self.total_hold_seconds += held
+                self.max_hold_seconds = max(self.max_hold_seconds, held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    @contextmanager
+    def measure_wait(self) -> Iterator[None]:
+        """
+        Time a connection checkout, counting pool timeouts
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except PoolTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self.record_wait(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current counters plus pool occupancy, for the health endpoint
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            checkins = self.checkins
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "avg_hold_ms": (self.total_hold_seconds / checkins * 1000) if checkins else 0.0,
+                "max_hold_ms": self.max_hold_seconds * 1000,
+                "wait_samples": len(waits),
+                "avg_wait_ms": (sum(waits) / len(waits) * 1000) if waits else 0.0,
+                "p95_wait_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+        pool = self._engine.pool if self._engine is not None else None
+        if pool is not None:
+            data["pool_class"] = type(pool).__name__
+            data["pool_status"] = pool.status()
+            for attr in ("size", "checkedout", "overflow", "checkedin"):
+                method = getattr(pool, attr, None)
+                if callable(method):
+                    data[f"pool_{attr}"] = method()
+        return data
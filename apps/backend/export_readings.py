@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Export readings to Parquet, Arrow IPC, CSV or NDJSON
+Readings are fetched from a server-side cursor in column batches and written as
+they arrive, so exports of millions of rows run in constant memory.
+
+Usage:
+    python export_readings.py readings.parquet
+    python export_readings.py readings.arrow --type temperature --start 2026-01-01T00:00:00
+    python export_readings.py - --format ndjson --sensor-id temp_001 > temp_001.ndjson
+
+Load the result with pandas.read_parquet(path) or
+pyarrow.ipc.open_stream(path).read_pandas().
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.connection import SessionLocal
+from services.reading_export import ENCODERS, encode_chunks, export_chunk_size
+from services.readings_service import ReadingsService
+from services.sensor_service import SensorService
+
+FORMAT_SUFFIXES = {".parquet": "parquet", ".arrow": "arrow", ".arrows": "arrow",
+                   ".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export sensor readings")
+    parser.add_argument("output", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=list(ENCODERS),
+                        help="defaults to the output file's suffix, else parquet")
+    parser.add_argument("--sensor-id", help="external sensor id")
+    parser.add_argument("--type")
+    parser.add_argument("--location")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ISO timestamp (inclusive)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ISO timestamp (exclusive)")
+    parser.add_argument("--chunk-size", type=int, help="rows per batch")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    fmt = args.format or FORMAT_SUFFIXES.get(Path(args.output).suffix.lower(), "parquet")
+
+    db = SessionLocal()
+    try:
+        sensor_pk = None
+        if args.sensor_id:
+            sensor = SensorService(db).get_sensor_by_id(args.sensor_id)
+            if not sensor:
+                print(f"❌ Sensor with ID {args.sensor_id} not found", file=sys.stderr)
+                return 1
+            sensor_pk = sensor.id
+
+        chunks = ReadingsService(db).iter_readings(
+            sensor_pk, args.type, args.location, args.start, args.end,
+            chunk_size=args.chunk_size or export_chunk_size(fmt)
+        )
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for data in encode_chunks(counted(), fmt):
+                out.write(data)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        print(f"✅ Exported {rows} readings as {fmt} to {args.output}", file=sys.stderr)
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -17,14 +18,25 @@ from api.issue_routes import router as issue_router
 from api.rag_routes import router as rag_router
 from api.report_routes import router as report_router
 from api.sensor_routes import router as sensor_router
-from api.websocket_routes import router as websocket_router
+from api.websocket_routes import router as websocket_router, manager as websocket_manager
 from api.storage_routes import router as storage_router
 from api.feedback_routes import router as feedback_router
 from api.cleaning_routes import router as cleaning_router
 from api.training_routes import router as training_router
 from api.performance_routes import router as performance_router
-from database.base import Base
-from database.connection import engine
+from database.connection import engine, async_engine, SessionLocal, sync_pool_metrics, async_pool_metrics
+from database.migrate import upgrade_database
+from services.current_readings import current_readings
+from services.http_clients import http_clients
+from services.reading_window import reading_window
+from services.ingest_buffer import ingest_buffer
+from services.reading_bus import reading_bus
+from services.rollup_service import PRUNE_INTERVAL_SECONDS, run_pruner
+from services.sensor_id_cache import sensor_id_cache
+
+# Migrate at startup (under an advisory lock on PostgreSQL). Set false when
+# `python -m database.migrate` runs once before the workers start instead.
+MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
 
 
 @asynccontextmanager
@@ -35,14 +47,59 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Home Inspection Backend API...")
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created/verified")
+    # Create or migrate database tables
+    if MIGRATE_ON_STARTUP:
+        upgrade_database(engine)
+        print("✅ Database schema migrated to latest revision")
+    
+    # Warm the sensor-id cache so steady-state ingest needs no sensor lookups
+    db = SessionLocal()
+    try:
+        cached = sensor_id_cache.warm(db)
+        print(f"✅ Sensor-id cache warmed with {cached} sensors")
+        # Current values are then kept up to date from the reading bus
+        streams = current_readings.warm(db)
+        reading_bus.add_listener(current_readings.on_event)
+        print(f"✅ Current readings warmed for {streams} sensor streams")
+        recent = reading_window.warm(db)
+        reading_bus.add_listener(reading_window.on_event)
+        print(f"✅ Reading window warmed with {recent} readings from the last {reading_window.window_seconds}s")
+    finally:
+        db.close()
+    
+    # Prune raw readings and rollups past their retention windows; each worker
+    # runs a pruner, but on PostgreSQL only one prunes at a time
+    pruner = asyncio.create_task(run_pruner(SessionLocal)) if PRUNE_INTERVAL_SECONDS > 0 else None
+    
+    # Fan ingested readings out to WebSocket clients, through the broker so
+    # batches ingested by any worker reach clients on every worker
+    await reading_bus.broker.start()
+    print(f"✅ Reading bus broker: {reading_bus.broker.stats()['backend']}")
+    broadcaster = asyncio.create_task(websocket_manager.consume(reading_bus))
+    
+    # Group-commit readings from the device ingest WebSocket, and from
+    # POST /api/sensor/data unless INGEST_DURABILITY=sync
+    ingest_buffer.start()
+    print(f"✅ Ingest durability: {ingest_buffer.durability}")
+    
+    # Pooled clients for the RAG sidecar and the vision API
+    await http_clients.start()
+    print(f"✅ Outbound HTTP clients ready (HTTP/2: {'on' if http_clients.http2 else 'off'})")
     
     yield
     
     # Shutdown
     print("🛑 Shutting down Home Inspection Backend API...")
+    # Write buffered readings before the engine goes away
+    await ingest_buffer.stop()
+    await http_clients.stop()
+    broadcaster.cancel()
+    await reading_bus.broker.stop()
+    reading_bus.remove_listener(current_readings.on_event)
+    reading_bus.remove_listener(reading_window.on_event)
+    if pruner:
+        pruner.cancel()
+    await async_engine.dispose()
 
 
 # Create FastAPI application
@@ -62,6 +119,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -107,6 +165,25 @@ async def health_check():
     }
 
 
+@app.get("/health/db")
+async def database_health_check():
+    """
+    Connection pool occupancy and checkout/wait metrics for both engines
+    """
+    return {
+        "sync": sync_pool_metrics.snapshot(),
+        "async": async_pool_metrics.snapshot()
+    }
+
+
+@app.get("/health/ingest")
+async def ingest_health_check():
+    """
+    Ingest buffer queue depth and group-commit flush latency
+    """
+    return ingest_buffer.stats()
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """
@@ -118,7 +195,8 @@ async def http_exception_handler(request, exc):
             "error": exc.detail,
             "status_code": exc.status_code,
             "path": str(request.url)
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -153,5 +231,7 @@ if __name__ == "__main__":
         host=host,
         port=port,
         reload=debug,
-        log_level="info" if not debug else "debug"
+        log_level="info" if not debug else "debug",
+        # Compress WebSocket frames for clients that offer it (the sensor stream)
+        ws_per_message_deflate=True
     )
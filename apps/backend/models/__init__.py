@@ -1,8 +1,9 @@
 from .sensor import Sensor
 from .reading import Reading
+from .reading_rollup import ReadingRollup
 from .issue import Issue
 from .feedback import Feedback
 from .training_data import TrainingData
 from .model_version import ModelVersion
 
-__all__ = ["Sensor", "Reading", "Issue", "Feedback", "TrainingData", "ModelVersion"]
+__all__ = ["Sensor", "Reading", "ReadingRollup", "Issue", "Feedback", "TrainingData", "ModelVersion"]
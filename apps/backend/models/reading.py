@@ -1,16 +1,29 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.base import Base
 
 
+def normalize_location(location: str) -> str:
+    return location.lower()
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Readings are stored as naive UTC; PostgreSQL drivers and clients may hand back aware values"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 class Reading(Base):
     __tablename__ = "readings"
     
     id = Column(Integer, primary_key=True, index=True)
-    sensor_id = Column(Integer, ForeignKey("sensors.id"), nullable=False, index=True)
-    type = Column(String(50), nullable=False, index=True)
-    location = Column(String(100), nullable=False, index=True)
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), nullable=False)
+    type = Column(String(50), nullable=False)
+    location = Column(String(100), nullable=False)
     value = Column(Float, nullable=False)
     unit = Column(String(20), nullable=False)
     confidence = Column(Float, nullable=False)
@@ -22,5 +35,17 @@ class Reading(Base):
     # Relationship to sensor
     sensor = relationship("Sensor", back_populates="readings")
     
+    # Reading queries filter on one of these columns, then ORDER BY timestamp DESC LIMIT n;
+    # (column, timestamp) serves both, so no sort step is needed
+    __table_args__ = (
+        Index("ix_readings_sensor_id_timestamp", "sensor_id", "timestamp"),
+        Index("ix_readings_type_timestamp", "type", "timestamp"),
+        Index("ix_readings_location_timestamp", "location", "timestamp"),
+    )
+    
     def __repr__(self):
         return f"<Reading(id={self.id}, sensor_id={self.sensor_id}, type='{self.type}', value={self.value})>"
+
+
+# Columns readings are returned, streamed and exported with
+READING_COLUMNS = list(Reading.__table__.c)
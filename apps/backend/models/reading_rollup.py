@@ -0,0 +1,30 @@
+"""
+ReadingRollup model for downsampled reading aggregates
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from database.base import Base
+
+
+class ReadingRollup(Base):
+    __tablename__ = "reading_rollups"
+
+    id = Column(Integer, primary_key=True)
+    tier = Column(String(8), nullable=False)  # "1m", "1h"
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    sensor_id = Column(Integer, ForeignKey("sensors.id"), nullable=False)
+    type = Column(String(50), nullable=False)
+    location = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False)
+    sum_value = Column(Float, nullable=False)  # avg = sum_value / count, kept additive for incremental updates
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    sum_confidence = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Upsert target; also serves per-sensor range scans
+        UniqueConstraint("tier", "sensor_id", "bucket_start", "type", "location", name="uq_reading_rollups_bucket"),
+        Index("ix_reading_rollups_tier_bucket_start", "tier", "bucket_start"),
+    )
+
+    def __repr__(self):
+        return f"<ReadingRollup(tier='{self.tier}', bucket_start={self.bucket_start}, sensor_id={self.sensor_id}, count={self.count})>"
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Recompute reading rollups from raw readings
+Use after upgrading to the rollup schema, or after loading readings outside the API.
+
+Usage:
+    python rebuild_rollups.py                          # from the oldest raw reading
+    python rebuild_rollups.py 2026-01-01T00:00:00      # from a given UTC time
+"""
+import os
+import sys
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.connection import SessionLocal, engine
+from database.migrate import upgrade_database
+from services.rollup_service import RollupService
+
+
+def main():
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    upgrade_database(engine)
+
+    db = SessionLocal()
+    try:
+        print("🔄 Rebuilding reading rollups...")
+        total = RollupService(db).rebuild(since)
+        print(f"✅ Rolled up {total} readings")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from .sensor import SensorData, SensorOut
-from .reading import ReadingData, ReadingOut, ReadingFilter
+from .reading import ReadingData, ReadingOut, ReadingFilter, IngestMessage, StreamSubscription
 
-__all__ = ["SensorData", "SensorOut", "ReadingData", "ReadingOut", "ReadingFilter"]
+__all__ = ["SensorData", "SensorOut", "ReadingData", "ReadingOut", "ReadingFilter", "IngestMessage",
+           "StreamSubscription"]
@@ -53,9 +53,31 @@ class ReadingFilter(BaseModel):
     location: Optional[str] = Field(None, description="Filter by location")
     since: Optional[datetime] = Field(None, description="Filter readings since this time")
     limit: Optional[int] = Field(100, ge=1, le=1000, description="Maximum number of readings to return")
+    cursor: Optional[str] = Field(None, description="Page cursor from a previous response's X-Next-Cursor header")
 
 
 class SensorDataBatch(BaseModel):
     """Schema for batch sensor data submission"""
     sensors: List[SensorData] = Field(..., min_items=1, description="List of sensor data")
     readings: List[ReadingData] = Field(..., min_items=1, description="List of reading data")
+
+
+class IngestMessage(BaseModel):
+    """One message on the device ingest WebSocket; sensors need only be sent once per connection"""
+    seq: Optional[int] = Field(None, description="Device sequence number, echoed in the ack")
+    sensors: List[SensorData] = Field([], description="Sensors to upsert before the readings")
+    readings: List[ReadingData] = Field([], description="Readings to store")
+
+
+class StreamSubscription(BaseModel):
+    """Filters a sensor stream WebSocket client subscribes with; empty lists match everything"""
+    sensor_ids: List[str] = Field([], max_items=1000, description="External sensor identifiers")
+    types: List[str] = Field([], max_items=100, description="Reading types")
+    location_prefixes: List[str] = Field([], max_items=100, description="Location prefixes, e.g. 'basement'")
+    min_interval: float = Field(0.0, ge=0.0, le=3600.0, description="Minimum seconds between readings of one sensor")
+    
+    @validator('location_prefixes', each_item=True)
+    def validate_prefix(cls, v):
+        if not v:
+            raise ValueError('location prefixes must not be empty')
+        return v
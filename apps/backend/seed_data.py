@@ -14,7 +14,7 @@ import random
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database.connection import SessionLocal, engine
-from database.base import Base
+from database.migrate import upgrade_database
 from models.sensor import Sensor
 from models.reading import Reading
 from schemas.sensor import SensorData
@@ -201,8 +201,8 @@ def main():
     """Main seed data function"""
     print("🌱 Starting Home Inspection System seed data...")
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade database tables
+    upgrade_database(engine)
     print("✅ Database tables created/verified")
     
     # Create sensors
@@ -0,0 +1,203 @@
+"""
+Message brokers behind the reading bus
+The in-memory broker delivers published events straight to this process's
+subscribers. The Redis broker publishes them on a Redis (or Redis-compatible)
+pub/sub channel and delivers whatever arrives on it, so a batch ingested by
+one uvicorn worker reaches WebSocket clients connected to every worker.
+Choose with BROKER_URL: unset or "memory" for in-memory, redis://... for Redis.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+import orjson
+
+BROKER_URL = os.getenv("BROKER_URL", "memory")
+BROKER_CHANNEL = os.getenv("BROKER_CHANNEL", "home_inspection:sensor_stream")
+# Events waiting to be sent to Redis before the oldest are dropped
+BROKER_OUTBOX_SIZE = int(os.getenv("BROKER_OUTBOX_SIZE", "1000"))
+BROKER_RECONNECT_SECONDS = 1.0
+
+
+class ReadingBatch(NamedTuple):
+    """A committed ingest batch as published on the bus"""
+    readings: List[Dict[str, Any]]
+    # Sensor primary key -> external sensor_id, for subscription routing
+    sensor_keys: Dict[int, str]
+
+
+class Broadcast(NamedTuple):
+    """A serialized frame for every client; frames with the same key coalesce"""
+    message: str
+    key: Optional[str] = None
+
+
+# Plain strings are broadcasts without a coalescing key
+Event = Union[ReadingBatch, Broadcast, str]
+
+_DATETIME_FIELDS = ("timestamp", "created_at")
+
+
+def encode_event(event: Event) -> bytes:
+    """Wire format shared by every worker"""
+    if isinstance(event, ReadingBatch):
+        return orjson.dumps({
+            "kind": "readings",
+            "readings": event.readings,
+            "sensor_keys": {str(pk): sensor_id for pk, sensor_id in event.sensor_keys.items()}
+        })
+    if isinstance(event, str):
+        event = Broadcast(event)
+    return orjson.dumps({"kind": "broadcast", "message": event.message, "key": event.key})
+
+
+def decode_event(data: Union[bytes, str]) -> Event:
+    payload = orjson.loads(data)
+    if payload["kind"] == "readings":
+        readings = payload["readings"]
+        # Subscription throttling compares timestamps, so restore them
+        for reading in readings:
+            for field in _DATETIME_FIELDS:
+                if isinstance(reading.get(field), str):
+                    reading[field] = datetime.fromisoformat(reading[field])
+        return ReadingBatch(readings, {int(pk): sensor_id for pk, sensor_id in payload["sensor_keys"].items()})
+    return Broadcast(payload["message"], payload.get("key"))
+
+
+class InMemoryBroker:
+    """Single-process broker: publishing is delivery"""
+
+    # Whether other processes may be listening, so events are worth publishing with no local subscribers
+    remote = False
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[Event], None]] = None
+
+    def attach(self, deliver: Callable[[Event], None]) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, event: Event) -> None:
+        if self._deliver:
+            self._deliver(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory"}
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Pub/sub over one Redis channel.
+
+    publish() never blocks ingest: events are queued in a bounded outbox and
+    sent by a background task. Every worker, including the publisher, receives
+    events from the channel, so local and remote clients see the same order.
+    A lost connection is retried; events published meanwhile are dropped
+    rather than replayed, like any missed pub/sub message.
+    """
+
+    remote = True
+
+    def __init__(self, url: str, channel: str = BROKER_CHANNEL, outbox_size: int = BROKER_OUTBOX_SIZE):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_size)
+        self._client = None
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    async def start(self) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("redis is required for BROKER_URL=redis://... (pip install redis)") from e
+        self._client = redis.from_url(self.url)
+        subscribed = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._listen(subscribed)),
+            asyncio.create_task(self._send()),
+        ]
+        # Don't report ready until this worker will see its own events
+        await asyncio.wait_for(subscribed.wait(), timeout=10)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def publish(self, event: Event) -> None:
+        if self._outbox.full():
+            self._outbox.get_nowait()
+            self.dropped += 1
+        self._outbox.put_nowait(encode_event(event))
+
+    async def _send(self) -> None:
+        while True:
+            data = await self._outbox.get()
+            try:
+                await self._client.publish(self.channel, data)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Broker publish failed: {e}")
+
+    async def _listen(self, subscribed: asyncio.Event) -> None:
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self.received += 1
+                    try:
+                        event = decode_event(message["data"])
+                    except (ValueError, KeyError, TypeError) as e:
+                        self.errors += 1
+                        print(f"⚠️ Ignoring malformed broker message: {e}")
+                        continue
+                    if self._deliver:
+                        self._deliver(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Broker subscription lost ({e}); reconnecting")
+                await asyncio.sleep(BROKER_RECONNECT_SECONDS)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "channel": self.channel,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "outbox": self._outbox.qsize()
+        }
+
+
+def create_broker(url: str = BROKER_URL) -> InMemoryBroker:
+    """Broker for a BROKER_URL"""
+    if not url or url == "memory":
+        return InMemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported BROKER_URL: {url}")
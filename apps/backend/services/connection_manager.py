@@ -0,0 +1,270 @@
+"""
+WebSocket connection registry and per-connection writers
+broadcast() only enqueues; each connection has its own bounded send queue and
+writer task, so one slow client never delays delivery to the others. Reading
+batches are routed through the subscription index, so clients only receive
+readings matching their filters. Clients on the compact protocol get
+reading batches delta-encoded per connection (services/stream_codec.py).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from schemas.reading import StreamSubscription
+from services.reading_bus import Broadcast, ReadingBatch, ReadingBus, readings_message
+from services.stream_codec import DeltaEncoder
+from services.subscription_index import SubscriptionGroup, SubscriptionIndex
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+# A client that cannot take one frame in this long is treated as gone
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# Readings merged into one pending compact frame before a new frame is started
+MAX_READINGS_PER_FRAME = 1000
+
+
+class ClientConnection:
+    """
+    One WebSocket client: a bounded queue of pending frames and the task that writes them.
+
+    Slow consumers are handled in two ways:
+    - coalesce: a frame enqueued with a key replaces a still-pending frame with
+      the same key (e.g. repeated updates for one sensor), keeping its place;
+    - drop-oldest: when the queue is full the oldest pending frame is dropped.
+
+    With an encoder (compact protocol), readings are queued unserialized,
+    merged into the newest pending frame, and delta-encoded when sent; with
+    batch_seconds the writer waits that long before each flush.
+    """
+
+    def __init__(self, websocket: Any, maxsize: int = SEND_QUEUE_SIZE,
+                 send_timeout: float = SEND_TIMEOUT_SECONDS,
+                 encoder: Optional[DeltaEncoder] = None, batch_seconds: float = 0.0):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.send_timeout = send_timeout
+        self.encoder = encoder
+        self.batch_seconds = batch_seconds
+        # Entries are [key, message, enqueued_at], message being a str or, for the
+        # compact protocol, a list of readings; keyed entries are also indexed for coalescing
+        self._pending: Deque[List[Any]] = deque()
+        self._keyed: Dict[str, List[Any]] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.connected_at = time.monotonic()
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_queued = 0
+        self.last_send_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self, on_error) -> None:
+        self._task = asyncio.create_task(self._writer(on_error))
+
+    def close(self) -> None:
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._pending.clear()
+        self._keyed.clear()
+
+    def enqueue(self, message: Any, key: Optional[str] = None) -> None:
+        """Queue a frame without blocking"""
+        if key is not None and key in self._keyed:
+            entry = self._keyed[key]
+            entry[1] = message
+            self.coalesced += 1
+            return
+
+        if len(self._pending) >= self.maxsize:
+            oldest = self._pending.popleft()
+            if oldest[0] is not None:
+                self._keyed.pop(oldest[0], None)
+            self.dropped += 1
+
+        entry = [key, message, time.monotonic()]
+        self._pending.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        self.max_queued = max(self.max_queued, len(self._pending))
+        self._ready.set()
+
+    def enqueue_readings(self, readings: List[Dict[str, Any]]) -> None:
+        """Queue readings for the compact protocol, joining the newest pending frame if it has room"""
+        tail = self._pending[-1] if self._pending else None
+        if tail is not None and isinstance(tail[1], list) and len(tail[1]) < MAX_READINGS_PER_FRAME:
+            tail[1].extend(readings)
+            self._ready.set()
+            return
+        self.enqueue(list(readings))
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def lag_seconds(self) -> float:
+        """How long the oldest pending frame has been waiting"""
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - self._pending[0][2]
+
+    async def _writer(self, on_error) -> None:
+        while True:
+            await self._ready.wait()
+            if self.batch_seconds:
+                # Let readings arriving in the window join the pending frame
+                await asyncio.sleep(self.batch_seconds)
+            while self._pending:
+                key, message, enqueued_at = self._pending.popleft()
+                if key is not None:
+                    self._keyed.pop(key, None)
+                if not isinstance(message, str):
+                    message = self.encoder.encode(message)
+                started = time.monotonic()
+                try:
+                    # asyncio.timeout rather than wait_for: no extra task per frame
+                    async with asyncio.timeout(self.send_timeout):
+                        await self.websocket.send_text(message)
+                except Exception:
+                    on_error(self.websocket)
+                    # A stalled client may still be connected; close it so its receive loop ends too
+                    try:
+                        await asyncio.wait_for(self.websocket.close(code=1013), 1.0)
+                    except Exception:
+                        pass
+                    return
+                finished = time.monotonic()
+                self.sent += 1
+                self.bytes_sent += len(message)
+                self.last_send_seconds = finished - started
+                self.max_lag_seconds = max(self.max_lag_seconds, finished - enqueued_at)
+            self._ready.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "protocol": "json" if self.encoder is None else "compact",
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "lag_seconds": round(self.lag_seconds(), 6),
+            "max_lag_seconds": round(self.max_lag_seconds, 6),
+            "last_send_seconds": round(self.last_send_seconds, 6),
+            "connected_seconds": round(time.monotonic() - self.connected_at, 3)
+        }
+
+
+class ConnectionManager:
+    """
+    Registry of connected clients, keyed by WebSocket for O(1) add and remove
+    """
+
+    def __init__(self, queue_size: int = SEND_QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT_SECONDS):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[Any, ClientConnection] = {}
+        self.subscriptions = SubscriptionIndex()
+
+    async def connect(self, websocket: Any, compact: bool = False, batch_ms: int = 0) -> ClientConnection:
+        """
+        Accept a client; compact selects delta-encoded reading frames and
+        batch_ms the interval at which its frames are flushed
+        """
+        await websocket.accept()
+        connection = ClientConnection(websocket, self.queue_size, self.send_timeout,
+                                      encoder=DeltaEncoder() if compact else None,
+                                      batch_seconds=batch_ms / 1000)
+        self.active_connections[websocket] = connection
+        # Until a client subscribes it receives every reading
+        self.subscriptions.subscribe(websocket, StreamSubscription())
+        connection.start(self.disconnect)
+        return connection
+
+    def disconnect(self, websocket: Any) -> None:
+        connection = self.active_connections.pop(websocket, None)
+        self.subscriptions.remove(websocket)
+        if connection:
+            connection.close()
+
+    def subscribe(self, websocket: Any, subscription: StreamSubscription) -> Optional[SubscriptionGroup]:
+        """Replace a connected client's reading filters"""
+        if websocket not in self.active_connections:
+            return None
+        return self.subscriptions.subscribe(websocket, subscription)
+
+    async def send_personal_message(self, message: str, websocket: Any):
+        connection = self.active_connections.get(websocket)
+        if connection:
+            connection.enqueue(message)
+
+    async def broadcast(self, message: str, key: Optional[str] = None):
+        """
+        Queue a serialized frame for every client; delivery happens in each client's writer
+        """
+        for connection in self.active_connections.values():
+            connection.enqueue(message, key)
+
+    def route(self, batch: ReadingBatch) -> int:
+        """
+        Queue each subscription group's share of a batch for its members,
+        serialized once per group (compact clients encode their own deltas).
+        Returns the number of connections queued to.
+        """
+        queued = 0
+        for group, readings in self.subscriptions.route(batch.readings, batch.sensor_keys):
+            message = None
+            for websocket in group.members:
+                connection = self.active_connections[websocket]
+                if connection.encoder is not None:
+                    connection.enqueue_readings(readings)
+                else:
+                    if message is None:
+                        message = readings_message(readings)
+                    connection.enqueue(message)
+                queued += 1
+        return queued
+
+    async def consume(self, bus: ReadingBus):
+        """
+        Deliver everything published on the bus until cancelled: reading
+        batches are routed by subscription, serialized messages go to everyone.
+        """
+        queue = bus.subscribe()
+        try:
+            while True:
+                message = await queue.get()
+                if not self.active_connections:
+                    continue
+                if isinstance(message, ReadingBatch):
+                    self.route(message)
+                elif isinstance(message, Broadcast):
+                    await self.broadcast(message.message, message.key)
+                else:
+                    await self.broadcast(message)
+        finally:
+            bus.unsubscribe(queue)
+
+    def metrics(self, detail: bool = False) -> Dict[str, Any]:
+        """
+        Aggregate send-queue and lag metrics, optionally per connection
+        """
+        connections = list(self.active_connections.values())
+        lags = [c.lag_seconds() for c in connections]
+        summary: Dict[str, Any] = {
+            "queued": sum(c.queued for c in connections),
+            "sent": sum(c.sent for c in connections),
+            "bytes_sent": sum(c.bytes_sent for c in connections),
+            "compact_connections": sum(1 for c in connections if c.encoder is not None),
+            "dropped": sum(c.dropped for c in connections),
+            "coalesced": sum(c.coalesced for c in connections),
+            "max_lag_seconds": round(max(lags, default=0.0), 6),
+            "lagging_connections": sum(1 for lag in lags if lag > 1.0),
+            "subscription_groups": self.subscriptions.group_count
+        }
+        if detail:
+            summary["connections"] = [c.metrics() for c in connections]
+        return summary
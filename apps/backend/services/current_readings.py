@@ -0,0 +1,159 @@
+"""
+In-memory current value of every sensor stream
+Keeps the latest reading, and a short history, for each (sensor, type,
+location) stream. Fed by the reading bus, so every committed batch lands here
+(from every worker when a broker is configured), and warmed from the
+database on startup. /api/sensor/current is served from here without a query.
+"""
+import bisect
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.reading import READING_COLUMNS, Reading
+from models.sensor import Sensor
+from services.broker import ReadingBatch
+
+# Readings kept per stream, newest included
+CURRENT_HISTORY_SIZE = int(os.getenv("CURRENT_HISTORY_SIZE", "10"))
+# Streams kept before the least recently updated are evicted
+CURRENT_MAX_STREAMS = int(os.getenv("CURRENT_MAX_STREAMS", "100000"))
+
+StreamKey = Tuple[int, str, str]
+
+
+def _order(reading: Dict[str, Any]):
+    return (reading["timestamp"], reading["id"])
+
+
+class CurrentReadings:
+    """
+    Latest readings per stream, ordered by reading timestamp so late
+    arrivals never replace a newer value.
+
+    Updated from the event loop only. Like the sensor-id cache it is per
+    process; a sensor deleted on another worker lingers here until evicted.
+    """
+
+    def __init__(self, history_size: int = CURRENT_HISTORY_SIZE, max_streams: int = CURRENT_MAX_STREAMS):
+        self.history_size = history_size
+        self.max_streams = max_streams
+        # Oldest first within each stream; streams in least recently updated order
+        self._streams: "OrderedDict[StreamKey, List[Dict[str, Any]]]" = OrderedDict()
+        self._sensor_keys: Dict[int, str] = {}
+        self.updates = 0
+        self.evictions = 0
+        # Serialized unfiltered response, rebuilt after the next change
+        self._snapshot: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def on_event(self, event: Any) -> None:
+        """Reading bus listener"""
+        if isinstance(event, ReadingBatch):
+            self.update(event.readings, event.sensor_keys)
+
+    def update(self, readings: Iterable[Dict[str, Any]], sensor_keys: Dict[int, str]) -> None:
+        self._sensor_keys.update(sensor_keys)
+        for reading in readings:
+            key = (reading["sensor_id"], reading["type"], reading["location"])
+            history = self._streams.get(key)
+            if history is None:
+                history = self._streams[key] = []
+            else:
+                self._streams.move_to_end(key)
+            if not history or _order(reading) >= _order(history[-1]):
+                history.append(reading)
+            else:
+                bisect.insort(history, reading, key=_order)
+            if len(history) > self.history_size:
+                del history[0]
+            self.updates += 1
+        while len(self._streams) > self.max_streams:
+            self._streams.popitem(last=False)
+            self.evictions += 1
+        self._snapshot = None
+
+    def remove_sensor(self, sensor_pk: int) -> None:
+        for key in [key for key in self._streams if key[0] == sensor_pk]:
+            del self._streams[key]
+        self._sensor_keys.pop(sensor_pk, None)
+        self._snapshot = None
+
+    def clear(self) -> None:
+        self._streams.clear()
+        self._sensor_keys.clear()
+        self.updates = 0
+        self.evictions = 0
+        self._snapshot = None
+
+    def warm(self, db: Session) -> int:
+        """
+        Load the last history_size readings of every stream from the
+        database, in one windowed query. Returns the number of streams.
+        """
+        rank = func.row_number().over(
+            partition_by=(Reading.sensor_id, Reading.type, Reading.location),
+            order_by=(Reading.timestamp.desc(), Reading.id.desc())
+        ).label("rank")
+        ranked = select(*READING_COLUMNS, rank).subquery()
+        names = [column.name for column in READING_COLUMNS]
+        rows = db.execute(
+            select(*(ranked.c[name] for name in names)).where(ranked.c.rank <= self.history_size)
+        ).all()
+        sensor_keys = dict(db.execute(select(Sensor.id, Sensor.sensor_id)).all())
+        self.clear()
+        # Plain str keys, like the rows published on the reading bus
+        self.update([dict(zip(names, row)) for row in rows], sensor_keys)
+        return len(self._streams)
+
+    def query(self, sensor_id: Optional[str] = None, reading_type: Optional[str] = None,
+              location: Optional[str] = None, history: int = 0) -> List[Dict[str, Any]]:
+        """
+        Current value of each matching stream, most recently updated first,
+        with up to `history` earlier readings (newest first)
+        """
+        results = []
+        for (sensor_pk, stream_type, stream_location), readings in reversed(self._streams.items()):
+            external_id = self._sensor_keys.get(sensor_pk)
+            if ((sensor_id is not None and external_id != sensor_id)
+                    or (reading_type is not None and stream_type != reading_type)
+                    or (location is not None and stream_location != location)):
+                continue
+            entry = {
+                "sensor_id": external_id,
+                "type": stream_type,
+                "location": stream_location,
+                "latest": readings[-1]
+            }
+            if history:
+                entry["history"] = readings[-2::-1][:history]
+            results.append(entry)
+        return results
+
+    def render(self, sensor_id: Optional[str] = None, reading_type: Optional[str] = None,
+               location: Optional[str] = None, history: int = 0) -> bytes:
+        """JSON for query(); the unfiltered current values are serialized once per change"""
+        if sensor_id is None and reading_type is None and location is None and not history:
+            if self._snapshot is None:
+                self._snapshot = orjson.dumps(self.query())
+            return self._snapshot
+        return orjson.dumps(self.query(sensor_id, reading_type, location, history))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "max_streams": self.max_streams,
+            "history_size": self.history_size,
+            "updates": self.updates,
+            "evictions": self.evictions
+        }
+
+
+# Fed from the reading bus and warmed by main.py's lifespan
+current_readings = CurrentReadings()
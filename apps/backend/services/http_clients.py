@@ -0,0 +1,125 @@
+"""
+Shared outbound HTTP clients
+One pooled httpx.AsyncClient per upstream (the RAG sidecar and the vision
+API), opened and closed by main.py's lifespan. Calls from async routes no
+longer block the event loop, and reuse keep-alive connections instead of
+opening one per request. Each upstream has its own timeouts and connection
+limits. HTTP/2 is negotiated with TLS upstreams when the h2 package is
+installed (httpx[http2]); otherwise HTTP/1.1 is used.
+"""
+import importlib.util
+import os
+from typing import Any, Dict, NamedTuple
+
+import httpx
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP_HTTP2 = _env_bool("HTTP_HTTP2", True)
+# Time allowed to open a connection, and to wait for a free pooled connection
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_POOL_TIMEOUT_SECONDS = float(os.getenv("HTTP_POOL_TIMEOUT_SECONDS", "10"))
+# Idle keep-alive connections are closed after this long
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+
+class Upstream(NamedTuple):
+    base_url: str
+    read_timeout: float
+    max_connections: int
+    max_keepalive: int
+
+
+UPSTREAMS = {
+    # RAG sidecar: analysis calls, health checks and document counts
+    "rag": Upstream(
+        os.getenv("RAG_SERVICE_URL", "http://localhost:3001"),
+        float(os.getenv("RAG_TIMEOUT_SECONDS", "30")),
+        int(os.getenv("RAG_MAX_CONNECTIONS", "20")),
+        int(os.getenv("RAG_MAX_KEEPALIVE", "10")),
+    ),
+    # OpenAI-compatible vision API; slow responses, so fewer, longer-lived calls
+    "vision": Upstream(
+        os.getenv("VISION_API_URL", "https://api.openai.com/v1"),
+        float(os.getenv("VISION_TIMEOUT_SECONDS", "60")),
+        int(os.getenv("VISION_MAX_CONNECTIONS", "10")),
+        int(os.getenv("VISION_MAX_KEEPALIVE", "10")),
+    ),
+}
+
+
+class HttpClients:
+    """
+    Named AsyncClients, one per upstream.
+
+    Clients are opened by start(), or on first use for code running outside
+    the app (scripts, tests); stop() closes their pools.
+    """
+
+    def __init__(self, upstreams: Dict[str, Upstream] = UPSTREAMS, http2: bool = HTTP_HTTP2):
+        self.upstreams = upstreams
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _open(self, name: str) -> httpx.AsyncClient:
+        upstream = self.upstreams[name]
+        return httpx.AsyncClient(
+            base_url=upstream.base_url,
+            # HTTP/2 needs TLS (ALPN); plain-HTTP upstreams stay on HTTP/1.1
+            http2=self.http2 and upstream.base_url.startswith("https://"),
+            timeout=httpx.Timeout(
+                upstream.read_timeout,
+                connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+                pool=HTTP_POOL_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=upstream.max_connections,
+                max_keepalive_connections=upstream.max_keepalive,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+
+    async def start(self) -> None:
+        for name in self.upstreams:
+            self.get(name)
+
+    async def stop(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._open(name)
+        return client
+
+    @property
+    def rag(self) -> httpx.AsyncClient:
+        return self.get("rag")
+
+    @property
+    def vision(self) -> httpx.AsyncClient:
+        return self.get("vision")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "upstreams": {
+                name: {
+                    "base_url": upstream.base_url,
+                    "open": name in self._clients and not self._clients[name].is_closed,
+                    "read_timeout_seconds": upstream.read_timeout,
+                    "max_connections": upstream.max_connections
+                }
+                for name, upstream in self.upstreams.items()
+            }
+        }
+
+
+# Opened and closed by main.py's lifespan
+http_clients = HttpClients()
@@ -0,0 +1,288 @@
+"""
+Micro-batching buffer for streamed ingest and write-behind
+Devices on the ingest WebSocket, and POST /api/sensor/data unless
+INGEST_DURABILITY is "sync", submit batches to the buffer; it groups
+submissions from every connection and request and writes them in one
+transaction (sensor upsert, readings INSERT, rollups) once INGEST_BATCH_SIZE
+readings are waiting or INGEST_FLUSH_MS has passed, so the per-commit cost is
+shared. Each submission gets a future that resolves after its transaction
+commits.
+"""
+import asyncio
+import os
+import statistics
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from database.connection import AsyncSessionLocal
+from schemas.reading import ReadingData
+from schemas.sensor import SensorData
+from services.reading_bus import reading_bus
+from services.readings_service import AsyncReadingsService
+from services.sensor_id_cache import sensor_id_cache
+from services.sensor_service import AsyncSensorService
+
+# Readings written per transaction, and how long a submission may wait for others to join it
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "50"))
+# Readings buffered before submit() waits for a flush (backpressure)
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "10000"))
+# Submitted batch ids whose outcome can still be looked up
+INGEST_BATCH_HISTORY = int(os.getenv("INGEST_BATCH_HISTORY", "10000"))
+
+# When POST /api/sensor/data responds:
+#   sync     - after committing the request's own transaction (201)
+#   group    - after the group commit that includes it (201); as durable as sync
+#   buffered - as soon as the batch is queued (202 with a batch id); a crash
+#              loses batches not yet flushed, a clean shutdown drains them
+DURABILITY_MODES = ("sync", "group", "buffered")
+INGEST_DURABILITY = os.getenv("INGEST_DURABILITY", "sync")
+
+
+class IngestResult(NamedTuple):
+    sensors_processed: int
+    reading_ids: List[int]
+
+
+class _Submission(NamedTuple):
+    sensors: List[SensorData]
+    readings: List[ReadingData]
+    future: asyncio.Future
+    enqueued_at: float
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    """Mark a failure as seen, since write-behind submitters may never await it"""
+    if not future.cancelled():
+        future.exception()
+
+
+class IngestBuffer:
+    """
+    Groups submissions into shared transactions.
+
+    A failed group is retried one submission at a time, so a bad submission
+    (e.g. a reading for an unknown sensor) fails alone. Committed batches are
+    published on the reading bus like HTTP ingest.
+    """
+
+    def __init__(self, session_factory: Callable[[], Any] = AsyncSessionLocal,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_seconds: float = INGEST_FLUSH_MS / 1000,
+                 max_pending: int = INGEST_MAX_PENDING, batch_history: int = INGEST_BATCH_HISTORY,
+                 durability: str = INGEST_DURABILITY):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"INGEST_DURABILITY must be one of: {', '.join(DURABILITY_MODES)}")
+        self.durability = durability
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.batch_history = batch_history
+        self._queue: Deque[_Submission] = deque()
+        self._batches: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+        # Recent flush durations, for latency percentiles
+        self._flush_seconds: Deque[float] = deque(maxlen=1000)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Event] = None
+        self._closing = False
+        self.pending = 0
+        self.submitted = 0
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self) -> None:
+        # Events belong to the running loop, so they are created here rather than in __init__
+        self._wakeup, self._full, self._room = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        self._room.set()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop, letting a flush in progress finish, and write everything still buffered"""
+        if self._task:
+            self._closing = True
+            self._wakeup.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        while self._queue:
+            await self.flush()
+
+    @property
+    def saturated(self) -> bool:
+        """Over half full: devices should slow down"""
+        return self.pending >= self.max_pending // 2
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def submit(self, sensors: List[SensorData], readings: List[ReadingData],
+                     batch_id: Optional[str] = None) -> asyncio.Future:
+        """
+        Queue a submission, waiting while the buffer is full. Returns a future
+        for its IngestResult, set once the submission is committed. A batch_id
+        makes the outcome available from batch_status().
+        """
+        while self.full:
+            self._room.clear()
+            await self._room.wait()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        if batch_id is not None:
+            self._batches[batch_id] = future
+            if len(self._batches) > self.batch_history:
+                self._batches.popitem(last=False)
+        self._queue.append(_Submission(sensors, readings, future, time.monotonic()))
+        self.pending += len(readings)
+        self.submitted += 1
+        self._wakeup.set()
+        if self.pending >= self.batch_size:
+            self._full.set()
+        return future
+
+    async def _run(self) -> None:
+        while not self._closing:
+            await self._wakeup.wait()
+            if self.pending < self.batch_size and not self._closing:
+                # Let submissions from other devices join this transaction
+                try:
+                    async with asyncio.timeout(self.flush_seconds):
+                        await self._full.wait()
+                except TimeoutError:
+                    pass
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write the next group of submissions; returns the number of readings written"""
+        taken: List[_Submission] = []
+        count = 0
+        while self._queue and (not taken or count + len(self._queue[0].readings) <= self.batch_size):
+            submission = self._queue.popleft()
+            taken.append(submission)
+            count += len(submission.readings)
+        self.pending -= count
+        if not self._queue and self._wakeup:
+            self._wakeup.clear()
+        if self.pending < self.batch_size and self._full:
+            self._full.clear()
+        if self.pending < self.max_pending and self._room:
+            self._room.set()
+        if not taken:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            written = [(taken, await self._write(taken))]
+        except Exception as e:
+            # Retry one at a time so only the bad submissions fail
+            written = [(taken, e)] if len(taken) == 1 else [
+                ([submission], await self._write_one(submission)) for submission in taken
+            ]
+        count = 0
+        for group, rows in written:
+            if isinstance(rows, Exception):
+                for submission in group:
+                    if not submission.future.done():
+                        self.failed += 1
+                        submission.future.set_exception(rows)
+                continue
+            # Committed: from here on nothing may send the group back through a retry
+            count += len(rows)
+            self._publish(group, rows)
+            for submission, result in zip(group, self._results(group, rows)):
+                if not submission.future.done():
+                    submission.future.set_result(result)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+        self._flush_seconds.append(self.last_flush_seconds)
+        return count
+
+    async def _write_one(self, submission: _Submission):
+        try:
+            return await self._write([submission])
+        except Exception as e:
+            return e
+
+    async def _write(self, submissions: List[_Submission]) -> List[Any]:
+        """Commit the submissions in one transaction; returns the inserted rows"""
+        sensors = [sensor for s in submissions for sensor in s.sensors]
+        readings = [reading for s in submissions for reading in s.readings]
+        async with self.session_factory() as db:
+            try:
+                await AsyncSensorService(db).upsert_sensors(sensors, commit=False)
+                rows = await AsyncReadingsService(db).append_many(readings, commit=False)
+                await db.commit()
+            except Exception:
+                # The group was rolled back, so ids cached by the upsert may not exist
+                await db.rollback()
+                sensor_id_cache.invalidate(*[sensor.sensor_id for sensor in sensors])
+                raise
+        self.written += len(rows)
+        return rows
+
+    def _publish(self, submissions: List[_Submission], rows: List[Any]) -> None:
+        try:
+            reading_bus.publish_readings(rows, [reading.sensor_id for s in submissions for reading in s.readings])
+        except Exception as e:
+            print(f"⚠️ Could not publish committed readings: {e}")
+
+    @staticmethod
+    def _results(submissions: List[_Submission], rows: List[Any]) -> List[IngestResult]:
+        # Ids follow submission order, so each submission owns the next slice
+        results, offset = [], 0
+        for submission in submissions:
+            ids = [row.id for row in rows[offset:offset + len(submission.readings)]]
+            offset += len(submission.readings)
+            results.append(IngestResult(len({sensor.sensor_id for sensor in submission.sensors}), ids))
+        return results
+
+    def batch_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Outcome of a recent submission, or None if the id is unknown or expired"""
+        future = self._batches.get(batch_id)
+        if future is None:
+            return None
+        if not future.done():
+            return {"batch_id": batch_id, "status": "pending"}
+        error = future.exception()
+        if error is not None:
+            return {"batch_id": batch_id, "status": "failed", "detail": str(error)}
+        result = future.result()
+        return {
+            "batch_id": batch_id,
+            "status": "committed",
+            "sensors_processed": result.sensors_processed,
+            "readings_processed": len(result.reading_ids),
+            "reading_ids": result.reading_ids
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency"""
+        durations = sorted(self._flush_seconds)
+        return {
+            "durability": self.durability,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "submissions_pending": len(self._queue),
+            "oldest_pending_seconds": round(time.monotonic() - self._queue[0].enqueued_at, 6) if self._queue else 0.0,
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+            "mean_batch": round(self.written / self.flushes, 1) if self.flushes else 0.0,
+            "last_flush_seconds": round(self.last_flush_seconds, 6),
+            "p50_flush_seconds": round(statistics.median(durations), 6) if durations else 0.0,
+            "p95_flush_seconds": round(durations[int(len(durations) * 0.95)], 6) if durations else 0.0,
+            "max_flush_seconds": round(durations[-1], 6) if durations else 0.0,
+            "saturated": self.saturated
+        }
+
+
+# Shared by ingest WebSocket connections and write-behind requests in this process;
+# main.py starts and drains it
+ingest_buffer = IngestBuffer()
@@ -1,11 +1,13 @@
 """
 Service for managing detected issues
 """
+import asyncio
 import base64
 import os
 from pathlib import Path
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select
 from typing import List, Optional
 from datetime import datetime
 
@@ -20,50 +22,131 @@ IMAGES_DIR = Path("data/images")
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _save_issue_image(issue_data: IssueCreate) -> None:
+    """Save the base64 image to the filesystem and record its path in metadata"""
+    image_path = None
+    
+    # Save image to filesystem if provided
+    if issue_data.image_data:
+        try:
+            # Generate unique filename
+            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            issue_type_safe = "".join(c for c in issue_data.issue_type if c.isalnum() or c in (' ', '-', '_')).strip()[:50]
+            filename = f"issue_{timestamp}_{issue_type_safe.replace(' ', '_')}.jpg"
+            image_path = IMAGES_DIR / filename
+            
+            # Decode base64 and save to file
+            image_bytes = base64.b64decode(issue_data.image_data)
+            with open(image_path, 'wb') as f:
+                f.write(image_bytes)
+            
+            # Store relative path in metadata instead of full base64
+            if issue_data.metadata_json is None:
+                issue_data.metadata_json = {}
+            issue_data.metadata_json['image_path'] = str(image_path)
+            issue_data.metadata_json['image_saved'] = True
+            
+            print(f"✅ Image saved to: {image_path}")
+        except Exception as e:
+            print(f"⚠️ Failed to save image to filesystem: {e}")
+            # Continue with base64 storage as fallback
+
+
+def _build_issue(issue_data: IssueCreate) -> Issue:
+    """Create an Issue instance from the incoming payload"""
+    return Issue(
+        issue_type=issue_data.issue_type,
+        severity=issue_data.severity,
+        description=issue_data.description,
+        recommendation=issue_data.recommendation,
+        location=issue_data.location,
+        component=issue_data.component,
+        image_data=issue_data.image_data,  # Keep base64 for backward compatibility
+        metadata_json=issue_data.metadata_json,
+        detected_at=datetime.utcnow()
+    )
+
+
+def _apply_issue_update(issue: Issue, update_data: IssueUpdate) -> None:
+    """Copy the set fields of an IssueUpdate onto an issue"""
+    if update_data.resolved is not None:
+        issue.resolved = update_data.resolved
+        if update_data.resolved == "true":
+            issue.resolved_at = datetime.utcnow()
+        else:
+            issue.resolved_at = None
+
+    if update_data.recommendation is not None:
+        issue.recommendation = update_data.recommendation
+
+    # Update learning-related fields
+    if update_data.user_validation_result is not None:
+        issue.user_validated = True
+        issue.user_validation_result = update_data.user_validation_result
+    
+    if update_data.expert_feedback is not None:
+        issue.expert_reviewed = True
+        issue.expert_feedback = update_data.expert_feedback
+    
+    if update_data.actual_severity is not None:
+        issue.actual_severity = update_data.actual_severity
+    
+    if update_data.resolution_status is not None:
+        issue.resolution_status = update_data.resolution_status
+    
+    if update_data.resolution_notes is not None:
+        issue.resolution_notes = update_data.resolution_notes
+
+
+def calculate_learning_score(issue: Issue) -> float:
+    """
+    Calculate learning value score for an issue (0-1)
+    Higher score = more valuable for training
+    """
+    score = 0.0
+
+    # Base score: has image (0.2)
+    if issue.image_data:
+        score += 0.2
+
+    # Base score: has location and component (0.1)
+    if issue.location and issue.component:
+        score += 0.1
+
+    # Base score: has recommendation (0.1)
+    if issue.recommendation:
+        score += 0.1
+
+    # High severity issues are more valuable (0.2)
+    if issue.severity == "high":
+        score += 0.2
+    elif issue.severity == "medium":
+        score += 0.1
+
+    # Has metadata (0.1)
+    if issue.metadata_json:
+        score += 0.1
+
+    # Recent issues are more valuable (0.1)
+    days_old = (datetime.utcnow() - issue.detected_at).days
+    if days_old < 7:
+        score += 0.1
+    elif days_old < 30:
+        score += 0.05
+
+    # Cap at 1.0
+    return min(score, 1.0)
+
+
 class IssueService:
     def __init__(self, db: Session):
         self.db = db
 
     def create_issue(self, issue_data: IssueCreate) -> Issue:
         """Create a new issue record and save image to filesystem"""
-        image_path = None
+        _save_issue_image(issue_data)
         
-        # Save image to filesystem if provided
-        if issue_data.image_data:
-            try:
-                # Generate unique filename
-                timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                issue_type_safe = "".join(c for c in issue_data.issue_type if c.isalnum() or c in (' ', '-', '_')).strip()[:50]
-                filename = f"issue_{timestamp}_{issue_type_safe.replace(' ', '_')}.jpg"
-                image_path = IMAGES_DIR / filename
-                
-                # Decode base64 and save to file
-                image_bytes = base64.b64decode(issue_data.image_data)
-                with open(image_path, 'wb') as f:
-                    f.write(image_bytes)
-                
-                # Store relative path in metadata instead of full base64
-                if issue_data.metadata_json is None:
-                    issue_data.metadata_json = {}
-                issue_data.metadata_json['image_path'] = str(image_path)
-                issue_data.metadata_json['image_saved'] = True
-                
-                print(f"✅ Image saved to: {image_path}")
-            except Exception as e:
-                print(f"⚠️ Failed to save image to filesystem: {e}")
-                # Continue with base64 storage as fallback
-        
-        issue = Issue(
-            issue_type=issue_data.issue_type,
-            severity=issue_data.severity,
-            description=issue_data.description,
-            recommendation=issue_data.recommendation,
-            location=issue_data.location,
-            component=issue_data.component,
-            image_data=issue_data.image_data,  # Keep base64 for backward compatibility
-            metadata_json=issue_data.metadata_json,
-            detected_at=datetime.utcnow()
-        )
+        issue = _build_issue(issue_data)
         self.db.add(issue)
         self.db.commit()
         self.db.refresh(issue)
@@ -132,33 +215,7 @@ class IssueService:
         if not issue:
             return None
 
-        if update_data.resolved is not None:
-            issue.resolved = update_data.resolved
-            if update_data.resolved == "true":
-                issue.resolved_at = datetime.utcnow()
-            else:
-                issue.resolved_at = None
-
-        if update_data.recommendation is not None:
-            issue.recommendation = update_data.recommendation
-
-        # Update learning-related fields
-        if update_data.user_validation_result is not None:
-            issue.user_validated = True
-            issue.user_validation_result = update_data.user_validation_result
-        
-        if update_data.expert_feedback is not None:
-            issue.expert_reviewed = True
-            issue.expert_feedback = update_data.expert_feedback
-        
-        if update_data.actual_severity is not None:
-            issue.actual_severity = update_data.actual_severity
-        
-        if update_data.resolution_status is not None:
-            issue.resolution_status = update_data.resolution_status
-        
-        if update_data.resolution_notes is not None:
-            issue.resolution_notes = update_data.resolution_notes
+        _apply_issue_update(issue, update_data)
 
         # Recalculate learning score after updates
         issue.learning_score = self._calculate_learning_score(issue)
@@ -192,39 +249,7 @@ class IssueService:
         Calculate learning value score for an issue (0-1)
         Higher score = more valuable for training
         """
-        score = 0.0
-        
-        # Base score: has image (0.2)
-        if issue.image_data:
-            score += 0.2
-        
-        # Base score: has location and component (0.1)
-        if issue.location and issue.component:
-            score += 0.1
-        
-        # Base score: has recommendation (0.1)
-        if issue.recommendation:
-            score += 0.1
-        
-        # High severity issues are more valuable (0.2)
-        if issue.severity == "high":
-            score += 0.2
-        elif issue.severity == "medium":
-            score += 0.1
-        
-        # Has metadata (0.1)
-        if issue.metadata_json:
-            score += 0.1
-        
-        # Recent issues are more valuable (0.1)
-        days_old = (datetime.utcnow() - issue.detected_at).days
-        if days_old < 7:
-            score += 0.1
-        elif days_old < 30:
-            score += 0.05
-        
-        # Cap at 1.0
-        return min(score, 1.0)
+        return calculate_learning_score(issue)
 
     def update_learning_score(self, issue_id: int) -> Optional[Issue]:
         """Recalculate and update learning score for an issue"""
@@ -237,3 +262,122 @@ class IssueService:
         self.db.refresh(issue)
         return issue
 
+
+
+class AsyncIssueService:
+    """Async counterpart of IssueService for AsyncSession-backed routes"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_issue(self, issue_data: IssueCreate) -> Issue:
+        """Create a new issue record and save image to filesystem"""
+        # File writes stay off the event loop
+        await asyncio.to_thread(_save_issue_image, issue_data)
+
+        issue = _build_issue(issue_data)
+        issue.learning_score = calculate_learning_score(issue)
+        self.db.add(issue)
+        await self.db.commit()
+        # Load server-side defaults such as created_at
+        await self.db.refresh(issue)
+
+        # Auto-trigger learning data collection (create training data record)
+        # This will be cleaned and processed later by cleaning service
+        # A savepoint, so a failure rolls back only this write and leaves issue loaded
+        try:
+            from models.training_data import TrainingData
+
+            async with self.db.begin_nested():
+                existing = await self.db.scalar(
+                    select(TrainingData.id).where(TrainingData.issue_id == issue.id)
+                )
+                if not existing:
+                    self.db.add(TrainingData(
+                        issue_id=issue.id,
+                        cleaned_status="pending",
+                        quality_score=None,
+                        standardized_data={},  # Will be filled by cleaning service
+                        labels={},  # Will be filled by cleaning service
+                        used_for_training=False
+                    ))
+        except Exception as e:
+            print(f"⚠️  Could not create training data record: {e}")
+            # Don't fail issue creation if training data creation fails
+        await self.db.commit()
+
+        return issue
+
+    async def get_issue(self, issue_id: int) -> Optional[Issue]:
+        """Get issue by ID"""
+        return await self.db.get(Issue, issue_id)
+
+    async def get_all_issues(
+        self,
+        limit: int = 100,
+        resolved: Optional[str] = None,
+        severity: Optional[IssueSeverity] = None,
+        location: Optional[str] = None
+    ) -> List[Issue]:
+        """Get all issues with optional filters"""
+        stmt = select(Issue)
+
+        if resolved is not None:
+            stmt = stmt.where(Issue.resolved == resolved)
+
+        if severity is not None:
+            stmt = stmt.where(Issue.severity == severity)
+
+        if location is not None:
+            stmt = stmt.where(Issue.location == location)
+
+        stmt = stmt.order_by(desc(Issue.detected_at)).limit(limit)
+        return (await self.db.scalars(stmt)).all()
+
+    async def update_issue(self, issue_id: int, update_data: IssueUpdate) -> Optional[Issue]:
+        """Update an issue"""
+        issue = await self.get_issue(issue_id)
+        if not issue:
+            return None
+
+        _apply_issue_update(issue, update_data)
+
+        # Recalculate learning score after updates
+        issue.learning_score = calculate_learning_score(issue)
+
+        await self.db.commit()
+        await self.db.refresh(issue)
+        return issue
+
+    async def delete_issue(self, issue_id: int) -> bool:
+        """Delete an issue"""
+        issue = await self.get_issue(issue_id)
+        if not issue:
+            return False
+
+        # Cascaded collections must be loaded up front under asyncio
+        await self.db.refresh(issue, attribute_names=["feedbacks", "training_data"])
+        await self.db.delete(issue)
+        await self.db.commit()
+        return True
+
+    async def get_issues_by_component(self, component: str, limit: int = 50) -> List[Issue]:
+        """Get issues for a specific component"""
+        stmt = (
+            select(Issue)
+            .where(Issue.component == component)
+            .order_by(desc(Issue.detected_at))
+            .limit(limit)
+        )
+        return (await self.db.scalars(stmt)).all()
+
+    async def update_learning_score(self, issue_id: int) -> Optional[Issue]:
+        """Recalculate and update learning score for an issue"""
+        issue = await self.get_issue(issue_id)
+        if not issue:
+            return None
+
+        issue.learning_score = calculate_learning_score(issue)
+        await self.db.commit()
+        await self.db.refresh(issue)
+        return issue
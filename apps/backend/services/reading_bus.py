@@ -0,0 +1,140 @@
+"""
+Pub/sub bus for newly ingested readings
+Ingest publishes each committed batch once; subscribers (the WebSocket
+ConnectionManager) route it to matching clients, serializing once per
+distinct subscription, so live dashboards cost no database queries per viewer.
+Events travel through a broker (services/broker.py): in memory for a single
+worker, or over Redis pub/sub so every worker's clients see every batch.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+import orjson
+
+from services.broker import Broadcast, Event, InMemoryBroker, ReadingBatch, create_broker
+from services.sensor_id_cache import sensor_id_cache
+
+
+def encode_message(message_type: str, data: Any) -> str:
+    """
+    Serialize a push message once, for every subscriber and client.
+    WebSocket text frames carry str, so the orjson bytes are decoded here
+    rather than once per send.
+    """
+    return orjson.dumps({
+        "type": message_type,
+        "data": data,
+        "timestamp": datetime.utcnow().isoformat()
+    }).decode()
+
+
+def readings_message(readings: List[Dict[str, Any]]) -> str:
+    """new_readings message for a list of reading dicts"""
+    return encode_message("new_readings", readings)
+
+
+class ReadingBus:
+    """
+    Fan-out of ReadingBatch events and serialized messages to asyncio.Queue subscribers.
+
+    Publishing never blocks ingest: each subscriber has a bounded queue, and
+    when a subscriber falls behind its oldest message is dropped. Publish from
+    the event loop. Published events go to the broker, which hands them back
+    (from this worker or another) through deliver().
+
+    Listeners are called synchronously from deliver() with every event, for
+    in-memory indexes that must not miss a batch and cost microseconds to update.
+    """
+
+    def __init__(self, maxsize: int = 1000, broker: Optional[InMemoryBroker] = None):
+        self.maxsize = maxsize
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._listeners: List[Callable[[Event], None]] = []
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.listener_errors = 0
+        self.set_broker(broker or InMemoryBroker())
+
+    def set_broker(self, broker: InMemoryBroker) -> None:
+        """Route events through another broker; call before it is started"""
+        self.broker = broker
+        broker.attach(self.deliver)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.maxsize)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def add_listener(self, listener: Callable[[Event], None]) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Event], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, message: Union[str, Event]) -> int:
+        """
+        Publish a serialized message or event through the broker,
+        returning how many local subscribers there are
+        """
+        self.published += 1
+        self.broker.publish(message)
+        return len(self._subscribers)
+
+    def deliver(self, message: Union[str, Event]) -> None:
+        """Hand a message from the broker to every listener and local subscriber"""
+        self.delivered += 1
+        for listener in self._listeners:
+            # Readings are committed by now; a failing index must not fail the ingest
+            try:
+                listener(message)
+            except Exception as e:
+                self.listener_errors += 1
+                print(f"⚠️ Reading bus listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    def publish_readings(self, readings: Iterable[Any], sensor_ids: Iterable[str] = ()) -> Optional[ReadingBatch]:
+        """
+        Publish rows returned by ReadingsService.append_many as one ReadingBatch.
+        sensor_ids are the batch's external ids; ingest has just cached them, so
+        mapping the rows' primary keys back costs no query.
+        Nothing is converted when no one is listening.
+        """
+        readings = list(readings)
+        if not readings or not (self._subscribers or self._listeners or self.broker.remote):
+            return None
+        sensor_keys = {pk: sensor_id for sensor_id, pk in sensor_id_cache.peek_many(set(sensor_ids)).items()}
+        batch = ReadingBatch([dict(row._mapping) for row in readings], sensor_keys)
+        self.publish(batch)
+        return batch
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "listeners": len(self._listeners),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "listener_errors": self.listener_errors,
+            "queued": sum(queue.qsize() for queue in self._subscribers),
+            "broker": self.broker.stats()
+        }
+
+
+# Shared by ingest and the WebSocket manager in this process; main.py starts the broker
+reading_bus = ReadingBus(maxsize=int(os.getenv("READING_BUS_QUEUE_SIZE", "1000")), broker=create_broker())
@@ -0,0 +1,252 @@
+"""
+Reading export encoders
+Turn chunks of reading rows into NDJSON, CSV, Arrow IPC or Parquet bytes, one
+chunk at a time, so a streamed export never holds more than one chunk in memory.
+Arrow and Parquet need pyarrow; it is imported only when those formats are used.
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List
+
+from models.reading import READING_COLUMNS
+
+EXPORT_COLUMNS = [column.name for column in READING_COLUMNS]
+JSON_COLUMNS = {"calibration_json", "extras_json"}
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columnar formats write one record batch (a Parquet row group) per chunk, and
+# small row groups make files slow to read, so they are fetched in larger chunks
+COLUMNAR_FORMATS = {"arrow", "parquet"}
+ROW_CHUNK_SIZE = 1000
+COLUMNAR_CHUNK_SIZE = 50_000
+
+
+def export_chunk_size(fmt: str) -> int:
+    return COLUMNAR_CHUNK_SIZE if fmt in COLUMNAR_FORMATS else ROW_CHUNK_SIZE
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(name: str, value: Any) -> Any:
+    if value is None:
+        return ""
+    if name in JSON_COLUMNS:
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(rows: List[Any]) -> bytes:
+    """One JSON object per line"""
+    return "".join(
+        json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in rows
+    ).encode()
+
+
+def encode_csv(rows: List[Any]) -> bytes:
+    """CSV rows (no header); JSON columns are written as JSON text"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        mapping = row._mapping
+        writer.writerow([_csv_value(name, mapping[name]) for name in EXPORT_COLUMNS])
+    return buffer.getvalue().encode()
+
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue().encode()
+
+
+class RowEncoder:
+    """Stateless per-chunk encoder, with an optional header"""
+
+    def __init__(self, encode: Callable[[List[Any]], bytes], header: bytes = b""):
+        self._encode = encode
+        self._header = header
+
+    def header(self) -> bytes:
+        return self._header
+
+    def encode(self, rows: List[Any]) -> bytes:
+        return self._encode(rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+    def close(self) -> None:
+        pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError("pyarrow is required for arrow and parquet exports (pip install pyarrow)") from e
+    return pyarrow
+
+
+def arrow_schema():
+    """Arrow schema for exported readings; JSON columns are carried as JSON text"""
+    pa = _pyarrow()
+    types = {
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        dict: pa.string(),
+        datetime: pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([
+        pa.field(column.name, types[column.type.python_type], nullable=column.nullable)
+        for column in READING_COLUMNS
+    ])
+
+
+def record_batch(rows: List[Any], schema) -> Any:
+    """
+    Transpose a chunk of rows into one Arrow array per column.
+    Naive timestamps (SQLite) are taken as UTC, like everywhere else in the backend.
+    """
+    pa = _pyarrow()
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.name in JSON_COLUMNS:
+            values = [None if v is None else json.dumps(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class ColumnarEncoder:
+    """
+    Arrow IPC stream or Parquet writer, one record batch per chunk.
+    Parquet's footer is only written by finish(), so the output is complete
+    (and readable) only once every chunk has been encoded.
+    """
+
+    def __init__(self, fmt: str):
+        pa = _pyarrow()
+        self.schema = arrow_schema()
+        self._sink = _DrainSink()
+        if fmt == "arrow":
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        else:
+            self._writer = pa.parquet.ParquetWriter(self._sink, self.schema, compression="zstd")
+        self.closed = False
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: List[Any]) -> bytes:
+        self._writer.write_batch(record_batch(rows, self.schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self.close()
+        return self._sink.drain()
+
+    def close(self) -> None:
+        """Close the writer; also called when an export stops before finish()"""
+        if not self.closed:
+            self.closed = True
+            self._writer.close()
+
+
+ENCODERS: Dict[str, Callable[[], Any]] = {
+    "ndjson": lambda: RowEncoder(encode_ndjson),
+    "csv": lambda: RowEncoder(encode_csv, csv_header()),
+    "arrow": lambda: ColumnarEncoder("arrow"),
+    "parquet": lambda: ColumnarEncoder("parquet"),
+}
+
+
+def check_export_format(fmt: str) -> None:
+    """
+    Validate a format by name, without creating an encoder.
+    Raises ValueError for unknown formats and ImportError if pyarrow is missing.
+    """
+    if fmt not in ENCODERS:
+        raise ValueError(f"format must be one of: {', '.join(ENCODERS)}")
+    if fmt in COLUMNAR_FORMATS:
+        _pyarrow()
+
+
+def export_encoder(fmt: str):
+    """
+    New encoder for one export.
+    Raises ValueError for unknown formats and ImportError if pyarrow is missing.
+    """
+    check_export_format(fmt)
+    return ENCODERS[fmt]()
+
+
+def encode_chunks(chunks: Iterable[List[Any]], fmt: str) -> Iterator[bytes]:
+    """Encode row chunks from ReadingsService.iter_readings"""
+    encoder = export_encoder(fmt)
+    try:
+        yield encoder.header()
+        for chunk in chunks:
+            yield encoder.encode(chunk)
+        yield encoder.finish()
+    finally:
+        encoder.close()
+
+
+async def aencode_chunks(chunks: AsyncIterator[List[Any]], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Encode row chunks from AsyncReadingsService.stream_readings.
+    Columnar chunks are large, so they are encoded off the event loop.
+    """
+    encoder = export_encoder(fmt)
+    try:
+        yield encoder.header()
+        async for chunk in chunks:
+            if fmt in COLUMNAR_FORMATS:
+                yield await asyncio.to_thread(encoder.encode, chunk)
+            else:
+                yield encoder.encode(chunk)
+        yield encoder.finish()
+    finally:
+        encoder.close()
@@ -0,0 +1,183 @@
+"""
+Sliding window of recent readings for AI context
+Keeps the readings of the last READING_WINDOW_SECONDS in memory, indexed by
+location and type, so build_sensor_context() answers the RAG and vision
+routes (called for every realtime frame) without a database round trip. Fed
+by the reading bus and warmed from the database on startup.
+"""
+import bisect
+import heapq
+import itertools
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.reading import READING_COLUMNS, Reading, naive_utc, normalize_location
+from services.broker import ReadingBatch
+
+# How far back the window reaches, and readings kept per (location, type)
+READING_WINDOW_SECONDS = int(os.getenv("READING_WINDOW_SECONDS", "3600"))
+READING_WINDOW_PER_STREAM = int(os.getenv("READING_WINDOW_PER_STREAM", "1000"))
+
+StreamKey = Tuple[str, str]
+# (naive UTC timestamp, id, context fields without age_seconds)
+Entry = Tuple[datetime, int, Dict[str, Any]]
+
+
+def context_fields(reading: Dict[str, Any]) -> Dict[str, Any]:
+    """The AI-context form of a reading, minus its age"""
+    fields = {
+        "sensor_id": reading["sensor_id"],
+        "type": reading["type"],
+        "location": reading["location"],
+        "value": reading["value"],
+        "unit": reading["unit"],
+        "confidence": reading["confidence"],
+        "timestamp": reading["timestamp"].isoformat()
+    }
+    if reading.get("calibration_json"):
+        fields["calibration"] = reading["calibration_json"]
+    if reading.get("extras_json"):
+        fields["extras"] = reading["extras_json"]
+    return fields
+
+
+class ReadingWindow:
+    """
+    Recent readings per (location, type), oldest first. Locations are
+    matched case-insensitively by substring against the distinct locations,
+    so a lookup touches only the matching streams.
+
+    Updated from the event loop only, and per process like the other
+    in-memory indexes.
+    """
+
+    def __init__(self, window_seconds: int = READING_WINDOW_SECONDS,
+                 per_stream: int = READING_WINDOW_PER_STREAM):
+        self.window_seconds = window_seconds
+        self.per_stream = per_stream
+        self._streams: Dict[StreamKey, Deque[Entry]] = {}
+        # Distinct normalized locations, sorted, with the types seen at each
+        self._locations: List[str] = []
+        self._types: Dict[str, set] = {}
+        # Set once warmed; until then callers fall back to the database
+        self.ready = False
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._streams.values())
+
+    def covers(self, window_seconds: int) -> bool:
+        return self.ready and window_seconds <= self.window_seconds
+
+    def on_event(self, event: Any) -> None:
+        """Reading bus listener"""
+        if isinstance(event, ReadingBatch):
+            self.update(event.readings)
+
+    def update(self, readings: Iterable[Dict[str, Any]]) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.window_seconds)
+        for reading in readings:
+            # PostgreSQL returns aware timestamps; the window compares naive UTC
+            timestamp = naive_utc(reading["timestamp"])
+            if timestamp < cutoff:
+                continue
+            location = normalize_location(reading["location"])
+            key = (location, reading["type"])
+            entries = self._streams.get(key)
+            if entries is None:
+                entries = self._streams[key] = deque()
+                if location not in self._types:
+                    bisect.insort(self._locations, location)
+                    self._types[location] = set()
+                self._types[location].add(reading["type"])
+            entry = (timestamp, reading["id"], context_fields(reading))
+            if len(entries) >= self.per_stream:
+                if entry[:2] < entries[0][:2]:
+                    # Older than everything a full stream keeps
+                    continue
+                entries.popleft()
+            if not entries or entry[:2] >= entries[-1][:2]:
+                entries.append(entry)
+            else:
+                bisect.insort(entries, entry, key=lambda e: e[:2])
+            self.updates += 1
+
+    def remove_sensor(self, sensor_pk: int) -> None:
+        for key, entries in list(self._streams.items()):
+            kept = [entry for entry in entries if entry[2]["sensor_id"] != sensor_pk]
+            if len(kept) != len(entries):
+                self._streams[key] = deque(kept)
+
+    def clear(self) -> None:
+        self._streams.clear()
+        self._locations.clear()
+        self._types.clear()
+        self.ready = False
+        self.updates = 0
+
+    def warm(self, db: Session) -> int:
+        """Load the readings inside the window from the database; returns how many"""
+        since = datetime.utcnow() - timedelta(seconds=self.window_seconds)
+        names = [column.name for column in READING_COLUMNS]
+        rows = db.execute(
+            select(*READING_COLUMNS).where(Reading.timestamp >= since).order_by(Reading.timestamp, Reading.id)
+        ).all()
+        self.clear()
+        self.update(dict(zip(names, row)) for row in rows)
+        self.ready = True
+        return len(self)
+
+    def _matching(self, location_prefix: str, reading_type: Optional[str]) -> List[Deque[Entry]]:
+        fragment = normalize_location(location_prefix)
+        streams = []
+        for location in self._locations:
+            if fragment not in location:
+                continue
+            types = self._types[location] if reading_type is None else (reading_type,)
+            for stream_type in types:
+                entries = self._streams.get((location, stream_type))
+                if entries:
+                    streams.append(entries)
+        return streams
+
+    def _prune(self, entries: Deque[Entry], cutoff: datetime) -> None:
+        while entries and entries[0][0] < cutoff:
+            entries.popleft()
+
+    def recent(self, location_prefix: str = "", window_seconds: int = 60,
+               reading_type: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Readings from the last window_seconds at locations containing
+        location_prefix, most recent first, in build_sensor_context() form
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=window_seconds)
+        streams = self._matching(location_prefix, reading_type)
+        for entries in streams:
+            self._prune(entries, now - timedelta(seconds=self.window_seconds))
+        # Each stream is sorted, so the newest across streams is a k-way merge
+        newest = heapq.merge(*(reversed(entries) for entries in streams), key=lambda e: e[:2], reverse=True)
+        results = []
+        for timestamp, _, fields in itertools.islice(newest, limit):
+            if timestamp < cutoff:
+                break
+            results.append({**fields, "age_seconds": (now - timestamp).total_seconds()})
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "readings": len(self),
+            "streams": len(self._streams),
+            "locations": len(self._locations),
+            "window_seconds": self.window_seconds,
+            "updates": self.updates
+        }
+
+
+# Fed from the reading bus and warmed by main.py's lifespan
+reading_window = ReadingWindow()
@@ -1,164 +1,518 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from models.reading import Reading
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, Select, case, desc, and_, or_, func, insert, select
+from models.reading import READING_COLUMNS, Reading
 from models.sensor import Sensor
 from schemas.reading import ReadingData, ReadingFilter
-from typing import List, Optional, Dict, Any
+from services.rollup_service import AsyncRollupService, RollupService
+from services.sensor_id_cache import sensor_id_cache
+from typing import List, Optional, Dict, Any, Set, Tuple, Iterator, AsyncIterator
+import base64
+import math
 from datetime import datetime, timedelta
 
 
+# Statement builders shared by the sync and async services
+
+def _reading_rows(readings_data: List[ReadingData], sensor_ids: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Build INSERT parameter rows, raising ValueError for unknown sensors
+    """
+    rows = []
+    for reading_data in readings_data:
+        sensor_pk = sensor_ids.get(reading_data.sensor_id)
+        if sensor_pk is None:
+            raise ValueError(f"Sensor with ID {reading_data.sensor_id} not found")
+
+        rows.append({
+            "sensor_id": sensor_pk,
+            "type": reading_data.type,
+            "location": reading_data.location,
+            "value": reading_data.value,
+            "unit": reading_data.unit,
+            "confidence": reading_data.confidence,
+            "calibration_json": reading_data.calibration_json,
+            "extras_json": reading_data.extras_json,
+            "timestamp": reading_data.timestamp
+        })
+    return rows
+
+
+def _insert_readings_stmt():
+    """
+    Executemany INSERT ... RETURNING for readings.
+    Core rows rather than ORM objects: they stay readable after commit
+    without a refresh per reading. Requesting parameter-ordered RETURNING
+    would make SQLite fall back to one INSERT per row, so callers order by
+    the autoincrement id instead, which follows submission order.
+    """
+    return insert(Reading.__table__).returning(*READING_COLUMNS)
+
+
+def _sensor_ids_stmt(sensor_ids: Set[str]) -> Select:
+    return select(Sensor.sensor_id, Sensor.id).where(Sensor.sensor_id.in_(sensor_ids))
+
+
+def encode_cursor(timestamp: datetime, reading_id: int) -> str:
+    """
+    Opaque keyset cursor for the (timestamp, id) position of a reading
+    """
+    raw = f"{timestamp.isoformat()}|{reading_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, reading_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(reading_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def next_cursor(readings: List[Any], limit: Optional[int]) -> Optional[str]:
+    """
+    Cursor for the page after readings, or None when this was the last page
+    """
+    if not readings or not limit or len(readings) < limit:
+        return None
+    last = readings[-1]
+    return encode_cursor(last.timestamp, last.id)
+
+
+def _before_cursor(cursor: str):
+    """
+    Rows after the cursor in (timestamp DESC, id DESC) order. The redundant
+    timestamp <= bound lets the (column, timestamp) indexes serve the range.
+    """
+    timestamp, reading_id = decode_cursor(cursor)
+    return and_(
+        Reading.timestamp <= timestamp,
+        or_(Reading.timestamp < timestamp, Reading.id < reading_id)
+    )
+
+
+def _latest_stmt(filter_params: ReadingFilter) -> Select:
+    stmt = select(Reading)
+
+    # Apply filters
+    if filter_params.type:
+        stmt = stmt.where(Reading.type == filter_params.type)
+
+    if filter_params.location:
+        stmt = stmt.where(Reading.location == filter_params.location)
+
+    if filter_params.since:
+        stmt = stmt.where(Reading.timestamp >= filter_params.since)
+
+    if filter_params.cursor:
+        stmt = stmt.where(_before_cursor(filter_params.cursor))
+
+    # Order by timestamp descending (id breaks ties for paging) and apply limit
+    stmt = stmt.order_by(desc(Reading.timestamp), desc(Reading.id))
+
+    if filter_params.limit:
+        stmt = stmt.limit(filter_params.limit)
+
+    return stmt
+
+
+def _recent_stmt(column, value, limit: int, cursor: Optional[str] = None) -> Select:
+    stmt = select(Reading).where(column == value)
+    if cursor:
+        stmt = stmt.where(_before_cursor(cursor))
+    return stmt.order_by(desc(Reading.timestamp), desc(Reading.id)).limit(limit)
+
+
+def _export_stmt(sensor_pk: Optional[int], reading_type: Optional[str], location: Optional[str],
+                 start: Optional[datetime], end: Optional[datetime], chunk_size: int) -> Select:
+    """
+    All matching readings in (timestamp, id) order as plain rows, fetched chunk_size at a time
+    """
+    stmt = select(*READING_COLUMNS)
+    if sensor_pk is not None:
+        stmt = stmt.where(Reading.sensor_id == sensor_pk)
+    if reading_type:
+        stmt = stmt.where(Reading.type == reading_type)
+    if location:
+        stmt = stmt.where(Reading.location == location)
+    if start:
+        stmt = stmt.where(Reading.timestamp >= start)
+    if end:
+        stmt = stmt.where(Reading.timestamp < end)
+    return stmt.order_by(Reading.timestamp, Reading.id).execution_options(yield_per=chunk_size)
+
+
+def _location_match_clause(location_prefix: str):
+    """
+    Locations containing location_prefix anywhere, case-insensitively, as
+    the sensor context has always matched them ("attic" matches
+    "north_attic"); ILIKE on PostgreSQL, lower() LIKE elsewhere
+    """
+    return Reading.location.icontains(location_prefix, autoescape=True)
+
+
+def _window_stmt(window_seconds: int, limit: int, location_prefix: Optional[str] = None,
+                 reading_type: Optional[str] = None) -> Select:
+    since = datetime.utcnow() - timedelta(seconds=window_seconds)
+    stmt = select(Reading).where(Reading.timestamp >= since)
+    if location_prefix:
+        stmt = stmt.where(_location_match_clause(location_prefix))
+    if reading_type:
+        stmt = stmt.where(Reading.type == reading_type)
+    return stmt.order_by(desc(Reading.timestamp), desc(Reading.id)).limit(limit)
+
+
+# Columns /stats can group by; "sensor" reports the external sensor_id
+STATS_GROUP_COLUMNS = {
+    "type": Reading.type,
+    "location": Reading.location,
+    "sensor": Sensor.sensor_id,
+}
+
+# Upper bound on grouped result rows, so payloads stay bounded as the table grows
+STATS_MAX_GROUPS = 500
+
+
+def _stats_stmt(sensor_pk: Optional[int], reading_type: Optional[str], location: Optional[str],
+                group_by: List[str], percentiles: List[float], include_stddev: bool,
+                max_groups: int, location_prefix: Optional[str] = None,
+                since: Optional[datetime] = None) -> Select:
+    """
+    Aggregate query for reading statistics; one row per group (or one row overall).
+    Percentiles use nearest-rank semantics, computed from window functions so the
+    same SQL runs on SQLite and PostgreSQL without pulling values into Python.
+    """
+    unknown = [name for name in group_by if name not in STATS_GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cannot group statistics by {', '.join(unknown)}; "
+                         f"choose from {', '.join(STATS_GROUP_COLUMNS)}")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100")
+
+    keys = [STATS_GROUP_COLUMNS[name] for name in group_by]
+    columns = [Reading.value, Reading.confidence, *[key.label(name) for name, key in zip(group_by, keys)]]
+    if percentiles:
+        partition = keys or None
+        columns.append(func.row_number().over(partition_by=partition, order_by=Reading.value).label("rank"))
+        columns.append(func.count().over(partition_by=partition).label("total"))
+
+    source = select(*columns)
+    if "sensor" in group_by:
+        source = source.join(Sensor, Reading.sensor_id == Sensor.id)
+    if sensor_pk is not None:
+        source = source.where(Reading.sensor_id == sensor_pk)
+    if reading_type:
+        source = source.where(Reading.type == reading_type)
+    if location:
+        source = source.where(Reading.location == location)
+    if location_prefix:
+        source = source.where(_location_match_clause(location_prefix))
+    if since:
+        source = source.where(Reading.timestamp >= since)
+    source = source.subquery()
+
+    group_columns = [source.c[name] for name in group_by]
+    aggregates = [
+        func.count().label("count"),
+        func.avg(source.c.value).label("avg_value"),
+        func.min(source.c.value).label("min_value"),
+        func.max(source.c.value).label("max_value"),
+        func.avg(source.c.confidence).label("avg_confidence"),
+    ]
+    if include_stddev:
+        # Population stddev from E[x^2] - E[x]^2; SQLite has no stddev aggregate
+        aggregates.append(func.avg(source.c.value * source.c.value).label("avg_square"))
+    for i, pct in enumerate(percentiles):
+        # Smallest value whose rank covers pct% of the group
+        in_tail = source.c.rank >= source.c.total * (pct / 100.0)
+        aggregates.append(func.min(case((in_tail, source.c.value))).label(f"pct_{i}"))
+
+    stmt = select(*group_columns, *aggregates)
+    if group_columns:
+        stmt = stmt.group_by(*group_columns).order_by(desc("count"), *group_columns).limit(max_groups + 1)
+    return stmt
+
+
+def _percentile_key(pct: float) -> str:
+    return f"p{pct:g}"
+
+
+def _summarize(row: Row, percentiles: List[float], include_stddev: bool) -> Dict[str, Any]:
+    if not row.count:
+        stats = {
+            "count": 0,
+            "avg_value": 0,
+            "min_value": 0,
+            "max_value": 0,
+            "avg_confidence": 0
+        }
+        if include_stddev:
+            stats["stddev_value"] = 0
+        if percentiles:
+            stats["percentiles"] = {_percentile_key(p): 0 for p in percentiles}
+        return stats
+
+    stats = {
+        "count": row.count,
+        "avg_value": row.avg_value,
+        "min_value": row.min_value,
+        "max_value": row.max_value,
+        "avg_confidence": row.avg_confidence
+    }
+    if include_stddev:
+        stats["stddev_value"] = math.sqrt(max(row.avg_square - row.avg_value ** 2, 0.0))
+    if percentiles:
+        stats["percentiles"] = {
+            _percentile_key(p): row._mapping[f"pct_{i}"] for i, p in enumerate(percentiles)
+        }
+    return stats
+
+
+def _stats_result(rows: List[Row], group_by: List[str], percentiles: List[float],
+                  include_stddev: bool, max_groups: int) -> Dict[str, Any]:
+    """
+    Shape aggregate rows: a flat stats dict, or bounded per-group stats when grouping
+    """
+    if not group_by:
+        return _summarize(rows[0], percentiles, include_stddev)
+
+    groups = []
+    for row in rows[:max_groups]:
+        group = {name: row._mapping[name] for name in group_by}
+        group.update(_summarize(row, percentiles, include_stddev))
+        groups.append(group)
+
+    return {
+        "group_by": group_by,
+        "groups": groups,
+        "truncated": len(rows) > max_groups
+    }
+
+
 class ReadingsService:
     """Service for managing reading operations"""
-    
+
     def __init__(self, db: Session):
         self.db = db
-    
-    def append_many(self, readings_data: List[ReadingData]) -> List[Reading]:
-        """
-        Append multiple readings to the database
-        """
-        readings = []
-        for reading_data in readings_data:
-            # Get sensor by sensor_id
-            sensor = self.db.query(Sensor).filter(Sensor.sensor_id == reading_data.sensor_id).first()
-            if not sensor:
-                raise ValueError(f"Sensor with ID {reading_data.sensor_id} not found")
-            
-            # Create reading
-            reading = Reading(
-                sensor_id=sensor.id,
-                type=reading_data.type,
-                location=reading_data.location,
-                value=reading_data.value,
-                unit=reading_data.unit,
-                confidence=reading_data.confidence,
-                calibration_json=reading_data.calibration_json,
-                extras_json=reading_data.extras_json,
-                timestamp=reading_data.timestamp
-            )
-            self.db.add(reading)
-            readings.append(reading)
-        
-        self.db.commit()
-        for reading in readings:
-            self.db.refresh(reading)
-        
+
+    def append_many(self, readings_data: List[ReadingData], commit: bool = True) -> List[Row]:
+        """
+        Append multiple readings to the database.
+        Sensor IDs are resolved in one query and the readings are written with a
+        single executemany INSERT ... RETURNING, so a batch costs a fixed number
+        of round trips regardless of its size. Rollup buckets are updated in the
+        same transaction.
+        """
+        if not readings_data:
+            return []
+
+        sensor_ids = self._resolve_sensor_ids({r.sensor_id for r in readings_data})
+        rows = _reading_rows(readings_data, sensor_ids)
+        readings = sorted(self.db.execute(_insert_readings_stmt(), rows).all(), key=lambda r: r.id)
+        RollupService(self.db).apply(readings)
+
+        if commit:
+            self.db.commit()
+
         return readings
-    
+
+    def _resolve_sensor_ids(self, sensor_ids: Set[str]) -> Dict[str, int]:
+        """
+        Map external sensor_id strings to Sensor primary keys.
+        Served from the shared sensor-id cache; misses are fetched in one query.
+        """
+        resolved, missing = sensor_id_cache.get_many(sensor_ids)
+        if not missing:
+            return resolved
+
+        fetched = dict(self.db.execute(_sensor_ids_stmt(missing)).all())
+        sensor_id_cache.put_many(fetched)
+        resolved.update(fetched)
+        return resolved
+
     def get_latest(self, filter_params: ReadingFilter) -> List[Reading]:
         """
         Get latest readings based on filter parameters
         """
-        query = self.db.query(Reading)
-        
-        # Apply filters
-        if filter_params.type:
-            query = query.filter(Reading.type == filter_params.type)
-        
-        if filter_params.location:
-            query = query.filter(Reading.location == filter_params.location)
-        
-        if filter_params.since:
-            query = query.filter(Reading.timestamp >= filter_params.since)
-        
-        # Order by timestamp descending and apply limit
-        query = query.order_by(desc(Reading.timestamp))
-        
-        if filter_params.limit:
-            query = query.limit(filter_params.limit)
-        
-        return query.all()
-    
-    def get_readings_by_sensor(self, sensor_id: str, limit: int = 100) -> List[Reading]:
-        """
-        Get readings for a specific sensor
-        """
-        sensor = self.db.query(Sensor).filter(Sensor.sensor_id == sensor_id).first()
-        if not sensor:
+        return self.db.scalars(_latest_stmt(filter_params)).all()
+
+    def get_readings_by_sensor(self, sensor_id: str, limit: int = 100,
+                               cursor: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings for a specific sensor, newest first, after an optional page cursor
+        """
+        sensor_pk = self._resolve_sensor_ids({sensor_id}).get(sensor_id)
+        if sensor_pk is None:
             return []
-        
-        return (
-            self.db.query(Reading)
-            .filter(Reading.sensor_id == sensor.id)
-            .order_by(desc(Reading.timestamp))
-            .limit(limit)
-            .all()
-        )
-    
-    def get_readings_by_type(self, reading_type: str, limit: int = 100) -> List[Reading]:
+
+        return self.db.scalars(_recent_stmt(Reading.sensor_id, sensor_pk, limit, cursor)).all()
+
+    def get_readings_by_type(self, reading_type: str, limit: int = 100,
+                             cursor: Optional[str] = None) -> List[Reading]:
         """
         Get readings by type
         """
-        return (
-            self.db.query(Reading)
-            .filter(Reading.type == reading_type)
-            .order_by(desc(Reading.timestamp))
-            .limit(limit)
-            .all()
-        )
-    
-    def get_readings_by_location(self, location: str, limit: int = 100) -> List[Reading]:
+        return self.db.scalars(_recent_stmt(Reading.type, reading_type, limit, cursor)).all()
+
+    def get_readings_by_location(self, location: str, limit: int = 100,
+                                 cursor: Optional[str] = None) -> List[Reading]:
         """
         Get readings by location
         """
-        return (
-            self.db.query(Reading)
-            .filter(Reading.location == location)
-            .order_by(desc(Reading.timestamp))
-            .limit(limit)
-            .all()
-        )
-    
-    def get_recent_readings(self, window_seconds: int = 60, limit: int = 100) -> List[Reading]:
-        """
-        Get readings from the last N seconds
-        """
-        since = datetime.utcnow() - timedelta(seconds=window_seconds)
-        return (
-            self.db.query(Reading)
-            .filter(Reading.timestamp >= since)
-            .order_by(desc(Reading.timestamp))
-            .limit(limit)
-            .all()
-        )
-    
-    def get_reading_stats(self, sensor_id: Optional[str] = None, 
+        return self.db.scalars(_recent_stmt(Reading.location, location, limit, cursor)).all()
+
+    def iter_readings(self, sensor_pk: Optional[int] = None, reading_type: Optional[str] = None,
+                      location: Optional[str] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, chunk_size: int = 1000) -> Iterator[List[Row]]:
+        """
+        Yield matching readings in chunks from a server-side cursor, oldest first,
+        so exports run in constant memory
+        """
+        stmt = _export_stmt(sensor_pk, reading_type, location, start, end, chunk_size)
+        for partition in self.db.execute(stmt).partitions():
+            yield partition
+
+    def get_recent_readings(self, window_seconds: int = 60, limit: int = 100,
+                            location_prefix: Optional[str] = None,
+                            reading_type: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings from the last N seconds, most recent first, optionally at
+        locations containing location_prefix (case-insensitive)
+        """
+        return self.db.scalars(_window_stmt(window_seconds, limit, location_prefix, reading_type)).all()
+
+    def get_reading_stats(self, sensor_id: Optional[str] = None,
                          reading_type: Optional[str] = None,
-                         location: Optional[str] = None) -> Dict[str, Any]:
+                         location: Optional[str] = None,
+                         group_by: Optional[List[str]] = None,
+                         percentiles: Optional[List[float]] = None,
+                         include_stddev: bool = False,
+                         max_groups: int = STATS_MAX_GROUPS,
+                         location_prefix: Optional[str] = None,
+                         since: Optional[datetime] = None) -> Dict[str, Any]:
         """
-        Get reading statistics
+        Get reading statistics, aggregated in the database.
+        group_by takes any of "type", "location" and "sensor"; percentiles are 0-100.
+        location_prefix matches anywhere in the location, case-insensitively;
+        since limits the statistics to readings at or after it.
         """
-        query = self.db.query(Reading)
-        
+        group_by, percentiles = group_by or [], percentiles or []
+        sensor_pk = None
         if sensor_id:
-            sensor = self.db.query(Sensor).filter(Sensor.sensor_id == sensor_id).first()
-            if sensor:
-                query = query.filter(Reading.sensor_id == sensor.id)
-        
-        if reading_type:
-            query = query.filter(Reading.type == reading_type)
-        
-        if location:
-            query = query.filter(Reading.location == location)
-        
-        readings = query.all()
-        
-        if not readings:
-            return {
-                "count": 0,
-                "avg_value": 0,
-                "min_value": 0,
-                "max_value": 0,
-                "avg_confidence": 0
-            }
-        
-        values = [r.value for r in readings]
-        confidences = [r.confidence for r in readings]
-        
-        return {
-            "count": len(readings),
-            "avg_value": sum(values) / len(values),
-            "min_value": min(values),
-            "max_value": max(values),
-            "avg_confidence": sum(confidences) / len(confidences)
-        }
+            # Unknown sensors match no readings rather than every reading
+            sensor_pk = self._resolve_sensor_ids({sensor_id}).get(sensor_id, -1)
+
+        stmt = _stats_stmt(sensor_pk, reading_type, location, group_by, percentiles, include_stddev, max_groups,
+                           location_prefix, since)
+        rows = self.db.execute(stmt).all()
+        return _stats_result(rows, group_by, percentiles, include_stddev, max_groups)
+
+
+class AsyncReadingsService:
+    """Async counterpart of ReadingsService for AsyncSession-backed routes"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def append_many(self, readings_data: List[ReadingData], commit: bool = True) -> List[Row]:
+        """
+        Append multiple readings to the database (see ReadingsService.append_many)
+        """
+        if not readings_data:
+            return []
+
+        sensor_ids = await self._resolve_sensor_ids({r.sensor_id for r in readings_data})
+        rows = _reading_rows(readings_data, sensor_ids)
+        result = await self.db.execute(_insert_readings_stmt(), rows)
+        readings = sorted(result.all(), key=lambda r: r.id)
+        await AsyncRollupService(self.db).apply(readings)
+
+        if commit:
+            await self.db.commit()
+
+        return readings
+
+    async def _resolve_sensor_ids(self, sensor_ids: Set[str]) -> Dict[str, int]:
+        """
+        Map external sensor_id strings to Sensor primary keys via the shared cache
+        """
+        resolved, missing = sensor_id_cache.get_many(sensor_ids)
+        if not missing:
+            return resolved
+
+        fetched = dict((await self.db.execute(_sensor_ids_stmt(missing))).all())
+        sensor_id_cache.put_many(fetched)
+        resolved.update(fetched)
+        return resolved
+
+    async def get_latest(self, filter_params: ReadingFilter) -> List[Reading]:
+        """
+        Get latest readings based on filter parameters
+        """
+        return (await self.db.scalars(_latest_stmt(filter_params))).all()
+
+    async def get_readings_by_sensor(self, sensor_id: str, limit: int = 100,
+                                     cursor: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings for a specific sensor, newest first, after an optional page cursor
+        """
+        sensor_pk = (await self._resolve_sensor_ids({sensor_id})).get(sensor_id)
+        if sensor_pk is None:
+            return []
+
+        return (await self.db.scalars(_recent_stmt(Reading.sensor_id, sensor_pk, limit, cursor))).all()
+
+    async def get_readings_by_type(self, reading_type: str, limit: int = 100,
+                                   cursor: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings by type
+        """
+        return (await self.db.scalars(_recent_stmt(Reading.type, reading_type, limit, cursor))).all()
+
+    async def get_readings_by_location(self, location: str, limit: int = 100,
+                                       cursor: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings by location
+        """
+        return (await self.db.scalars(_recent_stmt(Reading.location, location, limit, cursor))).all()
+
+    async def stream_readings(self, sensor_pk: Optional[int] = None, reading_type: Optional[str] = None,
+                              location: Optional[str] = None, start: Optional[datetime] = None,
+                              end: Optional[datetime] = None, chunk_size: int = 1000) -> AsyncIterator[List[Row]]:
+        """
+        Yield matching readings in chunks from a server-side cursor (see ReadingsService.iter_readings)
+        """
+        result = await self.db.stream(_export_stmt(sensor_pk, reading_type, location, start, end, chunk_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_recent_readings(self, window_seconds: int = 60, limit: int = 100,
+                                  location_prefix: Optional[str] = None,
+                                  reading_type: Optional[str] = None) -> List[Reading]:
+        """
+        Get readings from the last N seconds (see ReadingsService.get_recent_readings)
+        """
+        return (await self.db.scalars(_window_stmt(window_seconds, limit, location_prefix, reading_type))).all()
+
+    async def get_reading_stats(self, sensor_id: Optional[str] = None,
+                                reading_type: Optional[str] = None,
+                                location: Optional[str] = None,
+                                group_by: Optional[List[str]] = None,
+                                percentiles: Optional[List[float]] = None,
+                                include_stddev: bool = False,
+                                max_groups: int = STATS_MAX_GROUPS,
+                                location_prefix: Optional[str] = None,
+                                since: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Get reading statistics, aggregated in the database (see ReadingsService.get_reading_stats)
+        """
+        group_by, percentiles = group_by or [], percentiles or []
+        sensor_pk = None
+        if sensor_id:
+            sensor_pk = (await self._resolve_sensor_ids({sensor_id})).get(sensor_id, -1)
+
+        stmt = _stats_stmt(sensor_pk, reading_type, location, group_by, percentiles, include_stddev, max_groups,
+                           location_prefix, since)
+        rows = (await self.db.execute(stmt)).all()
+        return _stats_result(rows, group_by, percentiles, include_stddev, max_groups)
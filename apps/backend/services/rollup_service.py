@@ -0,0 +1,417 @@
+"""
+Downsampled reading storage.
+Raw readings are kept for a configurable window; 1-minute and 1-hour rollups
+(count/sum/min/max per sensor, type and location) are upserted at ingest and
+serve range queries at coarser resolutions.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, case, delete, func, literal, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.advisory_lock import PRUNE_LOCK_KEY, advisory_lock
+from models.reading import Reading, naive_utc
+from models.reading_rollup import ReadingRollup
+from services.sensor_service import UPSERT_INSERTS
+
+RAW_TIER = "raw"
+
+# Rollup tiers, finest first: name -> bucket width in seconds (must divide a day)
+ROLLUP_TIERS = {
+    "1m": 60,
+    "1h": 3600,
+}
+
+
+def _retention(env_name: str, default_days: str) -> Optional[timedelta]:
+    days = float(os.getenv(env_name, default_days))
+    return timedelta(days=days) if days > 0 else None
+
+
+# How long each tier is kept; None (a value of 0) keeps it forever. Raw readings
+# are kept by default: deployments upgraded from before rollups existed have
+# raw history that no rollup covers until rebuild_rollups.py has run.
+RAW_RETENTION = _retention("READINGS_RAW_RETENTION_DAYS", "0")
+ROLLUP_RETENTION = {
+    "1m": _retention("ROLLUP_1M_RETENTION_DAYS", "90"),
+    "1h": _retention("ROLLUP_1H_RETENTION_DAYS", "0"),
+}
+
+PRUNE_INTERVAL_SECONDS = float(os.getenv("ROLLUP_PRUNE_INTERVAL_SECONDS", "3600"))
+PRUNE_BATCH_SIZE = 10000
+
+# Rows per multi-VALUES upsert, keeping bind parameters under SQLite's limit
+UPSERT_CHUNK_SIZE = 500
+
+ROLLUP_KEY = ("tier", "sensor_id", "bucket_start", "type", "location")
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """
+    Start of the bucket containing timestamp; works for naive and aware datetimes
+    """
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = int((timestamp - midnight).total_seconds())
+    return midnight + timedelta(seconds=offset - offset % seconds)
+
+
+def rollup_rows(readings: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Pre-aggregate inserted readings into one row per tier and bucket, so each
+    upsert touches a bucket at most once
+    """
+    buckets: Dict[Tuple, Dict[str, Any]] = {}
+    for reading in readings:
+        for tier, seconds in ROLLUP_TIERS.items():
+            start = bucket_start(reading.timestamp, seconds)
+            key = (tier, reading.sensor_id, start, reading.type, reading.location)
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    "tier": tier,
+                    "bucket_start": start,
+                    "sensor_id": reading.sensor_id,
+                    "type": reading.type,
+                    "location": reading.location,
+                    "count": 1,
+                    "sum_value": reading.value,
+                    "min_value": reading.value,
+                    "max_value": reading.value,
+                    "sum_confidence": reading.confidence
+                }
+            else:
+                row["count"] += 1
+                row["sum_value"] += reading.value
+                row["min_value"] = min(row["min_value"], reading.value)
+                row["max_value"] = max(row["max_value"], reading.value)
+                row["sum_confidence"] += reading.confidence
+    return list(buckets.values())
+
+
+def _merge_rollup(rollup: ReadingRollup, row: Dict[str, Any]) -> None:
+    rollup.count += row["count"]
+    rollup.sum_value += row["sum_value"]
+    rollup.min_value = min(rollup.min_value, row["min_value"])
+    rollup.max_value = max(rollup.max_value, row["max_value"])
+    rollup.sum_confidence += row["sum_confidence"]
+
+
+def _rollup_upsert_stmts(dialect_name: str, rows: List[Dict[str, Any]]) -> Optional[List]:
+    """
+    INSERT ... ON CONFLICT DO UPDATE statements that add rows into existing
+    buckets, or None if the dialect has no upsert
+    """
+    insert = UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        return None
+
+    table = ReadingRollup.__table__
+    stmts = []
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        new = stmt.excluded
+        stmts.append(stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in ROLLUP_KEY],
+            set_={
+                "count": table.c.count + new.count,
+                "sum_value": table.c.sum_value + new.sum_value,
+                "min_value": case((new.min_value < table.c.min_value, new.min_value), else_=table.c.min_value),
+                "max_value": case((new.max_value > table.c.max_value, new.max_value), else_=table.c.max_value),
+                "sum_confidence": table.c.sum_confidence + new.sum_confidence
+            }
+        ))
+    return stmts
+
+
+def _rollup_lookup_stmt(row: Dict[str, Any]) -> Select:
+    return select(ReadingRollup).where(*[getattr(ReadingRollup, name) == row[name] for name in ROLLUP_KEY])
+
+
+def choose_tier(resolution_seconds: int, start: datetime, now: Optional[datetime] = None) -> str:
+    """
+    Coarsest tier whose buckets are no wider than the requested resolution.
+    If that tier no longer holds data as old as start, the next coarser tier
+    that does is used instead.
+    """
+    now = now or datetime.utcnow()
+    tiers = [(RAW_TIER, 0, RAW_RETENTION)]
+    tiers += [(name, seconds, ROLLUP_RETENTION[name]) for name, seconds in ROLLUP_TIERS.items()]
+
+    finest = max(i for i, (_, seconds, _) in enumerate(tiers) if seconds <= resolution_seconds)
+    for name, _, retention in tiers[finest:]:
+        if retention is None or naive_utc(start) >= now - retention:
+            return name
+    return tiers[-1][0]
+
+
+def parse_resolution(value: str) -> int:
+    """
+    Resolution in seconds from "raw", a tier name such as "1m", or a number of seconds
+    """
+    if value == RAW_TIER:
+        return 0
+    if value in ROLLUP_TIERS:
+        return ROLLUP_TIERS[value]
+    try:
+        seconds = int(value)
+    except ValueError:
+        seconds = -1
+    if seconds < 0:
+        raise ValueError(f"resolution must be raw, {', '.join(ROLLUP_TIERS)} or a number of seconds")
+    return seconds
+
+
+def tier_seconds(tier: str) -> int:
+    return 0 if tier == RAW_TIER else ROLLUP_TIERS[tier]
+
+
+def _history_stmt(tier: str, sensor_pk: Optional[int], reading_type: Optional[str],
+                  location: Optional[str], start: datetime, end: datetime, limit: int) -> Select:
+    """
+    Time-ordered points for a range, with the same columns for raw and rolled-up tiers
+    """
+    if tier == RAW_TIER:
+        model, ts = Reading, Reading.timestamp
+        stmt = select(
+            ts.label("bucket_start"),
+            Reading.sensor_id,
+            Reading.type,
+            Reading.location,
+            literal(1).label("count"),
+            Reading.value.label("avg_value"),
+            Reading.value.label("min_value"),
+            Reading.value.label("max_value"),
+            Reading.confidence.label("avg_confidence"),
+        )
+    else:
+        # Include the bucket that contains start
+        start = bucket_start(start, ROLLUP_TIERS[tier])
+        model, ts = ReadingRollup, ReadingRollup.bucket_start
+        stmt = select(
+            ts,
+            ReadingRollup.sensor_id,
+            ReadingRollup.type,
+            ReadingRollup.location,
+            ReadingRollup.count,
+            (ReadingRollup.sum_value / ReadingRollup.count).label("avg_value"),
+            ReadingRollup.min_value,
+            ReadingRollup.max_value,
+            (ReadingRollup.sum_confidence / ReadingRollup.count).label("avg_confidence"),
+        ).where(ReadingRollup.tier == tier)
+
+    if sensor_pk is not None:
+        stmt = stmt.where(model.sensor_id == sensor_pk)
+    if reading_type:
+        stmt = stmt.where(model.type == reading_type)
+    if location:
+        stmt = stmt.where(model.location == location)
+
+    return stmt.where(ts >= start, ts < end).order_by(ts, model.sensor_id).limit(limit + 1)
+
+
+def _history_result(rows: List[Any], tier: str, start: datetime, end: datetime, limit: int) -> Dict[str, Any]:
+    return {
+        "tier": tier,
+        "resolution_seconds": tier_seconds(tier),
+        "start": start,
+        "end": end,
+        "points": [dict(row._mapping) for row in rows[:limit]],
+        "truncated": len(rows) > limit
+    }
+
+
+def _history_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end
+
+
+def _prune_targets(now: datetime, rolled_up_since: Optional[datetime]) -> List[Tuple[str, Any, Any]]:
+    """
+    (label, model, expired-row condition) for every tier with a retention window.
+    Raw readings are only pruned from rolled_up_since (the oldest bucket of the
+    coarsest tier) on: older ones were never rolled up and would be lost.
+    """
+    targets = []
+    if RAW_RETENTION is not None and rolled_up_since is not None:
+        condition = and_(Reading.timestamp >= rolled_up_since, Reading.timestamp < now - RAW_RETENTION)
+        targets.append((RAW_TIER, Reading, condition))
+    for tier, retention in ROLLUP_RETENTION.items():
+        if retention is not None:
+            condition = and_(ReadingRollup.tier == tier, ReadingRollup.bucket_start < now - retention)
+            targets.append((tier, ReadingRollup, condition))
+    return targets
+
+
+class RollupService:
+    """Service for maintaining and querying reading rollups"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(self, readings: Iterable[Any]) -> None:
+        """
+        Add newly inserted readings into their rollup buckets (no commit)
+        """
+        rows = rollup_rows(readings)
+        if not rows:
+            return
+
+        stmts = _rollup_upsert_stmts(self.db.get_bind().dialect.name, rows)
+        if stmts is None:
+            self._merge_rollups(rows)
+            return
+        for stmt in stmts:
+            self.db.execute(stmt)
+
+    def _merge_rollups(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Portable path for dialects without ON CONFLICT: look up each bucket, then flush
+        """
+        for row in rows:
+            rollup = self.db.scalars(_rollup_lookup_stmt(row)).first()
+            if rollup:
+                _merge_rollup(rollup, row)
+            else:
+                self.db.add(ReadingRollup(**row))
+        self.db.flush()
+
+    def get_history(self, sensor_pk: Optional[int] = None, reading_type: Optional[str] = None,
+                    location: Optional[str] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, resolution_seconds: int = 0,
+                    limit: int = 1000) -> Dict[str, Any]:
+        """
+        Points for a time range from the coarsest tier that satisfies the resolution
+        """
+        start, end = _history_range(start, end)
+        tier = choose_tier(resolution_seconds, start)
+        rows = self.db.execute(_history_stmt(tier, sensor_pk, reading_type, location, start, end, limit)).all()
+        return _history_result(rows, tier, start, end, limit)
+
+    def prune(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete raw readings and rollups past their retention window.
+        Deletes run in batches, each committed, so writers are not blocked for long.
+        Raw readings older than every rollup are kept until rebuild() covers them.
+        """
+        now = now or datetime.utcnow()
+        coarsest = max(ROLLUP_TIERS, key=ROLLUP_TIERS.get)
+        rolled_up_since = self.db.scalar(
+            select(func.min(ReadingRollup.bucket_start)).where(ReadingRollup.tier == coarsest)
+        )
+        deleted = {}
+        for label, model, condition in _prune_targets(now, rolled_up_since):
+            deleted[label] = 0
+            while True:
+                batch = select(model.id).where(condition).limit(PRUNE_BATCH_SIZE)
+                result = self.db.execute(delete(model).where(model.id.in_(batch)))
+                self.db.commit()
+                deleted[label] += result.rowcount
+                if result.rowcount < PRUNE_BATCH_SIZE:
+                    break
+        return deleted
+
+    def rebuild(self, since: Optional[datetime] = None, batch_size: int = 5000) -> int:
+        """
+        Recompute rollups from raw readings at or after since (default: the oldest
+        raw reading). Rollups older than that are left alone, since their raw
+        readings may already be pruned. Returns the number of readings rolled up.
+        """
+        if since is None:
+            since = self.db.scalar(select(func.min(Reading.timestamp)))
+            if since is None:
+                return 0
+        # Start on an hour boundary so no bucket of any tier is rebuilt from partial data
+        since = bucket_start(naive_utc(since), max(ROLLUP_TIERS.values()))
+
+        self.db.execute(delete(ReadingRollup).where(ReadingRollup.bucket_start >= since))
+        last_id, total = 0, 0
+        while True:
+            readings = self.db.execute(
+                select(Reading.id, Reading.sensor_id, Reading.type, Reading.location,
+                       Reading.value, Reading.confidence, Reading.timestamp)
+                .where(Reading.timestamp >= since, Reading.id > last_id)
+                .order_by(Reading.id)
+                .limit(batch_size)
+            ).all()
+            if not readings:
+                break
+            self.apply(readings)
+            last_id = readings[-1].id
+            total += len(readings)
+        self.db.commit()
+        return total
+
+
+class AsyncRollupService:
+    """Async counterpart of RollupService for AsyncSession-backed routes"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def apply(self, readings: Iterable[Any]) -> None:
+        """
+        Add newly inserted readings into their rollup buckets (no commit)
+        """
+        rows = rollup_rows(readings)
+        if not rows:
+            return
+
+        stmts = _rollup_upsert_stmts(self.db.get_bind().dialect.name, rows)
+        if stmts is None:
+            await self._merge_rollups(rows)
+            return
+        for stmt in stmts:
+            await self.db.execute(stmt)
+
+    async def _merge_rollups(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            rollup = (await self.db.scalars(_rollup_lookup_stmt(row))).first()
+            if rollup:
+                _merge_rollup(rollup, row)
+            else:
+                self.db.add(ReadingRollup(**row))
+        await self.db.flush()
+
+    async def get_history(self, sensor_pk: Optional[int] = None, reading_type: Optional[str] = None,
+                          location: Optional[str] = None, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, resolution_seconds: int = 0,
+                          limit: int = 1000) -> Dict[str, Any]:
+        """
+        Points for a time range from the coarsest tier that satisfies the resolution
+        """
+        start, end = _history_range(start, end)
+        tier = choose_tier(resolution_seconds, start)
+        result = await self.db.execute(_history_stmt(tier, sensor_pk, reading_type, location, start, end, limit))
+        return _history_result(result.all(), tier, start, end, limit)
+
+
+async def run_pruner(session_factory: Callable[[], Session],
+                     interval_seconds: float = PRUNE_INTERVAL_SECONDS) -> None:
+    """
+    Background task: prune expired readings and rollups every interval.
+    Runs the synchronous prune in a worker thread so the event loop stays free.
+    On PostgreSQL a round is skipped while another worker's prune holds the lock.
+    """
+    def prune_once() -> Dict[str, int]:
+        db = session_factory()
+        try:
+            with advisory_lock(db.get_bind(), PRUNE_LOCK_KEY, wait=False) as held:
+                return RollupService(db).prune() if held else {}
+        finally:
+            db.close()
+
+    while True:
+        try:
+            deleted = await asyncio.to_thread(prune_once)
+            if any(deleted.values()):
+                print(f"🧹 Pruned expired readings/rollups: {deleted}")
+        except Exception as e:
+            print(f"Error pruning readings: {e}")
+        await asyncio.sleep(interval_seconds)
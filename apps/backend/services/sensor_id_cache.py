@@ -0,0 +1,129 @@
+"""
+In-process cache mapping external sensor_id strings to Sensor primary keys
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.sensor import Sensor
+
+
+class SensorIdCache:
+    """
+    Bounded LRU map from sensor_id to Sensor.id.
+
+    Sensors are rarely deleted, so the mapping is safe to keep for the life of
+    the process as long as every write path keeps it in sync: upserts store the
+    ids they return and delete_sensor invalidates. The cache is per process, so
+    a sensor deleted by another worker stays cached here until evicted.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, sensor_ids: Iterable[str]) -> Tuple[Dict[str, int], Set[str]]:
+        """
+        Look up several sensor_ids, returning (found, missing)
+        """
+        found = {}
+        missing = set()
+        with self._lock:
+            for sensor_id in sensor_ids:
+                pk = self._entries.get(sensor_id)
+                if pk is None:
+                    missing.add(sensor_id)
+                else:
+                    self._entries.move_to_end(sensor_id)
+                    found[sensor_id] = pk
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def peek_many(self, sensor_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        Look up cached sensor_ids without counting hits or refreshing recency
+        """
+        with self._lock:
+            return {s: self._entries[s] for s in sensor_ids if s in self._entries}
+
+    def get(self, sensor_id: str) -> Optional[int]:
+        """
+        Look up a single sensor_id
+        """
+        found, _ = self.get_many([sensor_id])
+        return found.get(sensor_id)
+
+    def put_many(self, mapping: Dict[str, int]) -> None:
+        """
+        Store sensor_id -> id pairs, evicting least recently used entries
+        """
+        with self._lock:
+            for sensor_id, pk in mapping.items():
+                self._entries[sensor_id] = pk
+                self._entries.move_to_end(sensor_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, sensor_id: str, pk: int) -> None:
+        """
+        Store a single sensor_id -> id pair
+        """
+        self.put_many({sensor_id: pk})
+
+    def invalidate(self, *sensor_ids: str) -> None:
+        """
+        Drop sensor_ids from the cache
+        """
+        with self._lock:
+            for sensor_id in sensor_ids:
+                self._entries.pop(sensor_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop every entry and reset counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def warm(self, db: Session) -> int:
+        """
+        Load up to maxsize sensors from the database, most recent first
+        """
+        rows = db.execute(
+            select(Sensor.sensor_id, Sensor.id).order_by(Sensor.id.desc()).limit(self.maxsize)
+        ).all()
+        # Insert oldest first so the newest sensors end up most recently used
+        self.put_many(dict(reversed(rows)))
+        return len(rows)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters for monitoring
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# Shared by every SensorService/ReadingsService in this process
+sensor_id_cache = SensorIdCache(maxsize=int(os.getenv("SENSOR_ID_CACHE_SIZE", "10000")))
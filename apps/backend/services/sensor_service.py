@@ -1,8 +1,87 @@
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models.reading import Reading
+from models.reading_rollup import ReadingRollup
 from models.sensor import Sensor
 from schemas.sensor import SensorData
-from typing import List, Optional
+from services.current_readings import current_readings
+from services.reading_window import reading_window
+from services.sensor_id_cache import sensor_id_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# Dialect-specific INSERT constructs that support ON CONFLICT upserts
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def _sensor_rows(sensors_data: List[SensorData]) -> Dict[str, Dict[str, Any]]:
+    """
+    Build upsert rows keyed by sensor_id; when a batch repeats a sensor_id the last entry wins
+    """
+    return {
+        sensor_data.sensor_id: {
+            "sensor_id": sensor_data.sensor_id,
+            "vendor": sensor_data.vendor,
+            "model": sensor_data.model,
+            "type": sensor_data.type
+        }
+        for sensor_data in sensors_data
+    }
+
+
+def _upsert_stmt(dialect_name: str, rows: Dict[str, Dict[str, Any]]):
+    """
+    Single INSERT ... ON CONFLICT DO UPDATE ... RETURNING for the dialect, or None if unsupported
+    """
+    insert = UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        return None
+    
+    stmt = insert(Sensor).values(list(rows.values()))
+    return stmt.on_conflict_do_update(
+        index_elements=[Sensor.sensor_id],
+        set_={
+            "vendor": stmt.excluded.vendor,
+            "model": stmt.excluded.model,
+            "type": stmt.excluded.type
+        }
+    ).returning(Sensor)
+
+
+def _apply_sensor_rows(rows: Dict[str, Dict[str, Any]], existing: Dict[str, Sensor]) -> Tuple[List[Sensor], List[Sensor]]:
+    """
+    Update existing sensors from rows; return (all sensors, newly created sensors)
+    """
+    sensors = []
+    created = []
+    for sensor_id, row in rows.items():
+        sensor = existing.get(sensor_id)
+        if sensor:
+            sensor.vendor = row["vendor"]
+            sensor.model = row["model"]
+            sensor.type = row["type"]
+        else:
+            sensor = Sensor(**row)
+            created.append(sensor)
+        sensors.append(sensor)
+    return sensors, created
+
+
+def _delete_sensor_stmts(sensor_pk: int) -> List[Any]:
+    """
+    Rollups, readings, then the sensor row itself, each as one DELETE
+    """
+    return [
+        delete(ReadingRollup).where(ReadingRollup.sensor_id == sensor_pk),
+        delete(Reading).where(Reading.sensor_id == sensor_pk),
+        delete(Sensor).where(Sensor.id == sensor_pk),
+    ]
 
 
 class SensorService:
@@ -36,19 +115,56 @@ class SensorService:
         try:
             self.db.commit()
             self.db.refresh(sensor)
+            sensor_id_cache.put(sensor.sensor_id, sensor.id)
             return sensor
         except IntegrityError:
             self.db.rollback()
             raise ValueError(f"Sensor with ID {sensor_data.sensor_id} already exists")
     
-    def upsert_sensors(self, sensors_data: List[SensorData]) -> List[Sensor]:
+    def upsert_sensors(self, sensors_data: List[SensorData], commit: bool = True) -> List[Sensor]:
+        """
+        Upsert multiple sensors in a single INSERT ... ON CONFLICT statement.
+        Pass commit=False to leave the transaction open for a following write.
+        """
+        if not sensors_data:
+            return []
+        
+        rows = _sensor_rows(sensors_data)
+        stmt = _upsert_stmt(self.db.get_bind().dialect.name, rows)
+        if stmt is not None:
+            sensors = self.db.scalars(stmt, execution_options={"populate_existing": True}).all()
+        else:
+            sensors = self._merge_sensors(rows)
+        
+        # Return sensors in the order they were first submitted
+        by_sensor_id = {sensor.sensor_id: sensor for sensor in sensors}
+        sensors = [by_sensor_id[sensor_id] for sensor_id in rows]
+        
+        # Keep the id cache in step so the following readings need no lookup.
+        # Callers that roll back instead of committing must invalidate these.
+        sensor_id_cache.put_many({sensor.sensor_id: sensor.id for sensor in sensors})
+        
+        if commit:
+            try:
+                self.db.commit()
+            except IntegrityError:
+                self.db.rollback()
+                sensor_id_cache.invalidate(*rows)
+                raise ValueError("Sensor batch conflicts with existing sensors")
+        
+        return sensors
+    
+    def _merge_sensors(self, rows: Dict[str, Dict[str, Any]]) -> List[Sensor]:
         """
-        Upsert multiple sensors
+        Portable upsert for dialects without ON CONFLICT: one lookup, then flush
         """
-        sensors = []
-        for sensor_data in sensors_data:
-            sensor = self.upsert_sensor(sensor_data)
-            sensors.append(sensor)
+        existing = {
+            sensor.sensor_id: sensor
+            for sensor in self.db.scalars(select(Sensor).where(Sensor.sensor_id.in_(list(rows))))
+        }
+        sensors, created = _apply_sensor_rows(rows, existing)
+        self.db.add_all(created)
+        self.db.flush()
         return sensors
     
     def get_sensor_by_id(self, sensor_id: str) -> Optional[Sensor]:
@@ -77,6 +193,98 @@ class SensorService:
         if not sensor:
             return False
         
-        self.db.delete(sensor)
+        # Bulk deletes: the ORM cascade would load every reading of the sensor first
+        for stmt in _delete_sensor_stmts(sensor.id):
+            self.db.execute(stmt)
         self.db.commit()
+        sensor_id_cache.invalidate(sensor_id)
+        current_readings.remove_sensor(sensor.id)
+        reading_window.remove_sensor(sensor.id)
+        return True
+
+
+class AsyncSensorService:
+    """Async counterpart of SensorService for AsyncSession-backed routes"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def upsert_sensors(self, sensors_data: List[SensorData], commit: bool = True) -> List[Sensor]:
+        """
+        Upsert multiple sensors in a single INSERT ... ON CONFLICT statement
+        (see SensorService.upsert_sensors)
+        """
+        if not sensors_data:
+            return []
+        
+        rows = _sensor_rows(sensors_data)
+        stmt = _upsert_stmt(self.db.get_bind().dialect.name, rows)
+        if stmt is not None:
+            sensors = (await self.db.scalars(stmt, execution_options={"populate_existing": True})).all()
+        else:
+            sensors = await self._merge_sensors(rows)
+        
+        # Return sensors in the order they were first submitted
+        by_sensor_id = {sensor.sensor_id: sensor for sensor in sensors}
+        sensors = [by_sensor_id[sensor_id] for sensor_id in rows]
+        
+        # Callers that roll back instead of committing must invalidate these
+        sensor_id_cache.put_many({sensor.sensor_id: sensor.id for sensor in sensors})
+        
+        if commit:
+            try:
+                await self.db.commit()
+            except IntegrityError:
+                await self.db.rollback()
+                sensor_id_cache.invalidate(*rows)
+                raise ValueError("Sensor batch conflicts with existing sensors")
+        
+        return sensors
+    
+    async def _merge_sensors(self, rows: Dict[str, Dict[str, Any]]) -> List[Sensor]:
+        """
+        Portable upsert for dialects without ON CONFLICT: one lookup, then flush
+        """
+        existing = {
+            sensor.sensor_id: sensor
+            for sensor in await self.db.scalars(select(Sensor).where(Sensor.sensor_id.in_(list(rows))))
+        }
+        sensors, created = _apply_sensor_rows(rows, existing)
+        self.db.add_all(created)
+        await self.db.flush()
+        return sensors
+    
+    async def get_sensor_by_id(self, sensor_id: str) -> Optional[Sensor]:
+        """
+        Get sensor by sensor_id
+        """
+        return await self.db.scalar(select(Sensor).where(Sensor.sensor_id == sensor_id))
+    
+    async def get_sensor_by_db_id(self, id: int) -> Optional[Sensor]:
+        """
+        Get sensor by database ID
+        """
+        return await self.db.get(Sensor, id)
+    
+    async def get_all_sensors(self) -> List[Sensor]:
+        """
+        Get all sensors
+        """
+        return (await self.db.scalars(select(Sensor))).all()
+    
+    async def delete_sensor(self, sensor_id: str) -> bool:
+        """
+        Delete a sensor and all its readings
+        """
+        sensor = await self.get_sensor_by_id(sensor_id)
+        if not sensor:
+            return False
+        
+        # Bulk deletes: the ORM cascade would load every reading of the sensor first
+        for stmt in _delete_sensor_stmts(sensor.id):
+            await self.db.execute(stmt)
+        await self.db.commit()
+        sensor_id_cache.invalidate(sensor_id)
+        current_readings.remove_sensor(sensor.id)
+        reading_window.remove_sensor(sensor.id)
         return True
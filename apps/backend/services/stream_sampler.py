@@ -0,0 +1,207 @@
+"""
+Adaptive frame sampling for realtime camera streams
+Clients post a frame every couple of seconds whether or not the camera has
+moved. Each stream keeps the perceptual hash of its last analyzed frame:
+frames within STREAM_SKIP_DISTANCE bits of it are skipped, and the interval
+at which an unchanged view is re-analyzed doubles from
+STREAM_MIN_INTERVAL_SECONDS up to STREAM_MAX_INTERVAL_SECONDS. A changed
+scene, or a sensor reading past its alert level, drops the stream back to
+the minimum interval. A frame whose analysis fails is reverted, so the
+stream's reference is always a frame that was actually analyzed.
+"""
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Frames this close (differing bits of 64) to the last analyzed one are the same view
+STREAM_SKIP_DISTANCE = int(os.getenv("STREAM_SKIP_DISTANCE", "4"))
+# Frames this far apart are a new scene, analyzed straight away
+STREAM_SCENE_CHANGE_DISTANCE = int(os.getenv("STREAM_SCENE_CHANGE_DISTANCE", "12"))
+STREAM_MIN_INTERVAL_SECONDS = float(os.getenv("STREAM_MIN_INTERVAL_SECONDS", "2"))
+STREAM_MAX_INTERVAL_SECONDS = float(os.getenv("STREAM_MAX_INTERVAL_SECONDS", "30"))
+# Streams idle this long are forgotten, as are the least recently seen beyond the cap
+STREAM_IDLE_SECONDS = float(os.getenv("STREAM_IDLE_SECONDS", "600"))
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "1000"))
+
+# Levels at which the realtime sensor fallback reports an issue
+SENSOR_ALERT_LEVELS = {
+    "moisture_level": 70,
+    "co2": 1000,
+    "temperature": 30,
+}
+
+
+def sensor_anomaly(sensor_context: Iterable[Dict[str, Any]]) -> bool:
+    """Whether any reading of the context is past its alert level"""
+    for reading in sensor_context:
+        level = SENSOR_ALERT_LEVELS.get(reading.get("type"))
+        if level is not None and (reading.get("value") or 0) > level:
+            return True
+    return False
+
+
+@dataclass
+class StreamSession:
+    """Sampling state of one stream"""
+    fingerprint: Optional[int] = None
+    analyzed_at: float = 0.0
+    interval: float = STREAM_MIN_INTERVAL_SECONDS
+    seen_at: float = 0.0
+    analyzed: int = 0
+    skipped: int = 0
+
+
+@dataclass
+class SamplingDecision:
+    analyze: bool
+    reason: str
+    distance: Optional[int]
+    interval: float
+    # (fingerprint, analyzed_at, interval) the stream had before this frame, and
+    # when this frame was taken as its reference, for revert()
+    previous: Optional[Tuple[Optional[int], float, float]] = field(default=None, repr=False)
+    decided_at: float = field(default=0.0, repr=False)
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "analyzed": self.analyze,
+            "reason": self.reason,
+            "distance": self.distance,
+            "interval_seconds": self.interval
+        }
+
+
+class StreamSampler:
+    """
+    Per-stream sampling sessions, keyed by the client's stream id.
+
+    decide() is synchronous and called from the event loop, so a frame
+    arriving while the previous one is still being analyzed is compared
+    against it rather than analyzed twice. If that analysis then fails,
+    revert() puts the earlier reference back.
+    """
+
+    def __init__(self, skip_distance: int = STREAM_SKIP_DISTANCE,
+                 scene_change_distance: int = STREAM_SCENE_CHANGE_DISTANCE,
+                 min_interval: float = STREAM_MIN_INTERVAL_SECONDS,
+                 max_interval: float = STREAM_MAX_INTERVAL_SECONDS,
+                 idle_seconds: float = STREAM_IDLE_SECONDS, max_sessions: int = STREAM_MAX_SESSIONS):
+        self.skip_distance = skip_distance
+        self.scene_change_distance = scene_change_distance
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        # Least recently seen first
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self.analyzed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _session(self, stream_id: str, now: float) -> StreamSession:
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) < self.max_sessions and now - oldest.seen_at < self.idle_seconds:
+                break
+            del self._sessions[oldest_id]
+        session = self._sessions.pop(stream_id, None) or StreamSession(interval=self.min_interval)
+        session.seen_at = now
+        self._sessions[stream_id] = session
+        return session
+
+    def decide(self, stream_id: str, fingerprint: Optional[int], anomaly: bool = False,
+               force: bool = False) -> SamplingDecision:
+        """Whether to analyze this frame; an analyzed frame becomes the stream's reference"""
+        now = time.monotonic()
+        session = self._session(stream_id, now)
+        elapsed = now - session.analyzed_at
+        distance = None
+        if session.fingerprint is not None and fingerprint is not None:
+            distance = (session.fingerprint ^ fingerprint).bit_count()
+
+        reason, skip_reason = None, "unchanged"
+        if force:
+            reason = "requested"
+        elif fingerprint is None:
+            reason = "unhashable"
+        elif session.fingerprint is None:
+            reason = "first_frame"
+        elif distance >= self.scene_change_distance:
+            session.interval = self.min_interval
+            reason = "scene_change"
+        elif anomaly or distance > self.skip_distance:
+            session.interval = self.min_interval
+            if elapsed >= self.min_interval:
+                reason = "sensor_anomaly" if anomaly else "changed"
+            else:
+                skip_reason = "rate_limited"
+        elif elapsed >= session.interval:
+            # Still the same view: re-check it, then wait twice as long for the next one
+            reason = "refresh"
+
+        interval = session.interval
+        if reason is None:
+            session.skipped += 1
+            self.skipped += 1
+            return SamplingDecision(False, skip_reason, distance, interval)
+
+        previous = (session.fingerprint, session.analyzed_at, session.interval)
+        if reason == "refresh":
+            session.interval = min(session.interval * 2, self.max_interval)
+        if fingerprint is not None:
+            session.fingerprint = fingerprint
+        session.analyzed_at = now
+        session.analyzed += 1
+        self.analyzed += 1
+        return SamplingDecision(True, reason, distance, interval, previous, now)
+
+    def revert(self, stream_id: str, decision: SamplingDecision) -> None:
+        """
+        Undo an analyze decision whose analysis failed, so the next similar
+        frame is analyzed rather than skipped against a frame never analyzed
+        """
+        if not decision.analyze or decision.previous is None:
+            return
+        self.analyzed -= 1
+        self.failed += 1
+        session = self._sessions.get(stream_id)
+        # Leave the session alone if a later frame has become its reference
+        if session is None or session.analyzed_at != decision.decided_at:
+            return
+        session.fingerprint, session.analyzed_at, session.interval = decision.previous
+        session.analyzed -= 1
+
+    def clear(self) -> None:
+        self._sessions.clear()
+        self.analyzed = self.skipped = self.failed = 0
+
+    def stats(self) -> Dict[str, Any]:
+        frames = self.analyzed + self.skipped
+        return {
+            "streams": len(self._sessions),
+            "analyzed": self.analyzed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "skip_rate": round(self.skipped / frames, 3) if frames else 0.0,
+            "skip_distance": self.skip_distance,
+            "scene_change_distance": self.scene_change_distance,
+            "min_interval_seconds": self.min_interval,
+            "max_interval_seconds": self.max_interval,
+            "by_stream": {
+                stream_id: {
+                    "analyzed": session.analyzed,
+                    "skipped": session.skipped,
+                    "interval_seconds": session.interval
+                }
+                for stream_id, session in self._sessions.items()
+            }
+        }
+
+
+# Shared by every realtime stream in this process
+stream_sampler = StreamSampler()
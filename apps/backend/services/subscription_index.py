@@ -0,0 +1,152 @@
+"""
+Routing index for sensor stream subscriptions
+Clients with identical filters share a SubscriptionGroup, so each distinct
+subscription is matched and serialized once per batch. Each group is indexed
+under its most selective filter only (sensor_ids, else location prefixes,
+else types) and its other filters are checked on lookup, so a reading only
+touches groups that name its sensor, location or type: routing cost follows
+the number of matches, not the number of subscribers.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from schemas.reading import StreamSubscription
+
+GroupKey = Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str], float]
+
+
+def subscription_key(subscription: StreamSubscription) -> GroupKey:
+    return (
+        frozenset(subscription.sensor_ids),
+        frozenset(subscription.types),
+        frozenset(subscription.location_prefixes),
+        subscription.min_interval,
+    )
+
+
+class SubscriptionGroup:
+    """Every connection subscribed with the same filters"""
+
+    def __init__(self, key: GroupKey):
+        self.key = key
+        self.sensor_ids, self.types, self.location_prefixes, self.min_interval = key
+        self.members: Set[Any] = set()
+        # Timestamp of the last reading routed per sensor, for min_interval
+        self._last_routed: Dict[int, datetime] = {}
+
+    def accepts(self, sensor_id: Optional[str], reading_type: str, location: str) -> bool:
+        return (
+            (not self.sensor_ids or sensor_id in self.sensor_ids)
+            and (not self.types or reading_type in self.types)
+            and (not self.location_prefixes or any(location.startswith(p) for p in self.location_prefixes))
+        )
+
+    def throttled(self, reading: Dict[str, Any]) -> bool:
+        """True if the reading is within min_interval of the sensor's last routed reading"""
+        if not self.min_interval:
+            return False
+        last = self._last_routed.get(reading["sensor_id"])
+        timestamp = reading["timestamp"]
+        if last is not None and (timestamp - last).total_seconds() < self.min_interval:
+            return True
+        self._last_routed[reading["sensor_id"]] = timestamp
+        return False
+
+
+class SubscriptionIndex:
+    """
+    Maps connections to subscription groups and readings to the groups they match
+    """
+
+    def __init__(self):
+        self._groups: Dict[GroupKey, SubscriptionGroup] = {}
+        self._member_groups: Dict[Any, SubscriptionGroup] = {}
+        self._match_all: Set[SubscriptionGroup] = set()
+        self._by_sensor: Dict[str, Set[SubscriptionGroup]] = defaultdict(set)
+        self._by_type: Dict[str, Set[SubscriptionGroup]] = defaultdict(set)
+        self._by_prefix: Dict[str, Set[SubscriptionGroup]] = defaultdict(set)
+        # Prefix lengths in use: a location is looked up once per distinct length
+        self._prefix_lengths: Dict[int, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._member_groups)
+
+    @property
+    def group_count(self) -> int:
+        return len(self._groups)
+
+    def subscribe(self, member: Any, subscription: StreamSubscription) -> SubscriptionGroup:
+        """Subscribe a connection, replacing any previous subscription"""
+        self.remove(member)
+        key = subscription_key(subscription)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = SubscriptionGroup(key)
+            self._index(group)
+        group.members.add(member)
+        self._member_groups[member] = group
+        return group
+
+    def remove(self, member: Any) -> None:
+        group = self._member_groups.pop(member, None)
+        if group is None:
+            return
+        group.members.discard(member)
+        if not group.members:
+            del self._groups[group.key]
+            self._unindex(group)
+
+    def group_of(self, member: Any) -> Optional[SubscriptionGroup]:
+        return self._member_groups.get(member)
+
+    def _postings(self, group: SubscriptionGroup):
+        """The index entries for a group: one per value of its most selective filter"""
+        if group.sensor_ids:
+            return [(self._by_sensor, value) for value in group.sensor_ids]
+        if group.location_prefixes:
+            return [(self._by_prefix, value) for value in group.location_prefixes]
+        return [(self._by_type, value) for value in group.types]
+
+    def _index(self, group: SubscriptionGroup) -> None:
+        postings = self._postings(group)
+        if not postings:
+            self._match_all.add(group)
+        for index, value in postings:
+            index[value].add(group)
+            if index is self._by_prefix:
+                self._prefix_lengths[len(value)] += 1
+
+    def _unindex(self, group: SubscriptionGroup) -> None:
+        self._match_all.discard(group)
+        for index, value in self._postings(group):
+            index[value].discard(group)
+            if not index[value]:
+                del index[value]
+            if index is self._by_prefix:
+                self._prefix_lengths[len(value)] -= 1
+                if not self._prefix_lengths[len(value)]:
+                    del self._prefix_lengths[len(value)]
+
+    def match(self, sensor_id: Optional[str], reading_type: str, location: str) -> Set[SubscriptionGroup]:
+        """Groups whose filters all accept a reading"""
+        candidates: Set[SubscriptionGroup] = set(self._by_sensor.get(sensor_id, ()))
+        candidates.update(self._by_type.get(reading_type, ()))
+        for length in self._prefix_lengths:
+            if length <= len(location):
+                candidates.update(self._by_prefix.get(location[:length], ()))
+        matched = {group for group in candidates if group.accepts(sensor_id, reading_type, location)}
+        return matched | self._match_all
+
+    def route(self, readings: Iterable[Dict[str, Any]],
+              sensor_keys: Dict[int, str]) -> List[Tuple[SubscriptionGroup, List[Dict[str, Any]]]]:
+        """
+        Split a batch into the readings each group should receive, in batch order
+        """
+        routed: Dict[SubscriptionGroup, List[Dict[str, Any]]] = {}
+        for reading in readings:
+            groups = self.match(sensor_keys.get(reading["sensor_id"]), reading["type"], reading["location"])
+            for group in groups:
+                if not group.throttled(reading):
+                    routed.setdefault(group, []).append(reading)
+        return list(routed.items())
@@ -0,0 +1,206 @@
+"""
+Result cache for vision frame analysis
+A camera held on the same wall sends near-identical frames every second.
+Analyses are cached under a perceptual hash (dHash) of the frame, scoped to
+the prompt template and vision model that produced them, so a frame within
+VISION_CACHE_MAX_DISTANCE bits of a cached one is answered without calling
+the vision API. Entries expire after VISION_CACHE_TTL_SECONDS and the least
+recently used are evicted beyond VISION_CACHE_SIZE. With VISION_CACHE_DIR set,
+analyses are also written to disk, so they survive restarts and are shared
+by workers on the same host.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import imagehash
+from PIL import Image, UnidentifiedImageError
+
+VISION_CACHE_SIZE = int(os.getenv("VISION_CACHE_SIZE", "1000"))
+VISION_CACHE_TTL_SECONDS = float(os.getenv("VISION_CACHE_TTL_SECONDS", "300"))
+# Differing bits (of 64) at which two frames still count as the same view
+VISION_CACHE_MAX_DISTANCE = int(os.getenv("VISION_CACHE_MAX_DISTANCE", "4"))
+VISION_CACHE_DIR = os.getenv("VISION_CACHE_DIR", "")
+# Expired files are swept from VISION_CACHE_DIR once per this many writes
+DISK_PRUNE_EVERY = 100
+
+# (prompt/model scope, frame hash)
+CacheKey = Tuple[str, int]
+
+
+def frame_hash(frame_base64: str) -> Optional[int]:
+    """64-bit dHash of a base64 (or data URL) image, or None if it cannot be decoded"""
+    if frame_base64.startswith("data:image"):
+        frame_base64 = frame_base64.split(",", 1)[1]
+    try:
+        image = Image.open(io.BytesIO(base64.b64decode(frame_base64)))
+        # JPEG frames decode straight to a reduced grayscale size, which is all the hash needs
+        image.draft("L", (64, 64))
+        return int(str(imagehash.dhash(image)), 16)
+    except (binascii.Error, ValueError, OSError, UnidentifiedImageError):
+        return None
+
+
+def cache_scope(prompt_template: str, model: str) -> str:
+    """Analyses are only reused for the same prompt and model"""
+    return hashlib.sha256(f"{model}\n{prompt_template}".encode()).hexdigest()[:16]
+
+
+class VisionCache:
+    """
+    In-memory LRU of analyses with TTL, and an optional directory of JSON
+    files as a second tier. Near-duplicate lookups compare against every
+    entry of the scope, which at the default size is a fraction of a
+    millisecond and far cheaper than a vision call.
+    """
+
+    def __init__(self, max_entries: int = VISION_CACHE_SIZE, ttl_seconds: float = VISION_CACHE_TTL_SECONDS,
+                 max_distance: int = VISION_CACHE_MAX_DISTANCE, directory: str = VISION_CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.directory = Path(directory) if directory else None
+        # Key -> (expires_at wall-clock time, analysis); least recently used first
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.near_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk_writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, scope: str, frame: int) -> Optional[Dict[str, Any]]:
+        """The cached analysis of this frame or a near-identical one, if still fresh"""
+        now = time.time()
+        key = (scope, frame)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            key = self._nearest(scope, frame, now)
+            entry = self._entries[key] if key else None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if key[1] != frame:
+                self.near_hits += 1
+            return entry[1]
+
+        if self.directory:
+            stored = await asyncio.to_thread(self._read_disk, scope, frame, now)
+            if stored is not None:
+                expires_at, analysis = stored
+                self._remember((scope, frame), expires_at, analysis)
+                self.disk_hits += 1
+                self.hits += 1
+                return analysis
+        self.misses += 1
+        return None
+
+    async def put(self, scope: str, frame: int, analysis: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._remember((scope, frame), expires_at, analysis)
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, scope, frame, analysis)
+
+    def _remember(self, key: CacheKey, expires_at: float, analysis: Dict[str, Any]) -> None:
+        self._entries[key] = (expires_at, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _nearest(self, scope: str, frame: int, now: float) -> Optional[CacheKey]:
+        best, best_distance = None, self.max_distance + 1
+        for key, (expires_at, _) in self._entries.items():
+            if key[0] != scope or expires_at <= now:
+                continue
+            distance = (key[1] ^ frame).bit_count()
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return best
+
+    def _path(self, scope: str, frame: int) -> Path:
+        return self.directory / f"{scope}_{frame:016x}.json"
+
+    def _read_disk(self, scope: str, frame: int, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Nearest fresh analysis on disk. File names carry the frame hash and
+        the modification time dates the entry, so only the match is read.
+        """
+        best, best_distance = None, self.max_distance + 1
+        try:
+            for path in self.directory.glob(f"{scope}_*.json"):
+                distance = (int(path.stem.split("_", 1)[1], 16) ^ frame).bit_count()
+                if distance < best_distance:
+                    best, best_distance = path, distance
+            if best is None:
+                return None
+            expires_at = best.stat().st_mtime + self.ttl_seconds
+            if expires_at <= now:
+                best.unlink(missing_ok=True)
+                return None
+            return expires_at, json.loads(best.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, scope: str, frame: int, analysis: Dict[str, Any]) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(scope, frame)
+            # Write then rename, so readers in other workers never see a partial file
+            partial = path.with_suffix(f".{os.getpid()}.tmp")
+            partial.write_text(json.dumps(analysis, ensure_ascii=False))
+            partial.replace(path)
+            self._disk_writes += 1
+            if self._disk_writes % DISK_PRUNE_EVERY == 0:
+                self._prune_disk()
+        except OSError as e:
+            print(f"⚠️  Could not write vision cache entry: {e}")
+
+    def _prune_disk(self) -> None:
+        """Delete expired entries, so the directory stays bounded by what one TTL can produce"""
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json") and entry.stat().st_mtime <= cutoff:
+                Path(entry.path).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.near_hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "max_distance": self.max_distance,
+            "disk": str(self.directory) if self.directory else None,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Shared by every vision request in this process
+vision_cache = VisionCache()
@@ -0,0 +1,132 @@
+"""
+Single-flight and fair queueing for vision API calls
+Phones retrying a slow request, or several clients watching the same
+scene, post the same frame at once. Calls are keyed by the vision cache's
+(prompt/model scope, frame hash): while one is in flight, identical requests
+await its result instead of calling the API again. At most
+VISION_MAX_CONCURRENCY calls run at once; the rest queue per client (stream)
+and are admitted round-robin, so one stream's burst cannot starve the others
+or push the provider into rate limiting. A call that waits longer than
+VISION_QUEUE_TIMEOUT_SECONDS gives up with asyncio.TimeoutError.
+"""
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+# 0 waits for a slot however long it takes
+VISION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("VISION_QUEUE_TIMEOUT_SECONDS", "30"))
+
+
+class VisionFlights:
+    """
+    In-flight call table plus a concurrency limiter with per-client queues.
+
+    Used from the event loop only. The shared call runs in its own task, so
+    a requester that disconnects does not cancel it for the others.
+    """
+
+    def __init__(self, max_concurrency: int = VISION_MAX_CONCURRENCY,
+                 queue_timeout: float = VISION_QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        # Client -> its waiting calls; the client at the front is admitted next
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._active = 0
+        self._waiting = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.queued = 0
+        self.timeouts = 0
+
+    async def run(self, key: Optional[Hashable], client: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Result of call(), shared with every concurrent run() of the same key.
+        A key of None (a frame that could not be hashed) is never shared.
+        """
+        flight = self._flights.get(key) if key is not None else None
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            flight = asyncio.ensure_future(self._call(client, call))
+            if key is not None:
+                self._flights[key] = flight
+                flight.add_done_callback(lambda _: self._flights.pop(key, None))
+            # Retrieved here in case every requester has gone away
+            flight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(flight)
+
+    async def _call(self, client: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        await self._acquire(client)
+        try:
+            self.calls += 1
+            return await call()
+        finally:
+            self._release()
+
+    async def _acquire(self, client: str) -> None:
+        if self._active < self.max_concurrency and not self._waiting:
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._waiting += 1
+        self.queued += 1
+        try:
+            if self.queue_timeout:
+                await asyncio.wait_for(waiter, self.queue_timeout)
+            else:
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                self._release()
+            else:
+                self._discard(client, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+
+    def _release(self) -> None:
+        """Hand the slot to the next client in turn, or free it"""
+        while self._queues:
+            client, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            self._waiting -= 1
+            if waiters:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _discard(self, client: str, waiter: asyncio.Future) -> None:
+        waiters = self._queues.get(client)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self._waiting -= 1
+            if not waiters:
+                del self._queues[client]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout_seconds": self.queue_timeout,
+            "active": self._active,
+            "waiting": self._waiting,
+            "waiting_by_client": {client: len(waiters) for client, waiters in self._queues.items()},
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "queued": self.queued,
+            "timeouts": self.timeouts
+        }
+
+
+# Shared by every vision call in this process
+vision_flights = VisionFlights()
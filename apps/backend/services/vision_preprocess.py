@@ -0,0 +1,64 @@
+"""
+Frame preprocessing before vision calls
+Phone cameras post full-resolution JPEGs, often with EXIF, while the vision
+model downsamples anything past its working resolution anyway. Frames are
+decoded once, turned upright by their EXIF orientation, shrunk to
+VISION_MAX_EDGE pixels on the longer edge and re-encoded at
+VISION_JPEG_QUALITY without metadata, then base64-encoded straight into the
+data URL the request carries.
+"""
+import base64
+import binascii
+import io
+import os
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest edge sent to the vision API; 0 sends frames at their own size
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1024"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "80"))
+
+
+class PreparedFrame(NamedTuple):
+    data_url: str
+    width: int
+    height: int
+    source_bytes: int
+    bytes: int
+
+
+def prepare_frame(frame_base64: str, max_edge: int = VISION_MAX_EDGE,
+                  quality: int = VISION_JPEG_QUALITY) -> Optional[PreparedFrame]:
+    """Downscaled, metadata-free JPEG data URL of a base64 (or data URL) frame, or None if it cannot be decoded"""
+    if frame_base64.startswith("data:image"):
+        frame_base64 = frame_base64.split(",", 1)[1]
+    try:
+        source = base64.b64decode(frame_base64)
+        image = Image.open(io.BytesIO(source))
+        # Opening reads only the header: a small, clean JPEG is sent as it came
+        if (image.format == "JPEG" and not (max_edge and max(image.size) > max_edge)
+                and "exif" not in image.info and "icc_profile" not in image.info):
+            encoded, (width, height) = source, image.size
+        else:
+            if max_edge:
+                # JPEGs decode straight to the nearest DCT scale at or above the target
+                image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            if max_edge:
+                image.thumbnail((max_edge, max_edge), Image.Resampling.BICUBIC, reducing_gap=2.0)
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            encoded, (width, height) = buffer.getvalue(), image.size
+    except (binascii.Error, ValueError, OSError, UnidentifiedImageError):
+        return None
+
+    return PreparedFrame(
+        data_url="data:image/jpeg;base64," + base64.b64encode(encoded).decode("ascii"),
+        width=width,
+        height=height,
+        source_bytes=len(source),
+        bytes=len(encoded)
+    )
@@ -0,0 +1,165 @@
+"""
+Test script for the async database layer
+Runs the async services against an isolated in-memory aiosqlite database
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.base import Base
+from database.connection import to_async_url
+from models.reading import Reading
+from schemas.issue import IssueCreate, IssueUpdate
+from schemas.reading import ReadingFilter
+from services.issue_service import AsyncIssueService
+from services.readings_service import AsyncReadingsService
+from services.sensor_service import AsyncSensorService
+from services.sensor_id_cache import sensor_id_cache
+from test_sensor_ingest import make_batch
+
+
+async def make_async_session():
+    """Create an async session bound to a fresh in-memory database"""
+    sensor_id_cache.clear()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    return factory(), engine
+
+
+def test_async_url_derivation():
+    """Test 1: Sync URLs map onto their asyncio drivers"""
+    print("\n" + "="*60)
+    print("Test 1: Async URL Derivation")
+    print("="*60)
+
+    assert to_async_url("sqlite:///./data/home_inspection.db") == "sqlite+aiosqlite:///./data/home_inspection.db"
+    assert to_async_url("postgresql://u:p@db/home") == "postgresql+asyncpg://u:p@db/home"
+    assert to_async_url("postgresql+psycopg2://u:p@db/home") == "postgresql+asyncpg://u:p@db/home"
+    print("✅ sqlite -> aiosqlite, postgresql -> asyncpg")
+
+
+def test_async_sensor_ingest():
+    """Test 2: Async sensor upsert, reading ingest and queries"""
+    print("\n" + "="*60)
+    print("Test 2: Async Sensor Ingest")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        try:
+            sensors, readings = make_batch(sensor_count=3, readings_per_sensor=4)
+            created = await AsyncSensorService(db).upsert_sensors(sensors, commit=False)
+            inserted = await AsyncReadingsService(db).append_many(readings)
+            assert len(created) == 3 and len(inserted) == 12
+            print(f"✅ Ingested {len(inserted)} readings for {len(created)} sensors")
+
+            service = AsyncReadingsService(db)
+            latest = await service.get_latest(ReadingFilter(location="basement_0", limit=3))
+            assert len(latest) == 3 and all(r.location == "basement_0" for r in latest)
+            assert latest[0].timestamp >= latest[-1].timestamp
+            by_sensor = await service.get_readings_by_sensor(sensors[1].sensor_id, limit=10)
+            assert len(by_sensor) == 4
+            stats = await service.get_reading_stats(sensor_id=sensors[2].sensor_id)
+            assert stats["count"] == 4
+            print(f"✅ Queries returned expected rows (stats: {stats})")
+
+            async with AsyncSession(engine) as delete_db:
+                assert await AsyncSensorService(delete_db).delete_sensor(sensors[0].sensor_id)
+                # Readings are deleted in bulk, never loaded as objects
+                loaded = list(delete_db.sync_session.identity_map.values())
+                assert not any(isinstance(obj, Reading) for obj in loaded), loaded
+            db.expire_all()
+            remaining = await AsyncSensorService(db).get_all_sensors()
+            assert len(remaining) == 2
+            assert (await service.get_reading_stats())["count"] == 8
+            print("✅ Sensor delete removed its readings without loading them")
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_issue_service():
+    """Test 3: Async issue lifecycle"""
+    print("\n" + "="*60)
+    print("Test 3: Async Issue Service")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        try:
+            service = AsyncIssueService(db)
+            issue = await service.create_issue(IssueCreate(
+                issue_type="漏水",
+                severity="high",
+                description="Water stain near the window",
+                location="living_room",
+                component="plumbing"
+            ))
+            assert issue.id and issue.created_at and issue.learning_score > 0
+            print(f"✅ Created issue {issue.id} with learning score {issue.learning_score:.2f}")
+
+            updated = await service.update_issue(issue.id, IssueUpdate(resolved="true"))
+            assert updated.resolved == "true" and updated.resolved_at is not None
+            assert len(await service.get_all_issues(resolved="true")) == 1
+            assert len(await service.get_issues_by_component("plumbing")) == 1
+            print("✅ Updated and queried issue")
+
+            assert await service.delete_issue(issue.id)
+            assert await service.get_issue(issue.id) is None
+            print("✅ Deleted issue")
+
+            # A failed training-data write leaves the new issue saved and readable
+            async with engine.begin() as conn:
+                await conn.execute(text("DROP TABLE training_data"))
+            issue = await service.create_issue(IssueCreate(
+                issue_type="裂縫",
+                severity="medium",
+                description="Crack above the door",
+                location="hallway",
+                component="structure"
+            ))
+            assert issue.description == "Crack above the door" and issue.created_at
+            assert (await service.get_issue(issue.id)).location == "hallway"
+            print("✅ Issue kept when its training data record fails")
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all async database tests"""
+    print("🧪 Async Database Tests")
+    tests = [
+        test_async_url_derivation,
+        test_async_sensor_ingest,
+        test_async_issue_service,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,163 @@
+"""
+Test script for the current-value cache
+/api/sensor/current is answered from memory: the cache keeps the latest
+readings of every sensor stream, is fed by the reading bus on ingest and is
+rebuilt from the database on startup
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import orjson
+from fastapi import Response
+
+from api.sensor_routes import get_sensor_current, post_sensor_data
+from schemas.reading import ReadingData, SensorDataBatch
+from services.current_readings import CurrentReadings, current_readings
+from services.ingest_buffer import ingest_buffer
+from services.readings_service import ReadingsService
+from services.reading_bus import reading_bus
+from services.sensor_service import SensorService
+from test_sensor_ingest import count_statements, make_batch, make_session
+from test_write_behind import use_buffer
+
+
+def make_reading(reading_id: int, sensor_pk: int = 1, minute: int = 0, location: str = "attic", value: float = 50.0):
+    return {
+        "id": reading_id,
+        "sensor_id": sensor_pk,
+        "type": "humidity",
+        "location": location,
+        "value": value,
+        "timestamp": datetime(2024, 1, 15, 12, minute)
+    }
+
+
+def test_update_order_and_eviction():
+    """Test 1: Late readings never replace newer ones, history is bounded and idle streams are evicted"""
+    print("\n" + "="*60)
+    print("Test 1: Ordering, History and Eviction")
+    print("="*60)
+
+    cache = CurrentReadings(history_size=3, max_streams=2)
+    cache.update([make_reading(1, minute=1), make_reading(2, minute=3)], {1: "ble_001"})
+    # Arrives late: lands in the history, the current value stays put
+    cache.update([make_reading(3, minute=2)], {})
+    current = cache.query(history=2)
+    assert [entry["latest"]["id"] for entry in current] == [2]
+    assert [r["id"] for r in current[0]["history"]] == [3, 1]
+    assert current[0]["sensor_id"] == "ble_001"
+
+    cache.update([make_reading(4, minute=4)], {})
+    assert [r["id"] for r in cache.query(history=5)[0]["history"]] == [2, 3]
+    print("✅ Late reading kept out of the current value; history capped at 3")
+
+    cache.update([make_reading(5, sensor_pk=2)], {2: "ble_002"})
+    cache.update([make_reading(6, sensor_pk=1, minute=5)], {})
+    cache.update([make_reading(7, sensor_pk=3)], {3: "ble_003"})
+    assert [entry["sensor_id"] for entry in cache.query()] == ["ble_003", "ble_001"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.query(sensor_id="ble_002") == []
+    print(f"✅ Least recently updated stream evicted: {cache.stats()}")
+
+    cache.remove_sensor(1)
+    assert [entry["sensor_id"] for entry in cache.query()] == ["ble_003"]
+
+
+def test_warm_from_database():
+    """Test 2: Startup rebuilds the last readings of every stream in one query"""
+    print("\n" + "="*60)
+    print("Test 2: Warm from Database")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_batch(sensor_count=3, readings_per_sensor=6)
+        SensorService(db).upsert_sensors(sensors)
+        ReadingsService(db).append_many(readings)
+
+        cache = CurrentReadings(history_size=2)
+        counter = count_statements(engine)
+        # Each sensor reports from one location, so there is one stream per sensor
+        assert cache.warm(db) == 3
+        assert counter["statements"] == 2
+        for entry in cache.query(history=1):
+            assert entry["latest"]["value"] == 45.0 and entry["history"][0]["value"] == 44.0
+        assert {entry["sensor_id"] for entry in orjson.loads(cache.render())} == {s.sensor_id for s in sensors}
+        print(f"✅ Warmed {len(cache)} streams with {counter['statements']} statements")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_current_endpoint():
+    """Test 3: Ingest keeps /current up to date, and it answers without touching the database"""
+    print("\n" + "="*60)
+    print("Test 3: Current Values Endpoint")
+    print("="*60)
+
+    async def run():
+        current_readings.clear()
+        reading_bus.add_listener(current_readings.on_event)
+        restore = await use_buffer("group", flush_seconds=0.01)
+        try:
+            sensors, readings = make_batch(sensor_count=4, readings_per_sensor=3)
+            await post_sensor_data(SensorDataBatch(sensors=sensors, readings=readings), Response(), None)
+            late = ReadingData(**{**readings[0].model_dump(), "value": 1.0, "timestamp": readings[0].timestamp - timedelta(hours=1)})
+            await post_sensor_data(SensorDataBatch(sensors=sensors[:1], readings=[late]), Response(), None)
+
+            counter = count_statements(ingest_buffer.session_factory.kw["bind"].sync_engine)
+            body = orjson.loads((await get_sensor_current(None, None, None, 0)).body)
+            assert len(body) == 4 and all(entry["latest"]["value"] == 42.0 for entry in body)
+            one = orjson.loads((await get_sensor_current(sensors[0].sensor_id, None, None, 3)).body)
+            assert [r["value"] for r in one[0]["history"]] == [41.0, 40.0, 1.0]
+            assert orjson.loads((await get_sensor_current(None, None, "basement_1", 0)).body)[0]["location"] == "basement_1"
+            assert counter["statements"] == 0
+            print(f"✅ 4 streams served after ingest with {counter['statements']} statements")
+
+            runs = 1000
+            started = time.perf_counter()
+            for _ in range(runs):
+                current_readings.render()
+            unfiltered = (time.perf_counter() - started) / runs * 1e6
+            started = time.perf_counter()
+            for _ in range(runs):
+                current_readings.render(sensor_id=sensors[0].sensor_id, history=3)
+            filtered = (time.perf_counter() - started) / runs * 1e6
+            print(f"✅ Render: {unfiltered:.1f} µs unfiltered (cached), {filtered:.1f} µs for one sensor with history")
+        finally:
+            reading_bus.remove_listener(current_readings.on_event)
+            current_readings.clear()
+            await restore()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all current-value cache tests"""
+    print("🧪 Current Readings Tests")
+    tests = [
+        test_update_order_and_eviction,
+        test_warm_from_database,
+        test_current_endpoint,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
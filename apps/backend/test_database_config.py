@@ -0,0 +1,187 @@
+"""
+Test script for database engine configuration
+Covers pool selection, SQLite connection settings and pool metrics
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+from database import connection
+from database.connection import engine_options
+from database.pool_metrics import PoolMetrics
+
+
+def sqlite_file_url() -> str:
+    return f"sqlite:///{tempfile.mkdtemp(prefix='db_config_test_')}/test.db"
+
+
+def test_pool_selection():
+    """Test 1: Pool classes follow the backend and SQLITE_POOL_MODE"""
+    print("\n" + "="*60)
+    print("Test 1: Pool Selection")
+    print("="*60)
+
+    original_mode = connection.SQLITE_POOL_MODE
+    try:
+        assert engine_options("sqlite://")["poolclass"] is StaticPool
+        assert engine_options("sqlite+aiosqlite:///:memory:", is_async=True)["poolclass"] is StaticPool
+
+        connection.SQLITE_POOL_MODE = "queue"
+        options = engine_options("sqlite:///./data/test.db")
+        assert options["poolclass"] is QueuePool
+        assert options["pool_size"] == connection.POOL_SETTINGS["pool_size"]
+        assert engine_options("sqlite+aiosqlite:///./data/test.db", is_async=True)["poolclass"] is AsyncAdaptedQueuePool
+
+        connection.SQLITE_POOL_MODE = "thread"
+        assert engine_options("sqlite:///./data/test.db")["poolclass"] is SingletonThreadPool
+        assert engine_options("sqlite+aiosqlite:///./data/test.db", is_async=True)["poolclass"] is AsyncAdaptedQueuePool
+
+        connection.SQLITE_POOL_MODE = "null"
+        assert engine_options("sqlite:///./data/test.db")["poolclass"] is NullPool
+
+        connection.SQLITE_POOL_MODE = "bogus"
+        try:
+            engine_options("sqlite:///./data/test.db")
+            raise AssertionError("Expected ValueError for unknown pool mode")
+        except ValueError:
+            pass
+
+        pg_options = engine_options("postgresql://u:p@db/home")
+        assert "poolclass" not in pg_options
+        assert set(connection.POOL_SETTINGS) <= set(pg_options)
+        print(f"✅ PostgreSQL pool settings: {pg_options}")
+    finally:
+        connection.SQLITE_POOL_MODE = original_mode
+
+
+def test_sqlite_connect_pragmas():
+    """Test 2: New SQLite connections get the tuned PRAGMAs"""
+    print("\n" + "="*60)
+    print("Test 2: SQLite Connection Pragmas")
+    print("="*60)
+
+    url = sqlite_file_url()
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, "connect", connection.sqlite_pragma_hook(connection.sqlite_pragmas()))
+    try:
+        with engine.connect() as conn:
+            settings = {
+                name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in connection.SQLITE_PRAGMA_DEFAULTS
+            }
+        assert settings["journal_mode"].lower() == "wal", settings
+        assert settings["busy_timeout"] == 5000
+        assert settings["synchronous"] == 1  # NORMAL
+        assert settings["mmap_size"] == 268435456
+        assert settings["cache_size"] == -65536
+        assert settings["temp_store"] == 2  # MEMORY
+        print(f"✅ {settings}")
+    finally:
+        engine.dispose()
+
+
+def test_sqlite_pragma_overrides():
+    """Test 3: SQLITE_PRAGMA_<NAME> overrides or disables individual PRAGMAs"""
+    print("\n" + "="*60)
+    print("Test 3: SQLite Pragma Overrides")
+    print("="*60)
+
+    overrides = {"SQLITE_PRAGMA_SYNCHRONOUS": "FULL", "SQLITE_PRAGMA_MMAP_SIZE": ""}
+    saved = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    try:
+        pragmas = connection.sqlite_pragmas()
+        assert pragmas["synchronous"] == "FULL"
+        assert "mmap_size" not in pragmas
+        assert pragmas["journal_mode"] == "WAL"
+        print(f"✅ Overrides applied: {pragmas}")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_pool_metrics():
+    """Test 4: Checkouts, hold time, waits and timeouts are recorded"""
+    print("\n" + "="*60)
+    print("Test 4: Pool Metrics")
+    print("="*60)
+
+    url = sqlite_file_url()
+    engine = create_engine(url, poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=0.2)
+    metrics = PoolMetrics("test").instrument(engine)
+    try:
+        with metrics.measure_wait():
+            held = engine.connect()
+
+        # A second checkout waits for the only connection and times out
+        try:
+            with metrics.measure_wait():
+                engine.connect()
+            raise AssertionError("Expected pool timeout")
+        except PoolTimeoutError:
+            pass
+
+        # Release the connection while another thread is waiting for it
+        waiter_done = threading.Event()
+
+        def waiter():
+            with metrics.measure_wait():
+                with engine.connect():
+                    pass
+            waiter_done.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        threading.Timer(0.05, held.close).start()
+        thread.join(timeout=2)
+        assert waiter_done.is_set()
+
+        snapshot = metrics.snapshot()
+        assert snapshot["checkouts"] == 2 and snapshot["checkins"] == 2
+        assert snapshot["timeouts"] == 1
+        assert snapshot["peak_in_use"] == 1 and snapshot["in_use"] == 0
+        assert snapshot["wait_samples"] == 3
+        assert snapshot["max_wait_ms"] >= 40
+        assert snapshot["pool_class"] == "QueuePool" and snapshot["pool_size"] == 1
+        print(f"✅ Metrics: checkouts={snapshot['checkouts']} timeouts={snapshot['timeouts']} "
+              f"max_wait_ms={snapshot['max_wait_ms']:.1f}")
+    finally:
+        engine.dispose()
+
+
+def main():
+    """Run all database configuration tests"""
+    print("🧪 Database Configuration Tests")
+    tests = [
+        test_pool_selection,
+        test_sqlite_connect_pragmas,
+        test_sqlite_pragma_overrides,
+        test_pool_metrics,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
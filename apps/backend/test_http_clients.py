@@ -0,0 +1,199 @@
+"""
+Test script for the shared outbound HTTP clients
+The RAG and vision routes call their upstreams through pooled
+httpx.AsyncClients; a minimal in-process HTTP/1.1 server stands in for the
+RAG sidecar and the vision API
+"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from api import rag_routes
+from services.http_clients import HttpClients, Upstream, http_clients
+
+
+class UpstreamServer:
+    """Answers each path with a canned JSON body, after an optional delay, over keep-alive connections"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.connections = 0
+        self.requests = []
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _client(self, reader, writer):
+        self.connections += 1
+        try:
+            while request_line := await reader.readline():
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                method, path, _ = request_line.decode().split(" ", 2)
+                self.requests.append((method, path, json.loads(body) if body else None))
+                delay, payload = self.routes.get(path, (0, None))
+                await asyncio.sleep(delay)
+                status = b"200 OK" if payload is not None else b"404 Not Found"
+                content = json.dumps(payload or {}).encode()
+                writer.write(b"HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                             % (status, len(content), content))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def use_upstreams(rag_url: str, vision_url: str = "http://127.0.0.1:9"):
+    """Point the shared clients at stand-in servers; returns a restore callback"""
+    saved = http_clients.upstreams
+    http_clients.upstreams = {
+        "rag": Upstream(rag_url, 5, 4, 4),
+        "vision": Upstream(vision_url, 5, 4, 4),
+    }
+
+    async def restore():
+        await http_clients.stop()
+        http_clients.upstreams = saved
+
+    return restore
+
+
+def test_keepalive_and_limits():
+    """Test 1: Requests reuse pooled connections, up to the upstream's connection limit"""
+    print("\n" + "="*60)
+    print("Test 1: Keep-alive and Limits")
+    print("="*60)
+
+    async def run():
+        server = UpstreamServer({"/api/documents/count": (0.05, {"count": 12})})
+        url = await server.start()
+        clients = HttpClients({"rag": Upstream(url, 5, 2, 2)})
+        try:
+            await clients.start()
+            for _ in range(5):
+                assert (await clients.rag.get("/api/documents/count")).json() == {"count": 12}
+            assert server.connections == 1
+            print("✅ 5 sequential requests over 1 connection")
+
+            await asyncio.gather(*(clients.rag.get("/api/documents/count") for _ in range(6)))
+            assert server.connections == 2 and len(server.requests) == 11
+            print(f"✅ 6 concurrent requests capped at {server.connections} connections")
+            assert clients.stats()["upstreams"]["rag"]["open"]
+        finally:
+            await clients.stop()
+            await server.stop()
+        assert not clients.stats()["upstreams"]["rag"]["open"]
+
+    asyncio.run(run())
+
+
+def test_rag_routes_do_not_block():
+    """Test 2: A slow RAG sidecar no longer stalls the event loop, and an absent one degrades"""
+    print("\n" + "="*60)
+    print("Test 2: RAG Routes")
+    print("="*60)
+
+    async def run():
+        server = UpstreamServer({
+            "/health": (0, {"status": "ok"}),
+            "/api/documents/count": (0.3, {"count": 3}),
+        })
+        restore = use_upstreams(await server.start())
+        try:
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            assert await rag_routes.get_document_count() == {"count": 3}
+            task.cancel()
+            # A blocking call would have held the loop for the whole 0.3s
+            assert ticks >= 10, ticks
+            print(f"✅ Event loop ran {ticks} times during a 0.3s upstream call")
+
+            assert (await rag_routes.rag_health_check())["status"] == "healthy"
+            await server.stop()
+            await http_clients.stop()
+            assert (await rag_routes.rag_health_check())["status"] == "degraded"
+            assert (await rag_routes.get_document_count())["count"] == 0
+            print("✅ Unreachable sidecar reported as degraded")
+        finally:
+            await restore()
+
+    asyncio.run(run())
+
+
+def test_vision_call():
+    """Test 3: Vision analysis posts to the vision upstream and parses its answer"""
+    print("\n" + "="*60)
+    print("Test 3: Vision Call")
+    print("="*60)
+
+    async def run():
+        analysis = {"detected_issues": [{"type": "漏水", "severity": "high"}], "confidence": 0.9}
+        completion = {"choices": [{"message": {"content": f"```json\n{json.dumps(analysis)}\n```"}}]}
+        server = UpstreamServer({"/v1/chat/completions": (0, completion)})
+        url = await server.start()
+        restore = use_upstreams("http://127.0.0.1:9", f"{url}/v1")
+        saved_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        try:
+            result = await rag_routes.analyze_image_with_openai("aGVsbG8=")
+            assert result["detected_issues"][0]["type"] == "漏水"
+            method, path, body = server.requests[0]
+            assert (method, path) == ("POST", "/v1/chat/completions")
+            assert body["messages"][0]["content"][1]["image_url"]["url"].endswith("aGVsbG8=")
+            print(f"✅ Parsed {len(result['detected_issues'])} issue from {path}")
+        finally:
+            if saved_key is None:
+                os.environ.pop("OPENAI_API_KEY")
+            else:
+                os.environ["OPENAI_API_KEY"] = saved_key
+            await restore()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all outbound HTTP client tests"""
+    print("🧪 Outbound HTTP Client Tests")
+    tests = [
+        test_keepalive_and_limits,
+        test_rag_routes_do_not_block,
+        test_vision_call,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
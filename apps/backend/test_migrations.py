@@ -0,0 +1,231 @@
+"""
+Test script for Alembic migrations and reading query plans
+Upgrades throwaway SQLite files and checks the reading queries use the composite indexes
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.advisory_lock import MIGRATION_LOCK_KEY, advisory_lock
+from database.base import Base
+from database.migrate import alembic_config, upgrade_database
+from models.reading import Reading
+from schemas.reading import ReadingFilter
+from services.readings_service import ReadingsService, _latest_stmt, _recent_stmt, _window_stmt, encode_cursor
+from services.sensor_service import SensorService
+from test_sensor_ingest import make_batch
+
+
+def make_engine():
+    return create_engine(f"sqlite:///{tempfile.mkdtemp(prefix='migration_test_')}/test.db")
+
+
+def reading_indexes(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("readings")}
+
+
+def test_upgrade_matches_models():
+    """Test 1: Upgrading an empty database yields exactly the model schema"""
+    print("\n" + "="*60)
+    print("Test 1: Upgrade Matches Models")
+    print("="*60)
+
+    engine = make_engine()
+    try:
+        upgrade_database(engine)
+        with engine.connect() as conn:
+            diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        assert diff == [], f"Schema drift between migrations and models: {diff}"
+        assert revision == ScriptDirectory.from_config(alembic_config()).get_current_head()
+        print(f"✅ Schema at revision {revision} matches the models")
+    finally:
+        engine.dispose()
+
+
+def test_legacy_database_upgrade():
+    """Test 2: create_all databases without alembic_version are stamped, then upgraded"""
+    print("\n" + "="*60)
+    print("Test 2: Legacy Database Upgrade")
+    print("="*60)
+
+    engine = make_engine()
+    try:
+        # A pre-migrations database: the baseline schema without version tracking
+        upgrade_database(engine, "0001")
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+        assert "ix_readings_type" in reading_indexes(engine)
+
+        upgrade_database(engine)
+        indexes = reading_indexes(engine)
+        assert {"ix_readings_sensor_id_timestamp", "ix_readings_type_timestamp",
+                "ix_readings_location_timestamp"} <= indexes
+        assert "ix_readings_type" not in indexes
+        print(f"✅ Legacy database upgraded: {sorted(indexes)}")
+
+        with engine.begin() as conn:
+            command.downgrade(alembic_config(conn), "0001")
+        assert "ix_readings_type_timestamp" not in reading_indexes(engine)
+        print("✅ Downgrade restores the single-column indexes")
+    finally:
+        engine.dispose()
+
+
+def test_create_all_database_upgrade():
+    """Test 3: Databases created by create_all from the current models are stamped at head"""
+    print("\n" + "="*60)
+    print("Test 3: create_all Database Upgrade")
+    print("="*60)
+
+    engine = make_engine()
+    try:
+        # seed_data.py and the benchmarks used to create the schema this way
+        Base.metadata.create_all(bind=engine)
+        upgrade_database(engine)
+        upgrade_database(engine)
+        with engine.connect() as conn:
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+            assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+        assert revision == ScriptDirectory.from_config(alembic_config()).get_current_head()
+        print(f"✅ Current schema stamped at {revision} without re-creating its indexes")
+    finally:
+        engine.dispose()
+
+
+def test_reading_query_plans():
+    """Test 4: Filtered ORDER BY timestamp DESC LIMIT n queries use an index, not a sort"""
+    print("\n" + "="*60)
+    print("Test 4: Reading Query Plans")
+    print("="*60)
+
+    engine = make_engine()
+    try:
+        upgrade_database(engine)
+        db = sessionmaker(bind=engine)()
+        sensors, readings = make_batch(sensor_count=5, readings_per_sensor=20)
+        SensorService(db).upsert_sensors(sensors, commit=False)
+        ReadingsService(db).append_many(readings)
+        db.close()
+
+        expectations = [
+            (_latest_stmt(ReadingFilter(type="humidity")), "ix_readings_type_timestamp"),
+            (_latest_stmt(ReadingFilter(location="basement_0")), "ix_readings_location_timestamp"),
+            (_recent_stmt(Reading.sensor_id, 1, 10), "ix_readings_sensor_id_timestamp"),
+            (_recent_stmt(Reading.type, "humidity", 10), "ix_readings_type_timestamp"),
+            (_recent_stmt(Reading.type, "humidity", 10, encode_cursor(datetime.utcnow(), 50)),
+             "ix_readings_type_timestamp"),
+            (_recent_stmt(Reading.location, "basement_1", 10), "ix_readings_location_timestamp"),
+            (_window_stmt(60, 10), "ix_readings_timestamp"),
+        ]
+        with engine.connect() as conn:
+            for stmt, index in expectations:
+                compiled = stmt.compile(dialect=engine.dialect)
+                params = tuple(compiled.params[name] for name in compiled.positiontup)
+                plan = " | ".join(
+                    row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+                )
+                assert index in plan, f"Expected {index}: {plan}"
+                assert "TEMP B-TREE" not in plan, f"Unexpected sort: {plan}"
+                print(f"✅ {plan}")
+    finally:
+        engine.dispose()
+
+
+def test_location_filters():
+    """Test 5: Location filters match substrings case-insensitively"""
+    print("\n" + "="*60)
+    print("Test 5: Location Filters")
+    print("="*60)
+
+    engine = make_engine()
+    try:
+        upgrade_database(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO sensors (id, sensor_id, vendor, model, type) "
+                              "VALUES (1, 'ble_legacy', 'v', 'm', 'humidity')"))
+            conn.execute(text("INSERT INTO readings (sensor_id, type, location, value, unit, confidence, timestamp) "
+                              "VALUES (1, 'humidity', 'Attic_North', 50, '%', 0.9, :ts), "
+                              "(1, 'humidity', 'AtticXNorth', 51, '%', 0.9, :ts)"), {"ts": datetime.utcnow()})
+
+        db = sessionmaker(bind=engine)()
+        recent = ReadingsService(db).get_recent_readings(60, 10, location_prefix="ATTIC")
+        assert sorted(r.location for r in recent) == ["AtticXNorth", "Attic_North"]
+        recent = ReadingsService(db).get_recent_readings(60, 10, location_prefix="north")
+        assert len(recent) == 2
+        # LIKE wildcards in the filter are matched literally
+        stats = ReadingsService(db).get_reading_stats(location_prefix="c_n", group_by=["type"])
+        assert stats["groups"][0]["type"] == "humidity" and stats["groups"][0]["count"] == 1
+        db.close()
+        print("✅ Locations match substrings case-insensitively, wildcards literally")
+    finally:
+        engine.dispose()
+
+
+def test_migrate_command():
+    """Test 6: python -m database.migrate upgrades DB_URL once, outside the app"""
+    print("\n" + "="*60)
+    print("Test 6: Migrate Command")
+    print("="*60)
+
+    path = Path(tempfile.mkdtemp(prefix='migration_test_')) / "test.db"
+    env = dict(os.environ, DB_URL=f"sqlite:///{path}")
+    result = subprocess.run([sys.executable, "-m", "database.migrate"], cwd=Path(__file__).parent,
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.connect() as conn:
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        assert revision == ScriptDirectory.from_config(alembic_config()).get_current_head()
+        print(f"✅ Command migrated a fresh database to {revision}")
+
+        # SQLite has no advisory locks; the lock is a no-op there
+        with advisory_lock(engine, MIGRATION_LOCK_KEY, wait=False) as held:
+            assert held
+            upgrade_database(engine)
+        print("✅ Advisory lock passes through on SQLite")
+    finally:
+        engine.dispose()
+
+
+def main():
+    """Run all migration tests"""
+    print("🧪 Migration Tests")
+    tests = [
+        test_upgrade_matches_models,
+        test_legacy_database_upgrade,
+        test_create_all_database_upgrade,
+        test_reading_query_plans,
+        test_location_filters,
+        test_migrate_command,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -10,7 +10,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from sqlalchemy.orm import Session
 from database.connection import SessionLocal, engine, DATABASE_URL
-from database.base import Base
+from database.migrate import upgrade_database
 from models.issue import Issue
 from models.feedback import Feedback
 from models.training_data import TrainingData
@@ -26,8 +26,8 @@ def test_database_schema():
     print("="*60)
     
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        # Create or upgrade all tables
+        upgrade_database(engine)
         print("✅ All tables created successfully")
         
         # Check if tables exist
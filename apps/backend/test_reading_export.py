@@ -0,0 +1,283 @@
+"""
+Test script for reading pagination and streaming export
+Runs against isolated in-memory SQLite databases
+"""
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from schemas.reading import ReadingData, ReadingFilter
+from schemas.sensor import SensorData
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api import sensor_routes
+from services import reading_export
+from services.reading_export import EXPORT_COLUMNS, aencode_chunks, encode_chunks, export_encoder
+from services.readings_service import AsyncReadingsService, ReadingsService, decode_cursor, next_cursor
+from services.sensor_service import AsyncSensorService, SensorService
+from test_async_database import make_async_session
+from test_sensor_ingest import make_session
+
+BASE_TIME = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def make_tied_batch(count: int = 25):
+    """Readings where several share a timestamp, to exercise the id tiebreaker"""
+    sensors = [SensorData(sensor_id="page_001", vendor="Test", model="P-1", type="humidity")]
+    readings = [
+        ReadingData(
+            sensor_id="page_001",
+            type="humidity",
+            location="basement",
+            value=float(i),
+            unit="%",
+            confidence=0.9,
+            extras_json={"seq": i},
+            timestamp=BASE_TIME + timedelta(seconds=i // 3)
+        )
+        for i in range(count)
+    ]
+    return sensors, readings
+
+
+def test_keyset_pagination():
+    """Test 1: Cursor pages cover every reading exactly once, newest first"""
+    print("\n" + "="*60)
+    print("Test 1: Keyset Pagination")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_tied_batch()
+        SensorService(db).upsert_sensors(sensors, commit=False)
+        ReadingsService(db).append_many(readings)
+        service = ReadingsService(db)
+
+        for fetch in (
+            lambda cursor: service.get_latest(ReadingFilter(type="humidity", limit=4, cursor=cursor)),
+            lambda cursor: service.get_readings_by_sensor("page_001", limit=4, cursor=cursor),
+        ):
+            seen, cursor, pages = [], None, 0
+            while True:
+                page = fetch(cursor)
+                seen.extend(r.value for r in page)
+                pages += 1
+                cursor = next_cursor(page, 4)
+                if cursor is None:
+                    break
+            assert seen == [float(i) for i in reversed(range(25))], seen
+            assert pages == 7
+        print(f"✅ 25 readings over {pages} pages, no duplicates or gaps")
+
+        try:
+            decode_cursor("not-a-cursor")
+            raise AssertionError("Expected ValueError for an invalid cursor")
+        except ValueError:
+            pass
+        print("✅ Invalid cursors rejected")
+    finally:
+        db.close()
+
+
+def test_streaming_export():
+    """Test 2: Exports stream in chunks, oldest first, as NDJSON and CSV"""
+    print("\n" + "="*60)
+    print("Test 2: Streaming Export")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_tied_batch()
+        SensorService(db).upsert_sensors(sensors, commit=False)
+        ReadingsService(db).append_many(readings)
+        service = ReadingsService(db)
+
+        chunks = list(service.iter_readings(chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert [row.value for chunk in chunks for row in chunk] == [float(i) for i in range(25)]
+
+        ndjson = b"".join(encode_chunks(service.iter_readings(chunk_size=10), "ndjson")).decode()
+        lines = [json.loads(line) for line in ndjson.splitlines()]
+        assert len(lines) == 25 and lines[0]["extras_json"] == {"seq": 0}
+        assert lines[0]["timestamp"].startswith("2026-03-01T12:00:00")
+
+        window = service.iter_readings(start=BASE_TIME + timedelta(seconds=2), end=BASE_TIME + timedelta(seconds=4))
+        data = b"".join(encode_chunks(window, "csv")).decode()
+        rows = list(csv.DictReader(io.StringIO(data)))
+        assert [float(r["value"]) for r in rows] == [6.0, 7.0, 8.0, 9.0, 10.0, 11.0]
+        assert json.loads(rows[0]["extras_json"]) == {"seq": 6} and rows[0]["calibration_json"] == ""
+        print(f"✅ {len(lines)} NDJSON lines, {len(rows)} CSV rows in the time window")
+
+        try:
+            export_encoder("xml")
+            raise AssertionError("Expected ValueError for an unknown format")
+        except ValueError:
+            pass
+    finally:
+        db.close()
+
+
+def test_async_streaming_export():
+    """Test 3: The async export streams from AsyncSession.stream"""
+    print("\n" + "="*60)
+    print("Test 3: Async Streaming Export")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        try:
+            sensors, readings = make_tied_batch()
+            await AsyncSensorService(db).upsert_sensors(sensors, commit=False)
+            await AsyncReadingsService(db).append_many(readings)
+
+            chunks = AsyncReadingsService(db).stream_readings(reading_type="humidity", chunk_size=8)
+            data = b"".join([part async for part in aencode_chunks(chunks, "ndjson")])
+            values = [json.loads(line)["value"] for line in data.decode().splitlines()]
+            assert values == [float(i) for i in range(25)]
+            print(f"✅ Streamed {len(values)} readings")
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_columnar_export():
+    """Test 4: Arrow and Parquet exports load back into pandas with typed columns"""
+    print("\n" + "="*60)
+    print("Test 4: Arrow and Parquet Export")
+    print("="*60)
+
+    import pandas as pd
+    import pyarrow as pa
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_tied_batch()
+        SensorService(db).upsert_sensors(sensors, commit=False)
+        ReadingsService(db).append_many(readings)
+        service = ReadingsService(db)
+
+        frames = {}
+        for fmt in ("arrow", "parquet"):
+            parts = list(encode_chunks(service.iter_readings(chunk_size=10), fmt))
+            data = b"".join(parts)
+            if fmt == "arrow":
+                frames[fmt] = pa.ipc.open_stream(data).read_pandas()
+            else:
+                frames[fmt] = pd.read_parquet(io.BytesIO(data))
+            print(f"✅ {fmt}: {len(data)} bytes in {len(parts)} parts")
+
+        for fmt, frame in frames.items():
+            assert list(frame.columns) == EXPORT_COLUMNS, frame.columns
+            assert frame["value"].tolist() == [float(i) for i in range(25)]
+            assert str(frame["value"].dtype) == "float64" and str(frame["id"].dtype) == "int64"
+            assert frame["timestamp"].iloc[0] == BASE_TIME.replace(tzinfo=timezone.utc)
+            assert json.loads(frame["extras_json"].iloc[3]) == {"seq": 3}
+            assert frame["calibration_json"].isna().all()
+        print("✅ Typed columns round-trip through pandas")
+
+        # Filters apply as for the other formats; an empty export is still a valid file
+        window = service.iter_readings(start=BASE_TIME + timedelta(seconds=2), end=BASE_TIME + timedelta(seconds=4))
+        frame = pd.read_parquet(io.BytesIO(b"".join(encode_chunks(window, "parquet"))))
+        assert frame["value"].tolist() == [6.0, 7.0, 8.0, 9.0, 10.0, 11.0]
+        empty = pa.ipc.open_stream(b"".join(encode_chunks(service.iter_readings(location="nowhere"), "arrow")))
+        assert empty.read_all().num_rows == 0
+        print("✅ Time window and empty exports")
+    finally:
+        db.close()
+
+
+def test_export_route_encoders():
+    """Test 5: The export route creates one encoder, in the stream, and closes it"""
+    print("\n" + "="*60)
+    print("Test 5: Export Route Encoders")
+    print("="*60)
+
+    import pandas as pd
+
+    created = []
+
+    def counting(fmt):
+        def factory():
+            created.append(reading_export.ColumnarEncoder(fmt))
+            return created[-1]
+        return factory
+
+    async def run():
+        db, engine = await make_async_session()
+        try:
+            sensors, readings = make_tied_batch()
+            await AsyncSensorService(db).upsert_sensors(sensors, commit=False)
+            await AsyncReadingsService(db).append_many(readings)
+            await db.commit()
+            sensor_routes.AsyncSessionLocal = async_sessionmaker(engine)
+
+            try:
+                await sensor_routes.export_readings(format="xml", sensor_id=None, type=None, location=None,
+                                                    start=None, end=None, db=db)
+                raise AssertionError("Expected a 400 for an unknown format")
+            except HTTPException as e:
+                assert e.status_code == 400
+
+            response = await sensor_routes.export_readings(format="parquet", sensor_id=None, type=None,
+                                                           location=None, start=None, end=None, db=db)
+            assert created == [], "The format check created an encoder"
+            data = b"".join([part async for part in response.body_iterator])
+            assert len(created) == 1 and created[0].closed
+            assert pd.read_parquet(io.BytesIO(data))["value"].tolist() == [float(i) for i in range(25)]
+            print("✅ One Parquet encoder, created by the stream")
+
+            # A client that goes away mid-export still gets its writer closed
+            stream = aencode_chunks(AsyncReadingsService(db).stream_readings(chunk_size=10), "arrow")
+            await stream.__anext__()
+            await stream.aclose()
+            assert len(created) == 2 and created[1].closed
+            print("✅ Abandoned Arrow stream closed its writer")
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    original_encoders = dict(reading_export.ENCODERS)
+    original_sessions = sensor_routes.AsyncSessionLocal
+    reading_export.ENCODERS.update(arrow=counting("arrow"), parquet=counting("parquet"))
+    try:
+        asyncio.run(run())
+    finally:
+        reading_export.ENCODERS.update(original_encoders)
+        sensor_routes.AsyncSessionLocal = original_sessions
+
+
+def main():
+    """Run all pagination and export tests"""
+    print("🧪 Reading Pagination and Export Tests")
+    tests = [
+        test_keyset_pagination,
+        test_streaming_export,
+        test_async_streaming_export,
+        test_columnar_export,
+        test_export_route_encoders,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
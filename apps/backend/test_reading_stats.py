@@ -0,0 +1,141 @@
+"""
+Test script for reading statistics
+Checks that aggregates computed in SQL match the values computed in Python
+"""
+import math
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.readings_service import ReadingsService
+from services.sensor_service import SensorService
+from test_sensor_ingest import count_statements, make_batch, make_session
+
+
+def seed(db, sensor_count: int = 3, readings_per_sensor: int = 10):
+    sensors, readings = make_batch(sensor_count, readings_per_sensor)
+    SensorService(db).upsert_sensors(sensors, commit=False)
+    ReadingsService(db).append_many(readings)
+    return sensors, readings
+
+
+def test_overall_stats():
+    """Test 1: Overall stats come from a single aggregate query"""
+    print("\n" + "="*60)
+    print("Test 1: Overall Stats")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = seed(db)
+        service = ReadingsService(db)
+        counter = count_statements(engine)
+        stats = service.get_reading_stats(include_stddev=True)
+        assert counter["statements"] == 1, f"Expected 1 statement, got {counter['statements']}"
+
+        values = [r.value for r in readings]
+        assert stats["count"] == len(values)
+        assert math.isclose(stats["avg_value"], statistics.mean(values))
+        assert stats["min_value"] == min(values) and stats["max_value"] == max(values)
+        assert math.isclose(stats["avg_confidence"], 0.9)
+        assert math.isclose(stats["stddev_value"], statistics.pstdev(values))
+        print(f"✅ {stats}")
+
+        filtered = service.get_reading_stats(sensor_id=sensors[0].sensor_id, location="basement_0")
+        assert filtered["count"] == 10
+        assert service.get_reading_stats(sensor_id="no_such_sensor")["count"] == 0
+        assert service.get_reading_stats(reading_type="co2") == {
+            "count": 0, "avg_value": 0, "min_value": 0, "max_value": 0, "avg_confidence": 0
+        }
+        print("✅ Filters applied; unknown sensors and empty matches return zero stats")
+    finally:
+        db.close()
+
+
+def test_grouped_stats():
+    """Test 2: Stats grouped by sensor, type and location"""
+    print("\n" + "="*60)
+    print("Test 2: Grouped Stats")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = seed(db)
+        service = ReadingsService(db)
+
+        by_location = service.get_reading_stats(group_by=["location"])
+        counts = {g["location"]: g["count"] for g in by_location["groups"]}
+        assert counts == {"basement_0": 20, "basement_1": 10}
+        assert by_location["groups"][0]["location"] == "basement_0"  # largest group first
+        assert not by_location["truncated"]
+
+        by_sensor = service.get_reading_stats(group_by=["sensor", "type"])
+        assert {g["sensor"] for g in by_sensor["groups"]} == {s.sensor_id for s in sensors}
+        assert all(g["type"] == "humidity" and g["count"] == 10 for g in by_sensor["groups"])
+        print(f"✅ {len(by_sensor['groups'])} sensor groups, locations: {counts}")
+
+        bounded = service.get_reading_stats(group_by=["sensor"], max_groups=2)
+        assert len(bounded["groups"]) == 2 and bounded["truncated"]
+        print("✅ Group count is bounded")
+
+        for bad in ({"group_by": ["unit"]}, {"percentiles": [150]}):
+            try:
+                service.get_reading_stats(**bad)
+                raise AssertionError(f"Expected ValueError for {bad}")
+            except ValueError:
+                pass
+        print("✅ Invalid group_by and percentiles rejected")
+    finally:
+        db.close()
+
+
+def test_percentiles():
+    """Test 3: Nearest-rank percentiles, overall and per group"""
+    print("\n" + "="*60)
+    print("Test 3: Percentiles")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        seed(db, sensor_count=2, readings_per_sensor=20)
+        service = ReadingsService(db)
+
+        # Values 40..59 twice over: ranks are ceil(p% of 40)
+        stats = service.get_reading_stats(percentiles=[0, 50, 95, 100])
+        assert stats["percentiles"] == {"p0": 40.0, "p50": 49.0, "p95": 58.0, "p100": 59.0}, stats
+
+        grouped = service.get_reading_stats(group_by=["sensor"], percentiles=[50], include_stddev=True)
+        for group in grouped["groups"]:
+            assert group["percentiles"] == {"p50": 49.0}
+            assert math.isclose(group["stddev_value"], statistics.pstdev(range(40, 60)))
+        print(f"✅ {stats['percentiles']}")
+    finally:
+        db.close()
+
+
+def main():
+    """Run all reading statistics tests"""
+    print("🧪 Reading Statistics Tests")
+    tests = [
+        test_overall_stats,
+        test_grouped_stats,
+        test_percentiles,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
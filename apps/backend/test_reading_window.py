@@ -0,0 +1,242 @@
+"""
+Test script for the recent-reading window behind AI sensor context
+build_sensor_context() is answered from memory: readings of the last
+READING_WINDOW_SECONDS, indexed by location and type, fed by the reading bus
+and warmed from the database on startup. Longer windows and summaries are
+filtered and aggregated in SQL.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.broker import ReadingBatch
+from services.readings_service import AsyncReadingsService, ReadingsService
+from services.reading_bus import reading_bus
+from services.reading_window import ReadingWindow, reading_window
+from services.sensor_id_cache import sensor_id_cache
+from services.sensor_service import AsyncSensorService, SensorService
+from test_async_database import make_async_session
+from test_sensor_ingest import count_statements, make_batch, make_session
+from utils.context_injection import build_sensor_context, build_sensor_context_async, get_sensor_summary
+
+
+def make_reading(reading_id: int, location: str, seconds_ago: float, reading_type: str = "humidity"):
+    return {
+        "id": reading_id,
+        "sensor_id": 1,
+        "type": reading_type,
+        "location": location,
+        "value": float(reading_id),
+        "unit": "%",
+        "confidence": 0.9,
+        "calibration_json": None,
+        "extras_json": {"battery_level": 90},
+        "timestamp": datetime.utcnow() - timedelta(seconds=seconds_ago)
+    }
+
+
+def test_window_lookup():
+    """Test 1: Lookups match by location substring and type, newest first, inside the window"""
+    print("\n" + "="*60)
+    print("Test 1: Window Lookup")
+    print("="*60)
+
+    window = ReadingWindow(window_seconds=600, per_stream=3)
+    window.update([
+        make_reading(1, "Attic_North", 50),
+        make_reading(2, "attic_south", 40, "temperature"),
+        make_reading(3, "basement", 30),
+        make_reading(4, "attic_north", 10),
+        make_reading(5, "attic_north", 900),  # outside the window
+    ])
+    # Late arrival lands in timestamp order
+    window.update([make_reading(6, "attic_south", 20, "temperature")])
+
+    attic = window.recent("ATTIC", window_seconds=600)
+    assert [r["value"] for r in attic] == [4.0, 6.0, 2.0, 1.0]
+    assert attic[0]["extras"] == {"battery_level": 90} and "calibration" not in attic[0]
+    assert 9 < attic[0]["age_seconds"] < 11
+    assert [r["value"] for r in window.recent("attic", 600, reading_type="temperature")] == [6.0, 2.0]
+    assert [r["value"] for r in window.recent("attic", 35)] == [4.0, 6.0]
+    assert [r["value"] for r in window.recent("", 600, limit=2)] == [4.0, 6.0]
+    assert window.recent("garage", 600) == []
+    assert [r["value"] for r in window.recent("NORTH", 600)] == [4.0, 1.0]
+    print(f"✅ Location substring, type, window and limit honoured: {window.stats()}")
+
+    window.update([make_reading(i, "attic_north", 5 - i) for i in (7, 8, 9)])
+    assert [r["value"] for r in window.recent("attic_north", 600)] == [9.0, 8.0, 7.0]
+    print("✅ Each stream keeps at most per_stream readings")
+
+
+def test_context_without_database():
+    """Test 2: build_sensor_context() answers from the window, fed by ingest, with no statements"""
+    print("\n" + "="*60)
+    print("Test 2: Context Without Database")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_batch(sensor_count=4, readings_per_sensor=5)
+        SensorService(db).upsert_sensors(sensors)
+        rows = ReadingsService(db).append_many(readings[:10])
+        assert reading_window.warm(db) == 10
+
+        reading_bus.add_listener(reading_window.on_event)
+        try:
+            # Later readings arrive through the bus like any ingest path
+            rows = ReadingsService(db).append_many(readings[10:])
+            reading_bus.publish_readings(rows, [reading.sensor_id for reading in readings[10:]])
+
+            counter = count_statements(engine)
+            context = build_sensor_context("plumbing", "basement_1", window_sec=3600, db=db)
+            assert counter["statements"] == 0
+            assert len(context) == 10 and all(r["location"] == "basement_1" for r in context)
+            assert [r["timestamp"] for r in context] == sorted((r["timestamp"] for r in context), reverse=True)
+            print(f"✅ {len(context)} readings of context with {counter['statements']} statements")
+
+            # A window longer than the one kept in memory goes to the database
+            fallback = build_sensor_context("plumbing", "basement_1", window_sec=7200, db=db)
+            assert counter["statements"] == 1
+            assert [r["value"] for r in fallback] == [r["value"] for r in context]
+            assert set(fallback[0]) == set(context[0])
+            print("✅ Longer windows fall back to the database with the same result")
+
+            runs = 1000
+            started = time.perf_counter()
+            for _ in range(runs):
+                build_sensor_context("plumbing", "basement", window_sec=300, db=db)
+            memory = (time.perf_counter() - started) / runs * 1e6
+            started = time.perf_counter()
+            for _ in range(100):
+                build_sensor_context("plumbing", "basement", window_sec=7200, db=db)
+            database = (time.perf_counter() - started) / 100 * 1e6
+            print(f"✅ Context: {memory:.1f} µs from memory vs {database:.1f} µs from the database")
+        finally:
+            reading_bus.remove_listener(reading_window.on_event)
+            reading_window.clear()
+    finally:
+        db.close()
+        engine.dispose()
+        sensor_id_cache.clear()
+
+
+def test_filters_in_database():
+    """Test 3: Without the window, location filters and the summary's aggregates run in SQL"""
+    print("\n" + "="*60)
+    print("Test 3: Filters in the Database")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        # 60 readings at basement_1, more than one context page
+        sensors, readings = make_batch(sensor_count=4, readings_per_sensor=30)
+        SensorService(db).upsert_sensors(sensors)
+        ReadingsService(db).append_many(readings)
+        assert not reading_window.ready
+
+        context = build_sensor_context("plumbing", "BASEMENT_1", window_sec=3600, db=db)
+        assert len(context) == 50 and all(r["location"] == "basement_1" for r in context)
+
+        counter = count_statements(engine)
+        summary = get_sensor_summary("plumbing", "basement_1", window_sec=3600, db=db)
+        assert summary["total_readings"] == 60 and summary["overall_stats"]["count"] == 60
+        humidity = summary["readings_by_type"]["humidity"]
+        assert humidity["count"] == 60 and humidity["min_value"] == 40.0 and humidity["max_value"] == 69.0
+        assert humidity["latest_reading"]["value"] == 69.0
+        # Overall and per-type aggregates, plus the latest reading of the one type
+        assert counter["statements"] == 3
+        print(f"✅ Summary of {summary['total_readings']} readings in {counter['statements']} statements")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_aware_timestamps():
+    """Test 4: Timezone-aware timestamps, as PostgreSQL returns them, mix with naive UTC ones"""
+    print("\n" + "="*60)
+    print("Test 4: Aware Timestamps")
+    print("="*60)
+
+    taipei = timezone(timedelta(hours=8))
+    aware = make_reading(1, "attic", 30)
+    aware["timestamp"] = (aware["timestamp"] + timedelta(hours=8)).replace(tzinfo=taipei)
+    stale = make_reading(2, "attic", 900)
+    stale["timestamp"] = stale["timestamp"].replace(tzinfo=timezone.utc)
+
+    window = ReadingWindow(window_seconds=600)
+    window.update([aware, stale, make_reading(3, "attic", 10)])
+    recent = window.recent("attic", window_seconds=600)
+    assert [r["value"] for r in recent] == [3.0, 1.0]
+    assert 29 < recent[1]["age_seconds"] < 31
+    assert [r["value"] for r in window.recent("attic", 20)] == [3.0]
+    print("✅ +08:00 and UTC readings are placed and aged as naive UTC")
+
+    # The bus delivers to the window like any listener, after the batch is committed
+    reading_bus.add_listener(window.on_event)
+    try:
+        later = make_reading(4, "attic", 5)
+        later["timestamp"] = later["timestamp"].replace(tzinfo=timezone.utc)
+        reading_bus.publish(ReadingBatch([later], {}))
+    finally:
+        reading_bus.remove_listener(window.on_event)
+    assert window.recent("attic", 600)[0]["value"] == 4.0
+    print("✅ Aware readings from the bus land in the window")
+
+
+def test_async_context():
+    """Test 5: Async routes get the same context through an AsyncSession"""
+    print("\n" + "="*60)
+    print("Test 5: Async Context")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        try:
+            sensors, readings = make_batch(sensor_count=4, readings_per_sensor=5)
+            await AsyncSensorService(db).upsert_sensors(sensors)
+            await AsyncReadingsService(db).append_many(readings)
+            assert not reading_window.ready
+
+            context = await build_sensor_context_async("plumbing", "BASEMENT_1", window_sec=3600, db=db)
+            assert len(context) == 10 and all(r["location"] == "basement_1" for r in context)
+            assert context[0]["age_seconds"] >= 0
+            assert await build_sensor_context_async("plumbing", "basement_1", window_sec=3600) == []
+            print(f"✅ {len(context)} readings of context from the async session")
+        finally:
+            await db.close()
+            await engine.dispose()
+            sensor_id_cache.clear()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all reading window tests"""
+    print("🧪 Reading Window Tests")
+    tests = [
+        test_window_lookup,
+        test_context_without_database,
+        test_filters_in_database,
+        test_aware_timestamps,
+        test_async_context,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
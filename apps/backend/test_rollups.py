@@ -0,0 +1,283 @@
+"""
+Test script for reading rollups
+Covers incremental maintenance at ingest, tier routing, retention pruning and rebuilds
+"""
+import math
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import func, select
+
+from models.reading import Reading
+from models.reading_rollup import ReadingRollup
+from schemas.reading import ReadingData
+from schemas.sensor import SensorData
+from services import rollup_service
+from services.readings_service import ReadingsService
+from services.rollup_service import RollupService, bucket_start, choose_tier, parse_resolution
+from services.sensor_service import SensorService
+from test_sensor_ingest import make_session
+
+BASE_TIME = datetime(2026, 3, 1, 10, 0, 0)
+
+
+@contextmanager
+def retention(raw, minute, hour):
+    """Temporarily override the raw, 1m and 1h retention windows"""
+    saved = rollup_service.RAW_RETENTION, dict(rollup_service.ROLLUP_RETENTION)
+    rollup_service.RAW_RETENTION = raw
+    rollup_service.ROLLUP_RETENTION.update({"1m": minute, "1h": hour})
+    try:
+        yield
+    finally:
+        rollup_service.RAW_RETENTION = saved[0]
+        rollup_service.ROLLUP_RETENTION.update(saved[1])
+
+
+def make_readings(start: datetime, count: int, step_seconds: int = 20, sensors: int = 2):
+    """Readings spread over sensors every step_seconds, values 0..count-1"""
+    sensor_data = [
+        SensorData(sensor_id=f"rollup_{i}", vendor="Test", model="R-1", type="temperature")
+        for i in range(sensors)
+    ]
+    readings = [
+        ReadingData(
+            sensor_id=sensor_data[i % sensors].sensor_id,
+            type="temperature",
+            location="attic",
+            value=float(i),
+            unit="C",
+            confidence=0.8,
+            timestamp=start + timedelta(seconds=i * step_seconds)
+        )
+        for i in range(count)
+    ]
+    return sensor_data, readings
+
+
+def ingest(db, sensors, readings):
+    SensorService(db).upsert_sensors(sensors, commit=False)
+    return ReadingsService(db).append_many(readings)
+
+
+def expected_rollups(db, tier: str):
+    """Rollups recomputed from raw readings in Python"""
+    expected = {}
+    for reading in db.scalars(select(Reading)):
+        key = (reading.sensor_id, bucket_start(reading.timestamp, rollup_service.ROLLUP_TIERS[tier]))
+        count, total, low, high = expected.get(key, (0, 0.0, reading.value, reading.value))
+        expected[key] = (count + 1, total + reading.value, min(low, reading.value), max(high, reading.value))
+    return expected
+
+
+def stored_rollups(db, tier: str):
+    return {
+        (r.sensor_id, r.bucket_start): (r.count, r.sum_value, r.min_value, r.max_value)
+        for r in db.scalars(select(ReadingRollup).where(ReadingRollup.tier == tier))
+    }
+
+
+def test_incremental_rollups():
+    """Test 1: Rollups maintained at ingest match aggregates over raw readings"""
+    print("\n" + "="*60)
+    print("Test 1: Incremental Rollups")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        assert bucket_start(datetime(2026, 3, 1, 10, 17, 42, 5), 60) == datetime(2026, 3, 1, 10, 17)
+        assert bucket_start(datetime(2026, 3, 1, 10, 17, 42), 3600) == datetime(2026, 3, 1, 10, 0)
+
+        # Two overlapping batches, so buckets are updated as well as created
+        sensors, first = make_readings(BASE_TIME, 200)
+        _, second = make_readings(BASE_TIME + timedelta(seconds=10), 200)
+        for reading in second:
+            reading.value = -reading.value
+        ingest(db, sensors, first)
+        ingest(db, sensors, second)
+
+        for tier in rollup_service.ROLLUP_TIERS:
+            stored, expected = stored_rollups(db, tier), expected_rollups(db, tier)
+            assert stored == expected, f"{tier} rollups differ from raw aggregates"
+            print(f"✅ {tier}: {len(stored)} buckets match raw readings")
+    finally:
+        db.close()
+
+
+def test_tier_routing():
+    """Test 2: Queries use the coarsest tier that meets the resolution and retention"""
+    print("\n" + "="*60)
+    print("Test 2: Tier Routing")
+    print("="*60)
+
+    now = datetime(2026, 3, 10)
+    with retention(timedelta(days=1), timedelta(days=7), None):
+        recent = now - timedelta(hours=2)
+        assert choose_tier(0, recent, now) == "raw"
+        assert choose_tier(59, recent, now) == "raw"
+        assert choose_tier(60, recent, now) == "1m"
+        assert choose_tier(900, recent, now) == "1m"
+        assert choose_tier(86400, recent, now) == "1h"
+        # Raw readings from three days ago are gone; a week ago only hourly rollups remain
+        assert choose_tier(0, now - timedelta(days=3), now) == "1m"
+        assert choose_tier(60, now - timedelta(days=30), now) == "1h"
+        assert parse_resolution("raw") == 0 and parse_resolution("1h") == 3600
+        assert parse_resolution("300") == 300
+        for bad in ("-5", "often"):
+            try:
+                parse_resolution(bad)
+                raise AssertionError(f"Expected ValueError for {bad}")
+            except ValueError:
+                pass
+    print("✅ Resolution and retention pick the expected tiers")
+
+
+def test_history_queries():
+    """Test 3: History returns raw points or rollup buckets for the same range"""
+    print("\n" + "="*60)
+    print("Test 3: History Queries")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_readings(BASE_TIME, 360)  # two hours at 20s spacing
+        ingest(db, sensors, readings)
+        service = RollupService(db)
+        end = BASE_TIME + timedelta(hours=2)
+
+        with retention(None, None, None):
+            raw = service.get_history(start=BASE_TIME, end=end, resolution_seconds=0, limit=1000)
+            minute = service.get_history(start=BASE_TIME, end=end, resolution_seconds=300, limit=1000)
+            hour = service.get_history(start=BASE_TIME, end=end, resolution_seconds=3600, limit=1000)
+        assert (raw["tier"], minute["tier"], hour["tier"]) == ("raw", "1m", "1h")
+        assert len(raw["points"]) == 360
+        assert len(minute["points"]) == 240 and len(hour["points"]) == 4
+        for result in (raw, minute, hour):
+            assert sum(p["count"] for p in result["points"]) == 360
+        first_hour = [p for p in hour["points"] if p["sensor_id"] == hour["points"][0]["sensor_id"]][0]
+        assert first_hour["min_value"] == 0.0 and math.isclose(first_hour["avg_confidence"], 0.8)
+        print(f"✅ raw={len(raw['points'])} 1m={len(minute['points'])} 1h={len(hour['points'])} points")
+
+        sensor_pk = raw["points"][0]["sensor_id"]
+        with retention(None, None, None):
+            one_sensor = service.get_history(sensor_pk=sensor_pk, start=BASE_TIME, end=end, resolution_seconds=3600)
+            limited = service.get_history(start=BASE_TIME, end=end, limit=10)
+        assert all(p["sensor_id"] == sensor_pk for p in one_sensor["points"])
+        assert len(limited["points"]) == 10 and limited["truncated"]
+        print("✅ Sensor filter and limit applied")
+    finally:
+        db.close()
+
+
+def test_prune_and_rebuild():
+    """Test 4: Pruning honours each tier's retention; rebuild recreates rollups"""
+    print("\n" + "="*60)
+    print("Test 4: Prune and Rebuild")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        now = datetime.utcnow()
+        sensors, old = make_readings(now - timedelta(days=10), 30)
+        _, recent = make_readings(now - timedelta(hours=1), 30)
+        ingest(db, sensors, old)
+        ingest(db, sensors, recent)
+        expected = stored_rollups(db, "1m")
+
+        with retention(timedelta(days=1), timedelta(days=7), None):
+            deleted = RollupService(db).prune(now)
+        assert deleted["raw"] == 30 and deleted["1m"] > 0 and "1h" not in deleted
+        assert db.scalar(select(func.count()).select_from(Reading)) == 30
+        assert db.scalar(select(func.min(ReadingRollup.bucket_start)).where(ReadingRollup.tier == "1h")) \
+            < now - timedelta(days=9)
+        print(f"✅ Pruned {deleted}; hourly rollups kept")
+
+        # Rebuilding from the remaining raw readings leaves older rollups untouched
+        hourly = stored_rollups(db, "1h")
+        db.query(ReadingRollup).filter(ReadingRollup.bucket_start >= now - timedelta(hours=2)).delete()
+        db.commit()
+        assert RollupService(db).rebuild() == 30
+        assert stored_rollups(db, "1h") == hourly
+        assert all(stored_rollups(db, "1m")[key] == value for key, value in expected.items()
+                   if key[1] >= now - timedelta(hours=2))
+        print("✅ Rebuild recreated rollups for the retained readings")
+
+        assert SensorService(db).delete_sensor(sensors[0].sensor_id)
+        remaining = db.scalars(select(ReadingRollup.sensor_id).distinct()).all()
+        assert len(remaining) == 1
+        print("✅ Deleting a sensor removes its rollups")
+    finally:
+        db.close()
+
+
+def test_prune_keeps_unrolled_history():
+    """Test 5: Raw readings no rollup covers survive pruning until rebuilt"""
+    print("\n" + "="*60)
+    print("Test 5: Upgraded History")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        now = datetime.utcnow()
+        sensors, old = make_readings(now - timedelta(days=60), 30)
+        _, recent = make_readings(now - timedelta(hours=1), 30)
+        ingest(db, sensors, old)
+        ingest(db, sensors, recent)
+        # Readings stored before rollups existed
+        db.query(ReadingRollup).delete()
+        db.commit()
+
+        assert rollup_service.RAW_RETENTION is None
+        assert RollupService(db).prune(now).get("raw") is None
+        print("✅ Raw readings kept by default")
+
+        with retention(timedelta(days=30), None, None):
+            assert RollupService(db).prune(now) == {}
+            assert db.scalar(select(func.count()).select_from(Reading)) == 60
+            print("✅ Nothing pruned while no rollups exist")
+
+            # Rollups maintained since the upgrade do not cover the older readings
+            ingest(db, sensors, make_readings(now - timedelta(minutes=5), 2)[1])
+            assert RollupService(db).prune(now)["raw"] == 0
+            assert db.scalar(select(func.count()).select_from(Reading)) == 62
+            print("✅ Readings older than the oldest rollup kept")
+
+            assert RollupService(db).rebuild() == 62
+            assert RollupService(db).prune(now)["raw"] == 30
+            assert db.scalar(select(func.min(ReadingRollup.bucket_start)).where(ReadingRollup.tier == "1h")) \
+                < now - timedelta(days=59)
+            print("✅ Pruned once rebuild_rollups covered them")
+    finally:
+        db.close()
+
+
+def main():
+    """Run all rollup tests"""
+    print("🧪 Reading Rollup Tests")
+    tests = [
+        test_incremental_rollups,
+        test_tier_routing,
+        test_history_queries,
+        test_prune_and_rebuild,
+        test_prune_keeps_unrolled_history,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
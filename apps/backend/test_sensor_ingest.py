@@ -0,0 +1,241 @@
+"""
+Test script for the sensor ingest path
+Runs against an isolated in-memory SQLite database
+"""
+import math
+import sys
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401 - registers all tables on Base.metadata
+from database.base import Base
+from models.reading import Reading
+from models.sensor import Sensor
+from schemas.sensor import SensorData
+from schemas.reading import ReadingData
+from services.sensor_service import SensorService
+from services.readings_service import ReadingsService
+from services.rollup_service import UPSERT_CHUNK_SIZE, rollup_rows
+from services.sensor_id_cache import SensorIdCache, sensor_id_cache
+
+
+def make_session():
+    """Create a session bound to a fresh in-memory database"""
+    # Ids cached against a previous database would not be valid here
+    sensor_id_cache.clear()
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)(), engine
+
+
+def make_batch(sensor_count: int = 3, readings_per_sensor: int = 10):
+    """Build sensors and readings payloads for a batch"""
+    sensors = [
+        SensorData(sensor_id=f"ble_test_{i:03d}", vendor="TestVendor", model="T-1", type="humidity")
+        for i in range(sensor_count)
+    ]
+    base_time = datetime.utcnow() - timedelta(minutes=readings_per_sensor)
+    readings = [
+        ReadingData(
+            sensor_id=sensor.sensor_id,
+            type="humidity",
+            location=f"basement_{i % 2}",
+            value=40.0 + j,
+            unit="%",
+            confidence=0.9,
+            calibration_json={"offset": 0.1},
+            timestamp=base_time + timedelta(minutes=j)
+        )
+        for i, sensor in enumerate(sensors)
+        for j in range(readings_per_sensor)
+    ]
+    return sensors, readings
+
+
+def count_statements(engine):
+    """Attach a statement counter to an engine and return it"""
+    counter = {"statements": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    return counter
+
+
+def test_bulk_upsert_sensors():
+    """Test 1: Bulk sensor upsert inserts and updates in one statement"""
+    print("\n" + "="*60)
+    print("Test 1: Bulk Sensor Upsert")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        service = SensorService(db)
+        sensors, _ = make_batch(sensor_count=5)
+        created = service.upsert_sensors(sensors)
+        assert [s.sensor_id for s in created] == [s.sensor_id for s in sensors]
+        print(f"✅ Inserted {len(created)} sensors")
+
+        # Re-upsert with a changed model plus a duplicate within the batch
+        updated_payload = [
+            SensorData(sensor_id=s.sensor_id, vendor=s.vendor, model="T-2", type=s.type)
+            for s in sensors
+        ]
+        updated_payload.append(updated_payload[0])
+        counter = count_statements(engine)
+        updated = service.upsert_sensors(updated_payload)
+        statements = counter["statements"]
+
+        assert statements == 1, statements
+        assert len(updated) == 5
+        assert all(s.model == "T-2" for s in updated)
+        assert db.query(Sensor).count() == 5
+        assert {s.id for s in updated} == {s.id for s in created}
+        print(f"✅ Updated {len(updated)} sensors with {statements} statement(s)")
+    finally:
+        db.close()
+
+
+def test_bulk_append_readings():
+    """Test 2: Readings are resolved and inserted with a fixed statement count"""
+    print("\n" + "="*60)
+    print("Test 2: Bulk Reading Insert")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_batch(sensor_count=5, readings_per_sensor=100)
+        SensorService(db).upsert_sensors(sensors)
+        # Drop the ids cached by the upsert to exercise the batched lookup
+        sensor_id_cache.clear()
+
+        counter = count_statements(engine)
+        inserted = ReadingsService(db).append_many(readings)
+        statements = counter["statements"]
+
+        assert len(inserted) == len(readings)
+        assert db.query(Reading).count() == len(readings)
+        # Returned rows follow submission order and carry generated columns
+        assert [r.value for r in inserted] == [r.value for r in readings]
+        assert all(r.id is not None and r.created_at is not None for r in inserted)
+        assert inserted[0].calibration_json == {"offset": 0.1}
+        # One sensor lookup, the batched INSERT ... RETURNING and the chunked rollup upserts
+        rollup_chunks = math.ceil(len(rollup_rows(inserted)) / UPSERT_CHUNK_SIZE)
+        assert statements == 2 + rollup_chunks, statements
+        print(f"✅ Inserted {len(inserted)} readings with {statements} statement(s)")
+    finally:
+        db.close()
+
+
+def test_single_transaction_ingest():
+    """Test 3: Sensors and readings commit together, unknown sensors roll back"""
+    print("\n" + "="*60)
+    print("Test 3: Single Transaction Ingest")
+    print("="*60)
+
+    db, _ = make_session()
+    try:
+        sensors, readings = make_batch(sensor_count=2, readings_per_sensor=3)
+        readings.append(readings[0].copy(update={"sensor_id": "unknown_sensor"}))
+
+        SensorService(db).upsert_sensors(sensors, commit=False)
+        try:
+            ReadingsService(db).append_many(readings)
+            raise AssertionError("Expected ValueError for unknown sensor")
+        except ValueError as e:
+            assert "unknown_sensor" in str(e)
+            db.rollback()
+
+        assert db.query(Sensor).count() == 0
+        assert db.query(Reading).count() == 0
+        print("✅ Failed batch left no partial writes")
+    finally:
+        db.close()
+
+
+def test_sensor_id_cache():
+    """Test 4: Steady-state ingest resolves sensors from the cache"""
+    print("\n" + "="*60)
+    print("Test 4: Sensor-id Cache")
+    print("="*60)
+
+    db, engine = make_session()
+    try:
+        sensors, readings = make_batch(sensor_count=3, readings_per_sensor=5)
+        SensorService(db).upsert_sensors(sensors)
+
+        lookups = {"count": 0}
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count_lookups(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "FROM sensors" in statement:
+                lookups["count"] += 1
+
+        service = ReadingsService(db)
+        service.append_many(readings)
+        service.get_readings_by_sensor(sensors[0].sensor_id)
+        service.get_reading_stats(sensor_id=sensors[1].sensor_id)
+        assert lookups["count"] == 0, lookups
+        print(f"✅ No sensor lookups after upsert: {sensor_id_cache.stats()}")
+
+        # Deleting a sensor invalidates its entry
+        assert SensorService(db).delete_sensor(sensors[0].sensor_id)
+        assert sensor_id_cache.get(sensors[0].sensor_id) is None
+        assert service.get_readings_by_sensor(sensors[0].sensor_id) == []
+        print("✅ delete_sensor invalidated the cache entry")
+
+        # Warming loads existing sensors into an empty cache
+        sensor_id_cache.clear()
+        assert sensor_id_cache.warm(db) == 2
+        found, missing = sensor_id_cache.get_many([s.sensor_id for s in sensors[1:]])
+        assert len(found) == 2 and not missing
+        print("✅ Cache warmed from the database")
+
+        # LRU eviction keeps the cache bounded
+        small = SensorIdCache(maxsize=2)
+        small.put_many({"a": 1, "b": 2})
+        small.get("a")
+        small.put("c", 3)
+        assert small.get("b") is None and small.get("a") == 1
+        assert small.stats()["evictions"] == 1
+        print("✅ Least recently used entry evicted")
+    finally:
+        db.close()
+
+
+def main():
+    """Run all ingest tests"""
+    print("🧪 Sensor Ingest Tests")
+    tests = [
+        test_bulk_upsert_sensors,
+        test_bulk_append_readings,
+        test_single_transaction_ingest,
+        test_sensor_id_cache,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
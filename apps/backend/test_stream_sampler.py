@@ -0,0 +1,267 @@
+"""
+Test script for adaptive sampling of realtime camera streams
+Each stream remembers the perceptual hash of its last analyzed frame and
+skips frames showing the same view, re-checking a still view at a growing
+interval and analyzing at once when the scene or the sensors change
+"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from api import rag_routes
+from models.model_version import ModelVersion
+from services.stream_sampler import StreamSampler, sensor_anomaly, stream_sampler
+from services.vision_cache import frame_hash, vision_cache
+from test_async_database import make_async_session
+from test_http_clients import UpstreamServer, use_upstreams
+from test_vision_cache import make_frame
+
+
+def age(sampler: StreamSampler, stream_id: str, seconds: float):
+    """Pretend the stream's last analysis happened this much earlier"""
+    sampler._sessions[stream_id].analyzed_at -= seconds
+
+
+def test_still_view_backs_off():
+    """Test 1: A still view is skipped, and re-checked at a doubling interval"""
+    print("\n" + "="*60)
+    print("Test 1: Still View Backs Off")
+    print("="*60)
+
+    sampler = StreamSampler(min_interval=2, max_interval=8)
+    view = 0xF0F0_F0F0_F0F0_F0F0
+    assert sampler.decide("cam", view).reason == "first_frame"
+    skipped = sampler.decide("cam", view ^ 0b101)
+    assert not skipped.analyze and skipped.reason == "unchanged" and skipped.distance == 2
+
+    intervals = []
+    for _ in range(4):
+        age(sampler, "cam", 1)
+        assert not sampler.decide("cam", view).analyze
+        age(sampler, "cam", sampler._sessions["cam"].interval)
+        decision = sampler.decide("cam", view)
+        assert decision.analyze and decision.reason == "refresh"
+        intervals.append(decision.interval)
+    assert intervals == [2, 4, 8, 8], intervals
+
+    stats = sampler.stats()
+    assert (stats["analyzed"], stats["skipped"]) == (5, 5)
+    assert stats["by_stream"]["cam"] == {"analyzed": 5, "skipped": 5, "interval_seconds": 8}
+    print(f"✅ Re-checked after {intervals} seconds, skip rate {stats['skip_rate']}")
+
+
+def test_change_and_anomaly_speed_up():
+    """Test 2: Scene changes and sensor anomalies return a stream to the minimum interval"""
+    print("\n" + "="*60)
+    print("Test 2: Changes Speed Up Sampling")
+    print("="*60)
+
+    sampler = StreamSampler(min_interval=2, max_interval=30)
+    view = 0xF0F0_F0F0_F0F0_F0F0
+    sampler.decide("cam", view)
+    sampler._sessions["cam"].interval = 30
+
+    # A new scene is analyzed at once, however recently the last frame was
+    decision = sampler.decide("cam", view ^ 0xFFFF)
+    assert decision.reason == "scene_change" and decision.interval == 2
+
+    # Moderate movement is analyzed at the minimum interval, not faster
+    moved = view ^ 0xFFFF ^ 0b11_1111
+    assert sampler.decide("cam", moved).reason == "rate_limited"
+    age(sampler, "cam", 2)
+    assert sampler.decide("cam", moved).reason == "changed"
+
+    # An alarming reading re-checks an unchanged view at the minimum interval
+    sampler._sessions["cam"].interval = 30
+    hot = [{"type": "temperature", "value": 25}, {"type": "moisture_level", "value": 85}]
+    assert sensor_anomaly(hot) and not sensor_anomaly(hot[:1])
+    assert not sampler.decide("cam", moved, anomaly=sensor_anomaly(hot)).analyze
+    age(sampler, "cam", 2)
+    assert sampler.decide("cam", moved, anomaly=True).reason == "sensor_anomaly"
+    assert sampler._sessions["cam"].interval == 2
+    print("✅ Scene change, movement and anomaly analyzed at the minimum interval")
+
+    assert sampler.decide("cam", moved, force=True).reason == "requested"
+    assert sampler.decide("cam", None).reason == "unhashable"
+    assert not sampler.decide("cam", moved).analyze, "unhashable frame replaced the reference"
+    print("✅ Photos and undecodable frames are always analyzed")
+
+    small = StreamSampler(max_sessions=2)
+    for stream_id in ("a", "b", "c"):
+        small.decide(stream_id, view)
+    assert list(small.stats()["by_stream"]) == ["b", "c"]
+    small.idle_seconds = 0
+    small.decide("d", view)
+    assert len(small) == 1
+    print("✅ Least recently seen and idle streams are forgotten")
+
+
+def test_realtime_route_skips_frames():
+    """Test 3: The realtime route reports skipped frames without calling the vision API"""
+    print("\n" + "="*60)
+    print("Test 3: Realtime Route")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        # The deployed detection model's prompt is loaded through the request's async session
+        db.add(ModelVersion(model_type="detection", version="v2", performance_metrics={},
+                            prompt_template="trained prompt", deployed=True))
+        await db.commit()
+        analysis = {"detected_issues": [{"type": "漏水", "severity": "high"}], "confidence": 0.9}
+        completion = {"choices": [{"message": {"content": json.dumps(analysis)}}]}
+        server = UpstreamServer({"/v1/chat/completions": (0, completion)})
+        restore = use_upstreams("http://127.0.0.1:9", f"{await server.start()}/v1")
+        saved_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        saved_size, vision_cache.max_entries = vision_cache.max_entries, 0
+        stream_sampler.clear()
+
+        def frame(**kwargs):
+            return rag_routes.RealtimeStreamRequest(
+                frame=make_frame(**kwargs), timestamp="2026-01-01T00:00:00", streamId="phone-1")
+
+        request_vision_analysis = rag_routes.request_vision_analysis
+        held = []
+
+        async def record_connection(*args):
+            # The request's session has given its connection back before the vision call
+            held.append(db.in_transaction())
+            return await request_vision_analysis(*args)
+
+        rag_routes.request_vision_analysis = record_connection
+        try:
+            statuses = []
+            for request in (frame(), frame(brightness=5), frame(shift=30), frame(shape="roof")):
+                response = await rag_routes.analyze_realtime_stream(request, db)
+                statuses.append((response.frameStatus, response.sampling["reason"]))
+                if response.frameStatus == "skipped":
+                    assert response.frameAnalysis["issues"] == []
+                else:
+                    assert response.frameAnalysis["issues"][0]["type"] == "漏水"
+            assert statuses == [("analyzed", "first_frame"), ("skipped", "unchanged"),
+                                ("skipped", "unchanged"), ("analyzed", "scene_change")], statuses
+            assert len(server.requests) == 2
+            assert server.requests[0][2]["messages"][0]["content"][0]["text"] == "trained prompt"
+            assert held == [False, False]
+            print(f"✅ {statuses}")
+
+            photo = rag_routes.RealtimeStreamRequest(
+                frame=make_frame(shape="roof"), timestamp="2026-01-01T00:00:00",
+                streamId="phone-1", streamType="photo_inspection")
+            assert (await rag_routes.analyze_realtime_stream(photo, db)).frameStatus == "analyzed"
+
+            stats = await rag_routes.get_stream_sampling_stats()
+            assert (stats["analyzed"], stats["skipped"]) == (3, 2)
+            print(f"✅ {len(server.requests)} vision calls for 5 frames: {stats['by_stream']}")
+        finally:
+            if saved_key is None:
+                os.environ.pop("OPENAI_API_KEY")
+            else:
+                os.environ["OPENAI_API_KEY"] = saved_key
+            rag_routes.request_vision_analysis = request_vision_analysis
+            vision_cache.max_entries = saved_size
+            stream_sampler.clear()
+            await restore()
+            await server.stop()
+            await db.close()
+            await engine.dispose()
+
+    assert frame_hash(make_frame()) == frame_hash(make_frame(brightness=5))
+    asyncio.run(run())
+
+
+def test_failed_analysis_is_reverted():
+    """Test 4: A frame whose vision call fails does not become the stream's reference"""
+    print("\n" + "="*60)
+    print("Test 4: Failed Analysis")
+    print("="*60)
+
+    sampler = StreamSampler(min_interval=2, max_interval=8)
+    view = 0xF0F0_F0F0_F0F0_F0F0
+    failed = sampler.decide("cam", view)
+    sampler.revert("cam", failed)
+    assert sampler.decide("cam", view).reason == "first_frame"
+    assert not sampler.decide("cam", view).analyze
+    # A later frame already replaced the reference: reverting the earlier one leaves it
+    age(sampler, "cam", 2)
+    earlier = sampler.decide("cam", view ^ 0xFF)
+    age(sampler, "cam", 2)
+    later = sampler.decide("cam", view ^ 0xFFFF)
+    sampler.revert("cam", earlier)
+    assert sampler._sessions["cam"].fingerprint == view ^ 0xFFFF and later.analyze
+    stats = sampler.stats()
+    assert (stats["analyzed"], stats["failed"]) == (2, 2)
+    print(f"✅ Failed frames reverted: {stats['by_stream']['cam']}")
+
+    async def run():
+        db, engine = await make_async_session()
+        analysis = {"detected_issues": [{"type": "漏水", "severity": "high"}], "confidence": 0.9}
+        completion = {"choices": [{"message": {"content": json.dumps(analysis)}}]}
+        # No route yet: the vision API answers 404
+        server = UpstreamServer({})
+        restore = use_upstreams("http://127.0.0.1:9", f"{await server.start()}/v1")
+        saved_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        saved_size, vision_cache.max_entries = vision_cache.max_entries, 0
+        stream_sampler.clear()
+
+        def frame():
+            return rag_routes.RealtimeStreamRequest(
+                frame=make_frame(), timestamp="2026-01-01T00:00:00", streamId="phone-1")
+
+        try:
+            response = await rag_routes.analyze_realtime_stream(frame(), db)
+            assert response.frameAnalysis["analysis_method"] == "sensor_fallback"
+
+            server.routes["/v1/chat/completions"] = (0, completion)
+            response = await rag_routes.analyze_realtime_stream(frame(), db)
+            assert response.frameStatus == "analyzed" and response.sampling["reason"] == "first_frame"
+            assert response.frameAnalysis["issues"][0]["type"] == "漏水"
+            assert (await rag_routes.analyze_realtime_stream(frame(), db)).frameStatus == "skipped"
+            assert len(server.requests) == 2 and stream_sampler.stats()["failed"] == 1
+            print("✅ The same view is analyzed again after the vision call failed")
+        finally:
+            if saved_key is None:
+                os.environ.pop("OPENAI_API_KEY")
+            else:
+                os.environ["OPENAI_API_KEY"] = saved_key
+            vision_cache.max_entries = saved_size
+            stream_sampler.clear()
+            await restore()
+            await server.stop()
+            await db.close()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all stream sampling tests"""
+    print("🧪 Stream Sampling Tests")
+    tests = [
+        test_still_view_backs_off,
+        test_change_and_anomaly_speed_up,
+        test_realtime_route_skips_frames,
+        test_failed_analysis_is_reverted,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,187 @@
+"""
+Test script for the vision analysis cache
+Near-identical frames from the realtime stream are answered from a cache
+keyed by perceptual hash, prompt and model instead of calling the vision API
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from PIL import Image, ImageDraw, ImageEnhance
+
+from api import rag_routes
+from services.vision_cache import VisionCache, cache_scope, frame_hash, vision_cache
+from test_http_clients import UpstreamServer, use_upstreams
+
+
+def make_frame(brightness: int = 0, shift: int = 0, quality: int = 80, shape: str = "wall") -> str:
+    """A base64 JPEG of a 640x480 scene; brightness, shift and quality mimic a hand-held camera"""
+    image = Image.linear_gradient("L").rotate(90).resize((640, 480)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    if shape == "wall":
+        draw.ellipse([200 + shift, 150, 420 + shift, 330], fill=(60, 50, 40))
+        draw.rectangle([40, 40, 160, 420], fill=(200, 190, 170))
+    else:
+        draw.rectangle([20, 300, 620, 460], fill=(250, 250, 250))
+        draw.polygon([(320, 20), (40, 280), (600, 280)], fill=(10, 10, 10))
+    image = ImageEnhance.Brightness(image).enhance(1 + brightness / 100)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_frame_hash():
+    """Test 1: Near-identical frames hash a few bits apart, different scenes far apart"""
+    print("\n" + "="*60)
+    print("Test 1: Perceptual Frame Hash")
+    print("="*60)
+
+    base = frame_hash(make_frame())
+    jitter = frame_hash("data:image/jpeg;base64," + make_frame(brightness=5, shift=30, quality=60))
+    other = frame_hash(make_frame(shape="roof"))
+    near, far = (base ^ jitter).bit_count(), (base ^ other).bit_count()
+    assert 0 < near <= 4 < far, (near, far)
+    assert frame_hash("not an image") is None and frame_hash(base64.b64encode(b"junk").decode()) is None
+    print(f"✅ Jittered frame {near} bits away, different scene {far} bits away")
+
+
+def test_lru_ttl_and_scope():
+    """Test 2: Entries are matched by distance within a scope, expire and are evicted LRU"""
+    print("\n" + "="*60)
+    print("Test 2: LRU, TTL and Scope")
+    print("="*60)
+
+    async def run():
+        cache = VisionCache(max_entries=2, ttl_seconds=60, max_distance=4)
+        scope = cache_scope("prompt v1", "gpt-4o-mini")
+        await cache.put(scope, 0b1111, {"n": 1})
+        assert await cache.get(scope, 0b1111) == {"n": 1}
+        assert await cache.get(scope, 0b1111 ^ 0b1000_0000_0111) == {"n": 1}
+        assert await cache.get(scope, 0xFF00) is None
+        assert await cache.get(cache_scope("prompt v2", "gpt-4o-mini"), 0b1111) is None
+        assert await cache.get(cache_scope("prompt v1", "gpt-4o"), 0b1111) is None
+
+        await cache.put(scope, 0xF0F0_0000, {"n": 2})
+        await cache.get(scope, 0b1111)
+        await cache.put(scope, 0x0F0F_0000_0000, {"n": 3})
+        assert await cache.get(scope, 0xF0F0_0000) is None, "least recently used entry kept"
+        assert await cache.get(scope, 0b1111) == {"n": 1}
+
+        cache.ttl_seconds = 0
+        await cache.put(scope, 0x1234_0000_0000_0000, {"n": 4})
+        assert await cache.get(scope, 0x1234_0000_0000_0000) is None
+        stats = cache.stats()
+        assert stats["near_hits"] == 1 and stats["evictions"] == 2
+        print(f"✅ {stats}")
+
+    asyncio.run(run())
+
+
+def test_disk_tier():
+    """Test 3: Analyses on disk survive a restart and expire by age"""
+    print("\n" + "="*60)
+    print("Test 3: Disk Tier")
+    print("="*60)
+
+    async def run(directory):
+        scope = cache_scope("prompt", "model")
+        await VisionCache(directory=directory).put(scope, 0xABCD, {"detected_issues": ["漏水"]})
+
+        restarted = VisionCache(directory=directory)
+        assert await restarted.get(scope, 0xABCD ^ 0b11) == {"detected_issues": ["漏水"]}
+        assert restarted.stats()["disk_hits"] == 1 and len(restarted) == 1
+        print(f"✅ Near-identical frame found on disk after a restart: {restarted.stats()['disk']}")
+
+        path = next(Path(directory).glob("*.json"))
+        old = time.time() - 3600
+        os.utime(path, (old, old))
+        assert await VisionCache(directory=directory).get(scope, 0xABCD) is None
+        assert not path.exists()
+        print("✅ Expired file removed on read")
+
+    directory = tempfile.mkdtemp(prefix="vision_cache_test_")
+    try:
+        asyncio.run(run(directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_realtime_frames_hit_cache():
+    """Test 4: A steady camera calls the vision API once, until the prompt or model changes"""
+    print("\n" + "="*60)
+    print("Test 4: Cached Frame Analysis")
+    print("="*60)
+
+    async def run():
+        analysis = {"detected_issues": [{"type": "漏水", "severity": "high"}], "confidence": 0.9}
+        completion = {"choices": [{"message": {"content": json.dumps(analysis)}}]}
+        server = UpstreamServer({"/v1/chat/completions": (0.2, completion)})
+        restore = use_upstreams("http://127.0.0.1:9", f"{await server.start()}/v1")
+        saved = {name: os.environ.get(name) for name in ("OPENAI_API_KEY", "OPENAI_VISION_MODEL")}
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        vision_cache.clear()
+        try:
+            started = time.perf_counter()
+            first = await rag_routes.analyze_image_with_openai(make_frame())
+            miss = time.perf_counter() - started
+            started = time.perf_counter()
+            second = await rag_routes.analyze_image_with_openai(make_frame(brightness=-4, shift=25, quality=70))
+            hit = time.perf_counter() - started
+            assert first == second == analysis and len(server.requests) == 1
+            # Callers get their own copy
+            second["detected_issues"].clear()
+            assert (await rag_routes.analyze_image_with_openai(make_frame()))["detected_issues"]
+            print(f"✅ Near-identical frame: {hit * 1000:.1f} ms from cache vs {miss * 1000:.1f} ms from the API")
+
+            await rag_routes.analyze_image_with_openai(make_frame(shape="roof"))
+            os.environ["OPENAI_VISION_MODEL"] = "gpt-4o"
+            await rag_routes.analyze_image_with_openai(make_frame())
+            assert len(server.requests) == 3
+            print(f"✅ New scene and new model each called the API: {vision_cache.stats()}")
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            vision_cache.clear()
+            await restore()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all vision cache tests"""
+    print("🧪 Vision Cache Tests")
+    tests = [
+        test_frame_hash,
+        test_lru_ttl_and_scope,
+        test_disk_tier,
+        test_realtime_frames_hit_cache,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
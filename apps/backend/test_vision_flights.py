@@ -0,0 +1,185 @@
+"""
+Test script for single-flight and fair queueing of vision calls
+Concurrent requests for the same frame share one vision call, and calls
+beyond the concurrency limit are admitted round-robin per client
+"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api import rag_routes
+from services.stream_sampler import stream_sampler
+from services.vision_cache import vision_cache
+from services.vision_flights import VisionFlights
+from test_async_database import make_async_session
+from test_http_clients import UpstreamServer, use_upstreams
+from test_vision_cache import make_frame
+
+
+def test_single_flight():
+    """Test 1: Concurrent runs of one key share a call that outlives its requesters"""
+    print("\n" + "="*60)
+    print("Test 1: Single Flight")
+    print("="*60)
+
+    async def run():
+        flights = VisionFlights(max_concurrency=4)
+        calls = []
+
+        async def call(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return {"value": value}
+
+        results = await asyncio.gather(*(flights.run("frame", "cam", lambda: call(1)) for _ in range(5)))
+        assert results == [{"value": 1}] * 5 and calls == [1]
+        assert flights.stats()["coalesced"] == 4 and flights.stats()["in_flight"] == 0
+        print(f"✅ 5 concurrent requests, {len(calls)} call")
+
+        # The first requester hangs up; the others still get the answer
+        first = asyncio.create_task(flights.run("frame", "cam", lambda: call(2)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.run("frame", "cam", lambda: call(3)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == {"value": 2} and calls == [1, 2]
+        print("✅ A cancelled requester does not cancel the shared call")
+
+        async def fail():
+            raise RuntimeError("upstream down")
+
+        outcomes = await asyncio.gather(*(flights.run("bad", "cam", fail) for _ in range(3)),
+                                        return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        await asyncio.gather(flights.run(None, "cam", lambda: call(4)), flights.run(None, "cam", lambda: call(5)))
+        assert calls[-2:] == [4, 5]
+        assert flights.stats()["active"] == 0
+        print("✅ Errors reach every requester; unkeyed calls are never shared")
+
+    asyncio.run(run())
+
+
+def test_fair_queueing():
+    """Test 2: Calls beyond the limit are admitted round-robin per client, or time out"""
+    print("\n" + "="*60)
+    print("Test 2: Fair Queueing")
+    print("="*60)
+
+    async def run():
+        flights = VisionFlights(max_concurrency=2, queue_timeout=0)
+        started, running, peak = [], 0, 0
+
+        async def call(name):
+            nonlocal running, peak
+            started.append(name)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+        burst = [flights.run(None, "burst", lambda i=i: call(f"burst{i}")) for i in range(6)]
+        tasks = [asyncio.ensure_future(run_call) for run_call in burst]
+        await asyncio.sleep(0.005)
+        assert flights.stats()["waiting_by_client"] == {"burst": 4}
+        tasks += [asyncio.ensure_future(flights.run(None, "other", lambda i=i: call(f"other{i}"))) for i in range(2)]
+        await asyncio.gather(*tasks)
+
+        assert peak == 2
+        assert started == ["burst0", "burst1", "burst2", "other0", "burst3", "other1", "burst4", "burst5"], started
+        print(f"✅ At most {peak} calls at once, admitted {started}")
+
+        flights.queue_timeout = 0.05
+        slow = [asyncio.ensure_future(flights.run(None, "cam", lambda: asyncio.sleep(0.2))) for _ in range(3)]
+        outcomes = await asyncio.gather(*slow, return_exceptions=True)
+        assert isinstance(outcomes[2], asyncio.TimeoutError) and outcomes[:2] == [None, None]
+        stats = flights.stats()
+        assert stats["timeouts"] == 1 and stats["waiting"] == 0 and stats["active"] == 0
+        print(f"✅ Waiting past the queue timeout gives up: {stats}")
+
+    asyncio.run(run())
+
+
+def test_duplicate_frames_share_vision_call():
+    """Test 3: Clients posting the same frame at once cause one vision API call"""
+    print("\n" + "="*60)
+    print("Test 3: Duplicate Frames")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        await db.close()
+        sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def analyze(request):
+            # One session per request, as get_async_db hands out
+            async with sessions() as request_db:
+                return await rag_routes.analyze_realtime_stream(request, request_db)
+
+        analysis = {"detected_issues": [{"type": "漏水", "severity": "high"}], "confidence": 0.9}
+        completion = {"choices": [{"message": {"content": json.dumps(analysis)}}]}
+        server = UpstreamServer({"/v1/chat/completions": (0.2, completion)})
+        restore = use_upstreams("http://127.0.0.1:9", f"{await server.start()}/v1")
+        saved_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        vision_cache.clear()
+        stream_sampler.clear()
+        try:
+            frame = make_frame()
+            requests = [
+                rag_routes.RealtimeStreamRequest(frame=frame, timestamp="2026-01-01T00:00:00", streamId=f"phone-{i}")
+                for i in range(5)
+            ]
+            responses = await asyncio.gather(*(analyze(r) for r in requests))
+            assert all(r.frameStatus == "analyzed" for r in responses)
+            assert all(r.frameAnalysis["issues"][0]["type"] == "漏水" for r in responses)
+            assert len(server.requests) == 1
+            # Each response owns its analysis
+            responses[0].frameAnalysis["issues"].clear()
+            assert responses[1].frameAnalysis["issues"]
+            stats = await rag_routes.get_vision_call_stats()
+            assert stats["coalesced"] >= 4
+            print(f"✅ 5 phones, {len(server.requests)} vision call: {stats}")
+        finally:
+            if saved_key is None:
+                os.environ.pop("OPENAI_API_KEY")
+            else:
+                os.environ["OPENAI_API_KEY"] = saved_key
+            vision_cache.clear()
+            stream_sampler.clear()
+            await restore()
+            await server.stop()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all vision call coalescing tests"""
+    print("🧪 Vision Call Coalescing Tests")
+    tests = [
+        test_single_flight,
+        test_fair_queueing,
+        test_duplicate_frames_share_vision_call,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,126 @@
+"""
+Test script for frame preprocessing before vision calls
+Frames are downscaled to VISION_MAX_EDGE, turned upright and re-encoded
+without EXIF before they are sent to the vision API
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from PIL import Image
+
+from api import rag_routes
+from services.vision_cache import vision_cache
+from services.vision_preprocess import prepare_frame
+from test_http_clients import UpstreamServer, use_upstreams
+
+
+def make_photo(size=(4032, 3024), image_format: str = "JPEG", orientation: int = 0) -> str:
+    """A base64 image; phone photos carry EXIF with an orientation and a GPS position"""
+    image = Image.effect_noise(size, 30).convert("RGB")
+    options = {"format": image_format}
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x8825] = {0x0001: "N", 0x0003: "E"}
+        options["exif"] = exif.tobytes()
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def open_data_url(data_url: str) -> Image.Image:
+    prefix, _, data = data_url.partition(",")
+    assert prefix == "data:image/jpeg;base64"
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+def test_prepare_frame():
+    """Test 1: Large frames are shrunk, turned upright and stripped; small clean ones pass through"""
+    print("\n" + "="*60)
+    print("Test 1: Prepare Frame")
+    print("="*60)
+
+    photo = make_photo(orientation=6)
+    prepared = prepare_frame("data:image/jpeg;base64," + photo, max_edge=1024, quality=80)
+    image = open_data_url(prepared.data_url)
+    assert image.size == (prepared.width, prepared.height) == (768, 1024)
+    assert "exif" not in image.info and not image.getexif()
+    assert prepared.bytes == len(base64.b64decode(prepared.data_url.split(",", 1)[1]))
+    assert prepared.bytes < prepared.source_bytes / 5
+    print(f"✅ 4032x3024 photo sent as 768x1024: {prepared.source_bytes // 1024} -> {prepared.bytes // 1024} KiB")
+
+    small = make_photo((640, 480))
+    assert prepare_frame(small, max_edge=1024).data_url.endswith(small)
+    print("✅ Small JPEG without metadata sent as it came")
+
+    unscaled = prepare_frame(make_photo((800, 600), orientation=3), max_edge=0)
+    assert (unscaled.width, unscaled.height) == (800, 600)
+    assert not open_data_url(unscaled.data_url).getexif()
+    png = prepare_frame(make_photo((2000, 1000), image_format="PNG"), max_edge=1024)
+    assert open_data_url(png.data_url).format == "JPEG" and (png.width, png.height) == (1024, 512)
+    assert prepare_frame("not an image") is None
+    print("✅ EXIF stripped at any size, PNG re-encoded as JPEG, garbage rejected")
+
+
+def test_vision_call_sends_prepared_frame():
+    """Test 2: The vision request carries the prepared frame"""
+    print("\n" + "="*60)
+    print("Test 2: Vision Call")
+    print("="*60)
+
+    async def run():
+        completion = {"choices": [{"message": {"content": json.dumps({"detected_issues": []})}}]}
+        server = UpstreamServer({"/v1/chat/completions": (0, completion)})
+        restore = use_upstreams("http://127.0.0.1:9", f"{await server.start()}/v1")
+        saved_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        vision_cache.clear()
+        try:
+            photo = make_photo(orientation=6)
+            assert await rag_routes.analyze_image_with_openai(photo) == {"detected_issues": []}
+            url = server.requests[0][2]["messages"][0]["content"][1]["image_url"]["url"]
+            image = open_data_url(url)
+            assert max(image.size) <= 1024 and not image.getexif()
+            print(f"✅ Sent {len(url) // 1024} KiB instead of {len(photo) // 1024} KiB")
+        finally:
+            if saved_key is None:
+                os.environ.pop("OPENAI_API_KEY")
+            else:
+                os.environ["OPENAI_API_KEY"] = saved_key
+            vision_cache.clear()
+            await restore()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all vision preprocessing tests"""
+    print("🧪 Vision Preprocessing Tests")
+    tests = [
+        test_prepare_frame,
+        test_vision_call_sends_prepared_frame,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
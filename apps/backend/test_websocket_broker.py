@@ -0,0 +1,216 @@
+"""
+Test script for multi-worker WebSocket fan-out
+Two ReadingBuses stand in for two uvicorn workers, joined by the Redis broker
+through a minimal in-process server speaking Redis pub/sub (RESP)
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from schemas.reading import StreamSubscription
+from services.broker import (Broadcast, InMemoryBroker, ReadingBatch, RedisBroker, create_broker,
+                             decode_event, encode_event)
+from services.connection_manager import ConnectionManager
+from services.reading_bus import ReadingBus
+from test_websocket_push import FakeWebSocket, make_reading, settle
+
+
+def resp(value) -> bytes:
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(resp(item) for item in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class PubSubServer:
+    """Just enough of Redis for pub/sub: SUBSCRIBE, UNSUBSCRIBE, PUBLISH and PING"""
+
+    def __init__(self):
+        self.channels = {}
+        self.published = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _command(self, reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _client(self, reader, writer):
+        subscribed = set()
+        try:
+            while (command := await self._command(reader)) is not None:
+                name = command[0].upper()
+                if name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        subscribed.add(channel)
+                        self.channels.setdefault(channel, set()).add(writer)
+                        writer.write(resp([b"subscribe", channel, len(subscribed)]))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in command[1:] or list(subscribed):
+                        subscribed.discard(channel)
+                        self.channels.get(channel, set()).discard(writer)
+                        writer.write(resp([b"unsubscribe", channel, len(subscribed)]))
+                elif name == b"PUBLISH":
+                    receivers = self.channels.get(command[1], set())
+                    for receiver in receivers:
+                        receiver.write(resp([b"message", command[1], command[2]]))
+                    self.published += 1
+                    writer.write(resp(len(receivers)))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                else:  # CLIENT SETINFO and other connection setup
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_event_codec():
+    """Test 1: Events survive the wire format and brokers are chosen by URL"""
+    print("\n" + "="*60)
+    print("Test 1: Event Codec")
+    print("="*60)
+
+    reading = make_reading(7, "co2", "roof_north")
+    batch = decode_event(encode_event(ReadingBatch([reading], {7: "s7"})))
+    assert batch == ReadingBatch([reading], {7: "s7"})
+    assert isinstance(batch.readings[0]["timestamp"], datetime)
+    assert decode_event(encode_event(Broadcast("frame", key="k"))) == Broadcast("frame", "k")
+    assert decode_event(encode_event("plain")) == Broadcast("plain")
+    print("✅ Reading batches and broadcasts round-trip")
+
+    assert isinstance(create_broker("memory"), InMemoryBroker)
+    assert isinstance(create_broker("redis://localhost:6379/0"), RedisBroker)
+    try:
+        create_broker("kafka://localhost")
+        assert False, "unsupported URL accepted"
+    except ValueError:
+        pass
+    print("✅ create_broker picks the backend from BROKER_URL")
+
+
+def test_cross_worker_fan_out():
+    """Test 2: A batch ingested on worker A reaches clients connected to worker B"""
+    print("\n" + "="*60)
+    print("Test 2: Cross-worker Fan-out")
+    print("="*60)
+
+    async def run():
+        server = PubSubServer()
+        url = await server.start()
+        workers = []
+        for _ in range(2):
+            bus, manager = ReadingBus(broker=RedisBroker(url, channel="test:stream")), ConnectionManager()
+            await bus.broker.start()
+            workers.append((bus, manager, asyncio.create_task(manager.consume(bus))))
+        (bus_a, manager_a, _), (bus_b, manager_b, _) = workers
+        client_a, client_b = FakeWebSocket(), FakeWebSocket()
+        await manager_a.connect(client_a)
+        await manager_b.connect(client_b)
+        await settle()
+        try:
+            readings = [make_reading(1, "co2", "roof_north"), make_reading(2, "humidity", "basement")]
+            bus_a.publish(ReadingBatch(readings, {1: "s1", 2: "s2"}))
+            bus_b.publish(Broadcast('{"type": "sensor_update"}', key="sensor_update:s1:status"))
+            await wait_for(lambda: len(client_a.sent) == 2 and len(client_b.sent) == 2)
+
+            for client in (client_a, client_b):
+                frames = sorted(client.sent, key=len, reverse=True)
+                assert [r["id"] for r in json.loads(frames[0])["data"]] == [1, 2]
+                assert json.loads(frames[1])["type"] == "sensor_update"
+            assert server.published == 2
+            print(f"✅ Both workers' clients got both events: A {bus_a.broker.stats()}")
+
+            # Subscriptions still apply to batches that arrive from another worker
+            manager_b.subscribe(client_b, StreamSubscription(types=["humidity"]))
+            bus_a.publish(ReadingBatch(readings, {1: "s1", 2: "s2"}))
+            await wait_for(lambda: len(client_b.sent) == 3)
+            assert [r["type"] for r in json.loads(client_b.sent[2])["data"]] == ["humidity"]
+            print("✅ Remote batches are routed by the receiving worker's subscriptions")
+        finally:
+            for bus, manager, consumer in workers:
+                consumer.cancel()
+                for websocket in list(manager.active_connections):
+                    manager.disconnect(websocket)
+                await bus.broker.stop()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_outbox_bounded():
+    """Test 3: Publishing never blocks, and an unreachable broker drops the oldest events"""
+    print("\n" + "="*60)
+    print("Test 3: Bounded Outbox")
+    print("="*60)
+
+    async def run():
+        broker = RedisBroker("redis://127.0.0.1:1/0", outbox_size=3)
+        bus = ReadingBus(broker=broker)
+        assert bus.publish_readings([]) is None
+        for i in range(5):
+            bus.publish(f"m{i}")
+        stats = bus.stats()["broker"]
+        assert stats["outbox"] == 3 and stats["dropped"] == 2
+        assert decode_event(broker._outbox.get_nowait()) == Broadcast("m2")
+        print(f"✅ {stats}")
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all WebSocket broker tests"""
+    print("🧪 WebSocket Broker Tests")
+    tests = [
+        test_event_codec,
+        test_cross_worker_fan_out,
+        test_outbox_bounded,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,325 @@
+"""
+Test script for event-driven WebSocket push
+Ingest publishes committed batches on the reading bus; the ConnectionManager fans them out
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import Response
+
+from api.sensor_routes import post_sensor_data
+from api import websocket_routes
+from api.websocket_routes import ConnectionManager, handle_client_message
+from schemas.reading import SensorDataBatch, StreamSubscription
+from services.reading_bus import ReadingBatch, ReadingBus, reading_bus
+from services.stream_codec import DeltaEncoder
+from services.subscription_index import SubscriptionIndex
+from test_async_database import make_async_session
+from test_sensor_ingest import count_statements, make_batch
+
+
+class FakeWebSocket:
+    """Records sent frames; optionally fails like a closed socket or blocks until released"""
+
+    def __init__(self, fail: bool = False, blocked: bool = False):
+        self.sent = []
+        self.fail = fail
+        self.closed = False
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+async def settle(rounds: int = 10):
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+def test_bus_fan_out():
+    """Test 1: Every subscriber gets each message; slow subscribers drop the oldest"""
+    print("\n" + "="*60)
+    print("Test 1: Bus Fan-out")
+    print("="*60)
+
+    async def run():
+        bus = ReadingBus(maxsize=3)
+        assert bus.publish_readings([object()]) is None  # nothing serialized without subscribers
+        fast, slow = bus.subscribe(), bus.subscribe()
+        for i in range(5):
+            bus.publish(f"m{i}")
+            await fast.get()
+        assert [slow.get_nowait() for _ in range(slow.qsize())] == ["m2", "m3", "m4"]
+        assert bus.stats()["dropped"] == 2
+        bus.unsubscribe(slow)
+        assert bus.publish("m5") == 1
+        print(f"✅ {bus.stats()}")
+
+    asyncio.run(run())
+
+
+def test_ingest_pushes_batch():
+    """Test 2: One ingest request reaches every client as a single serialized batch"""
+    print("\n" + "="*60)
+    print("Test 2: Ingest Push")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        manager = ConnectionManager()
+        clients = [FakeWebSocket() for _ in range(5)]
+        broken, picky = FakeWebSocket(fail=True), FakeWebSocket()
+        for client in clients + [broken, picky]:
+            await manager.connect(client)
+        manager.subscribe(picky, StreamSubscription(sensor_ids=["ble_test_001"]))
+        consumer = asyncio.create_task(manager.consume(reading_bus))
+        await asyncio.sleep(0)
+        try:
+            sensors, readings = make_batch(sensor_count=2, readings_per_sensor=3)
+            result = await post_sensor_data(SensorDataBatch(sensors=sensors, readings=readings), Response(), db)
+            counter = count_statements(engine.sync_engine)
+            await settle()
+            assert counter["statements"] == 0, "fan-out must not query the database"
+
+            frames = {client.sent[0] for client in clients if client.sent}
+            assert len(frames) == 1 and all(len(client.sent) == 1 for client in clients)
+            message = json.loads(frames.pop())
+            assert message["type"] == "new_readings"
+            assert [r["id"] for r in message["data"]] == result["reading_ids"]
+            assert message["data"][0]["calibration_json"] == {"offset": 0.1}
+            assert broken not in manager.active_connections
+            picked = json.loads(picky.sent[0])["data"]
+            assert [r["id"] for r in picked] == result["reading_ids"][3:]
+            print(f"✅ {len(message['data'])} readings pushed to {len(clients)} clients in one frame")
+        finally:
+            consumer.cancel()
+            await db.close()
+            await engine.dispose()
+        assert not reading_bus.has_subscribers
+
+    asyncio.run(run())
+
+
+def test_slow_consumers():
+    """Test 3: A stalled client neither delays others nor grows without bound"""
+    print("\n" + "="*60)
+    print("Test 3: Slow Consumers")
+    print("="*60)
+
+    async def run():
+        manager = ConnectionManager(queue_size=4, send_timeout=0.2)
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+        await manager.connect(fast)
+        await manager.connect(slow)
+
+        for i in range(10):
+            await manager.broadcast(f"reading {i}")
+            await manager.broadcast(f"sensor s1 v{i}", key="sensor_update:s1")
+            await settle(2)
+        assert fast.sent[-2:] == ["reading 9", "sensor s1 v9"] and len(fast.sent) == 20
+
+        # The slow client holds the frame it is sending plus the newest four
+        state = manager.active_connections[slow]
+        assert state.queued == 4 and state.dropped > 0 and state.coalesced > 0
+        metrics = manager.metrics(detail=True)
+        assert metrics["queued"] == 4 and metrics["max_lag_seconds"] > 0
+        assert len(metrics["connections"]) == 2
+        print(f"✅ Fast client got all 20 frames; slow client: {state.metrics()}")
+
+        slow.release.set()
+        await settle(50)
+        assert slow.sent[0] == "reading 0" and "sensor s1 v9" in slow.sent[1:]
+        assert not any(f"reading {i}" in slow.sent for i in range(1, 7))
+        print(f"✅ Slow client caught up with {slow.sent[1:]}")
+
+        # A client that stops reading entirely is timed out and closed
+        stuck = FakeWebSocket(blocked=True)
+        await manager.connect(stuck)
+        await manager.broadcast("ping")
+        await asyncio.sleep(0.3)
+        assert stuck not in manager.active_connections and stuck.closed
+        assert fast in manager.active_connections
+        print("✅ Stalled client disconnected after the send timeout")
+
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+
+    asyncio.run(run())
+
+
+def make_reading(pk: int, reading_type: str, location: str, seconds: float = 0):
+    return {"id": pk, "sensor_id": pk, "type": reading_type, "location": location, "value": 1.0,
+            "timestamp": datetime(2026, 3, 1, 12) + timedelta(seconds=seconds)}
+
+
+def test_subscription_routing():
+    """Test 4: Readings reach only the sockets whose subscriptions match"""
+    print("\n" + "="*60)
+    print("Test 4: Subscription Routing")
+    print("="*60)
+
+    index = SubscriptionIndex()
+    index.subscribe("everything", StreamSubscription())
+    index.subscribe("roof", StreamSubscription(location_prefixes=["roof"]))
+    index.subscribe("roof_too", StreamSubscription(location_prefixes=["roof"]))
+    index.subscribe("basement_co2", StreamSubscription(types=["co2"], location_prefixes=["basement", "cellar"]))
+    index.subscribe("one_sensor", StreamSubscription(sensor_ids=["s2"], min_interval=10))
+    for i in range(1000):
+        index.subscribe(f"other_{i}", StreamSubscription(sensor_ids=[f"elsewhere_{i}"], types=["co2"]))
+    assert index.group_count == 1004  # identical filters share a group
+
+    keys = {1: "s1", 2: "s2"}
+    readings = [
+        make_reading(1, "co2", "roof_north"),
+        make_reading(1, "co2", "basement_east"),
+        make_reading(2, "humidity", "basement_east"),
+        make_reading(2, "humidity", "basement_east", seconds=5),
+        make_reading(2, "co2", "cellar", seconds=12),
+    ]
+    routed = {frozenset(group.members): [r["id"] for r in rs] for group, rs in index.route(readings, keys)}
+    assert routed == {
+        frozenset({"everything"}): [1, 1, 2, 2, 2],
+        frozenset({"roof", "roof_too"}): [1],
+        frozenset({"basement_co2"}): [1, 2],
+        frozenset({"one_sensor"}): [2, 2],  # the reading 5s later is throttled
+    }, routed
+    print(f"✅ 5 readings routed to 4 of {index.group_count} groups")
+
+    index.remove("roof")
+    index.remove("roof_too")
+    assert not index.match("s1", "co2", "roof_north") - index.match("s1", "co2", "attic")
+    print("✅ Removing the last member unindexes a group")
+
+    async def run():
+        manager = websocket_routes.manager
+        roof, basement = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(roof)
+        await manager.connect(basement)
+        try:
+            reply = json.loads(handle_client_message(roof, json.dumps(
+                {"type": "subscribe", "location_prefixes": ["roof"]})))
+            assert reply["type"] == "subscribed" and reply["data"]["location_prefixes"] == ["roof"]
+            error = json.loads(handle_client_message(basement, json.dumps(
+                {"type": "subscribe", "min_interval": -1})))
+            assert error["type"] == "error"
+            assert handle_client_message(basement, "ping") is None
+
+            assert manager.route(ReadingBatch(readings, keys)) == 2
+            await settle()
+            assert [r["location"] for r in json.loads(roof.sent[0])["data"]] == ["roof_north"]
+            assert len(json.loads(basement.sent[0])["data"]) == 5
+
+            handle_client_message(roof, json.dumps({"type": "unsubscribe"}))
+            assert manager.subscriptions.group_of(roof) is manager.subscriptions.group_of(basement)
+        finally:
+            manager.disconnect(roof)
+            manager.disconnect(basement)
+        assert len(manager.subscriptions) == 0
+
+    asyncio.run(run())
+    print("✅ Subscribe messages change what each socket receives")
+
+
+def apply_deltas(state: dict, rows: list) -> list:
+    """What a compact-protocol client does with a reading_deltas frame"""
+    readings = []
+    for row in rows:
+        stream = (row["sensor_id"], row["type"])
+        reading = dict(state.get(stream, {}), **row)
+        if "dt" in row:
+            previous = datetime.fromisoformat(state[stream]["timestamp"])
+            reading["timestamp"] = (previous + timedelta(seconds=reading.pop("dt"))).isoformat()
+        state[stream] = reading
+        readings.append(reading)
+    return readings
+
+
+def test_compact_protocol():
+    """Test 5: Compact clients get batched deltas that rebuild the full readings"""
+    print("\n" + "="*60)
+    print("Test 5: Compact Protocol")
+    print("="*60)
+
+    readings = [make_reading(1, "co2", "roof", seconds=i) for i in range(4)]
+    readings += [make_reading(1, "humidity", "roof", seconds=i) for i in range(2)]
+    for i, reading in enumerate(readings):
+        reading.update(id=100 + i, value=float(i % 3), unit="ppm", confidence=0.9,
+                       calibration_json={"offset": 0.1}, extras_json={"battery": 90 - i // 3})
+
+    encoder = DeltaEncoder()
+    first = json.loads(encoder.encode(readings[:3]))
+    second = json.loads(encoder.encode(readings[3:]))
+    assert first["type"] == "reading_deltas"
+    assert set(first["data"][1]) == {"id", "sensor_id", "type", "value", "dt"}
+    state = {}
+    rebuilt = apply_deltas(state, first["data"]) + apply_deltas(state, second["data"])
+    expected = json.loads(json.dumps(readings, default=datetime.isoformat))
+    assert rebuilt == expected, rebuilt
+    full = sum(len(json.dumps(r, default=datetime.isoformat)) for r in readings)
+    print(f"✅ Deltas rebuild all {len(readings)} readings "
+          f"({len(json.dumps(first['data'] + second['data']))} vs {full} bytes)")
+
+    async def run():
+        manager = ConnectionManager()
+        plain, compact = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(plain)
+        await manager.connect(compact, compact=True, batch_ms=50)
+        for reading in readings:
+            manager.route(ReadingBatch([reading], {1: "s1"}))
+            await settle(2)
+        await asyncio.sleep(0.1)
+        assert len(plain.sent) == len(readings)
+        assert len(compact.sent) == 1, compact.sent
+        assert apply_deltas({}, json.loads(compact.sent[0])["data"]) == expected
+        metrics = manager.metrics()
+        assert metrics["compact_connections"] == 1
+        print(f"✅ {len(readings)} batches reached the compact client in one frame; "
+              f"{metrics['bytes_sent']} bytes sent in total")
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all WebSocket push tests"""
+    print("🧪 WebSocket Push Tests")
+    tests = [
+        test_bus_fan_out,
+        test_ingest_pushes_batch,
+        test_slow_consumers,
+        test_subscription_routing,
+        test_compact_protocol,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,196 @@
+"""
+Test script for write-behind ingest
+POST /api/sensor/data hands batches to the ingest buffer for group commit:
+with durability "buffered" it answers 202 with a batch id, with "group" it
+waits for the shared commit
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.sensor_routes import get_batch_status, post_sensor_data
+from schemas.reading import SensorDataBatch
+from services.ingest_buffer import IngestBuffer, ingest_buffer
+from services.reading_bus import reading_bus
+from test_async_database import make_async_session
+from test_sensor_ingest import make_batch
+from test_ws_ingest import count_readings
+
+
+async def use_buffer(durability: str, **settings):
+    """Point the shared buffer at a fresh database with the given settings; returns a restore callback"""
+    db, engine = await make_async_session()
+    await db.close()
+    saved = {name: getattr(ingest_buffer, name)
+             for name in ("session_factory", "durability", "batch_size", "flush_seconds", "max_pending")}
+    ingest_buffer.session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    ingest_buffer.durability = durability
+    for name, value in settings.items():
+        setattr(ingest_buffer, name, value)
+    ingest_buffer.start()
+
+    async def restore():
+        await ingest_buffer.stop()
+        for name, value in saved.items():
+            setattr(ingest_buffer, name, value)
+        await engine.dispose()
+
+    return restore
+
+
+def test_buffered_returns_202():
+    """Test 1: Buffered durability accepts with 202 and reports the outcome by batch id"""
+    print("\n" + "="*60)
+    print("Test 1: Buffered Ingest")
+    print("="*60)
+
+    async def run():
+        restore = await use_buffer("buffered", flush_seconds=0.05)
+        try:
+            sensors, readings = make_batch(sensor_count=2, readings_per_sensor=3)
+            response = Response()
+            accepted = await post_sensor_data(SensorDataBatch(sensors=sensors, readings=readings), response, None)
+            assert response.status_code == 202 and accepted["readings_accepted"] == 6
+            assert (await get_batch_status(accepted["batch_id"]))["status"] == "pending"
+            assert ingest_buffer.stats()["pending"] == 6
+
+            _, unknown = make_batch(sensor_count=3, readings_per_sensor=1)
+            rejected = await post_sensor_data(SensorDataBatch(sensors=sensors[:1], readings=unknown), Response(), None)
+
+            await asyncio.sleep(0.2)
+            committed = await get_batch_status(accepted["batch_id"])
+            assert committed["status"] == "committed" and len(committed["reading_ids"]) == 6
+            failed = await get_batch_status(rejected["batch_id"])
+            assert failed["status"] == "failed" and "not found" in failed["detail"]
+            assert await count_readings(ingest_buffer) == 6
+            print(f"✅ 202 then {committed['status']}; bad batch {failed['status']}: {failed['detail']}")
+
+            try:
+                await get_batch_status("missing")
+                assert False, "unknown batch id found"
+            except HTTPException as e:
+                assert e.status_code == 404
+        finally:
+            await restore()
+
+    asyncio.run(run())
+
+
+def test_group_commit():
+    """Test 2: Concurrent requests share one commit and still answer after it"""
+    print("\n" + "="*60)
+    print("Test 2: Group Commit")
+    print("="*60)
+
+    async def run():
+        restore = await use_buffer("group", flush_seconds=0.05)
+        try:
+            sensors, readings = make_batch(sensor_count=10, readings_per_sensor=2)
+            batches = [SensorDataBatch(sensors=[sensors[i]], readings=readings[i * 2:i * 2 + 2]) for i in range(10)]
+            flushes = ingest_buffer.flushes
+            results = await asyncio.gather(*(post_sensor_data(batch, Response(), None) for batch in batches))
+            assert all(len(r["reading_ids"]) == 2 and r["sensors_processed"] == 1 for r in results)
+            assert ingest_buffer.flushes - flushes == 1
+            assert await count_readings(ingest_buffer) == 20
+            print(f"✅ 10 requests answered after one group commit: {ingest_buffer.stats()}")
+        finally:
+            await restore()
+
+    asyncio.run(run())
+
+
+def test_queue_limits_and_drain():
+    """Test 3: A full queue sheds load with 503, and shutdown drains what was accepted"""
+    print("\n" + "="*60)
+    print("Test 3: Queue Limits and Drain")
+    print("="*60)
+
+    async def run():
+        restore = await use_buffer("buffered", flush_seconds=60, max_pending=5)
+        try:
+            sensors, readings = make_batch(sensor_count=1, readings_per_sensor=5)
+            accepted = await post_sensor_data(SensorDataBatch(sensors=sensors, readings=readings), Response(), None)
+            try:
+                await post_sensor_data(SensorDataBatch(sensors=sensors, readings=readings), Response(), None)
+                assert False, "full queue accepted a batch"
+            except HTTPException as e:
+                assert e.status_code == 503 and e.headers["Retry-After"] == "1"
+            stats = ingest_buffer.stats()
+            assert stats["pending"] == 5 and stats["oldest_pending_seconds"] > 0
+            print(f"✅ Full queue answered 503 at depth {stats['pending']}")
+
+            await ingest_buffer.stop()
+            assert (await get_batch_status(accepted["batch_id"]))["status"] == "committed"
+            stats = ingest_buffer.stats()
+            assert stats["pending"] == 0 and stats["max_flush_seconds"] >= stats["p50_flush_seconds"] > 0
+            print(f"✅ Shutdown drained the queue: {stats}")
+        finally:
+            await restore()
+
+    asyncio.run(run())
+
+    try:
+        IngestBuffer(durability="eventually")
+        assert False, "unknown durability accepted"
+    except ValueError:
+        pass
+
+
+def test_failing_listener():
+    """Test 4: A failing bus listener neither fails nor re-inserts a committed group"""
+    print("\n" + "="*60)
+    print("Test 4: Failing Listener")
+    print("="*60)
+
+    def broken(event):
+        raise TypeError("can't compare offset-naive and offset-aware datetimes")
+
+    async def run():
+        restore = await use_buffer("group", flush_seconds=0.05)
+        reading_bus.add_listener(broken)
+        errors, failed = reading_bus.listener_errors, ingest_buffer.failed
+        try:
+            sensors, readings = make_batch(sensor_count=4, readings_per_sensor=2)
+            batches = [SensorDataBatch(sensors=[sensors[i]], readings=readings[i * 2:i * 2 + 2]) for i in range(4)]
+            results = await asyncio.gather(*(post_sensor_data(batch, Response(), None) for batch in batches))
+            assert all(len(r["reading_ids"]) == 2 for r in results)
+            assert await count_readings(ingest_buffer) == 8
+            assert reading_bus.listener_errors > errors and ingest_buffer.failed == failed
+            print(f"✅ 4 requests committed once each despite {reading_bus.listener_errors - errors} listener error")
+        finally:
+            reading_bus.remove_listener(broken)
+            await restore()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all write-behind ingest tests"""
+    print("🧪 Write-behind Ingest Tests")
+    tests = [
+        test_buffered_returns_202,
+        test_group_commit,
+        test_queue_limits_and_drain,
+        test_failing_listener,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,283 @@
+"""
+Test script for the device ingest WebSocket
+Devices stream readings over one connection; the ingest buffer micro-batches
+submissions from every device into shared transactions and acks each one
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api import websocket_routes
+from models.reading import Reading
+from services.ingest_buffer import IngestBuffer, ingest_buffer
+from test_async_database import make_async_session
+from test_sensor_ingest import make_batch
+
+
+async def make_buffer(**kwargs):
+    db, engine = await make_async_session()
+    await db.close()
+    buffer = IngestBuffer(async_sessionmaker(engine, autoflush=False, expire_on_commit=False), **kwargs)
+    buffer.start()
+    return buffer, engine
+
+
+async def count_readings(buffer: IngestBuffer) -> int:
+    async with buffer.session_factory() as db:
+        return await db.scalar(select(func.count()).select_from(Reading))
+
+
+class FakeDevice:
+    """
+    A device connection: messages (text, bytes, or None to disconnect) are fed
+    to the server, replies recorded
+    """
+
+    def __init__(self, messages, fail_sends: bool = False):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        for message in messages:
+            self.incoming.put_nowait(message)
+        self.sent = []
+        self.fail_sends = fail_sends
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def receive(self) -> dict:
+        message = await self.incoming.get()
+        if message is None:
+            return {"type": "websocket.disconnect", "code": 1000}
+        if isinstance(message, bytes):
+            return {"type": "websocket.receive", "bytes": message}
+        return {"type": "websocket.receive", "text": message}
+
+    async def send_text(self, message: str):
+        if self.fail_sends:
+            raise RuntimeError("send failed")
+        self.sent.append(json.loads(message))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+def test_micro_batching():
+    """Test 1: Concurrent submissions from many devices share one transaction"""
+    print("\n" + "="*60)
+    print("Test 1: Micro-batching")
+    print("="*60)
+
+    async def run():
+        buffer, engine = await make_buffer(batch_size=100, flush_seconds=0.05)
+        try:
+            sensors, _ = make_batch(sensor_count=10, readings_per_sensor=0)
+            await (await buffer.submit(sensors, []))
+            futures = []
+            for device in range(10):
+                _, readings = make_batch(sensor_count=10, readings_per_sensor=1)
+                futures.append(await buffer.submit([], readings[device:device + 1] * 3))
+            results = await asyncio.gather(*futures)
+            ids = [i for result in results for i in result.reading_ids]
+            assert all(len(result.reading_ids) == 3 for result in results)
+            assert ids == sorted(ids) and len(set(ids)) == 30
+            assert await count_readings(buffer) == 30
+            stats = buffer.stats()
+            assert stats["flushes"] == 2 and stats["written"] == 30, stats
+            print(f"✅ 10 devices' submissions written in one transaction: {stats}")
+        finally:
+            await buffer.stop()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_bad_submission_fails_alone():
+    """Test 2: A rejected submission does not take its batch-mates down with it"""
+    print("\n" + "="*60)
+    print("Test 2: Failure Isolation")
+    print("="*60)
+
+    async def run():
+        buffer, engine = await make_buffer(batch_size=100, flush_seconds=0.05)
+        try:
+            sensors, readings = make_batch(sensor_count=2, readings_per_sensor=2)
+            _, unknown = make_batch(sensor_count=3, readings_per_sensor=1)
+            good = await buffer.submit(sensors, readings[:2])
+            bad = await buffer.submit([], unknown[2:])
+            later = await buffer.submit([], readings[2:])
+            assert len((await good).reading_ids) == 2 and len((await later).reading_ids) == 2
+            try:
+                await bad
+                assert False, "reading for an unknown sensor accepted"
+            except ValueError as e:
+                print(f"✅ Rejected alone: {e}")
+            assert await count_readings(buffer) == 4 and buffer.stats()["failed"] == 1
+        finally:
+            await buffer.stop()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_backpressure():
+    """Test 3: A full buffer holds submitters back until a flush makes room"""
+    print("\n" + "="*60)
+    print("Test 3: Backpressure")
+    print("="*60)
+
+    async def run():
+        buffer, engine = await make_buffer(batch_size=100, flush_seconds=0.2, max_pending=4)
+        try:
+            sensors, readings = make_batch(sensor_count=1, readings_per_sensor=6)
+            first = await buffer.submit(sensors, readings[:4])
+            assert buffer.saturated
+            blocked = asyncio.create_task(buffer.submit([], readings[4:]))
+            await asyncio.sleep(0.05)
+            assert not blocked.done(), "submit should wait while the buffer is full"
+            await first
+            second = await asyncio.wait_for(blocked, 1.0)
+            assert len((await second).reading_ids) == 2
+            print(f"✅ Second submission waited for the first flush: {buffer.stats()}")
+
+            # Shutdown writes whatever is still buffered
+            pending = await buffer.submit([], readings[:1])
+            await buffer.stop()
+            assert pending.done() and await count_readings(buffer) == 7
+            print("✅ stop() drained the buffer")
+        finally:
+            await buffer.stop()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_ingest_websocket():
+    """Test 4: The ingest endpoint acks each message in order, with errors in place"""
+    print("\n" + "="*60)
+    print("Test 4: Ingest WebSocket")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        await db.close()
+        default_factory = ingest_buffer.session_factory
+        ingest_buffer.session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        ingest_buffer.start()
+        try:
+            sensors, readings = make_batch(sensor_count=2, readings_per_sensor=3)
+            _, unknown = make_batch(sensor_count=3, readings_per_sensor=1)
+            device = FakeDevice([
+                json.dumps({"seq": 1, "sensors": [s.model_dump() for s in sensors],
+                            "readings": [r.model_dump() for r in readings[:3]]}, default=str),
+                "not json",
+                json.dumps({"seq": 2, "readings": [r.model_dump() for r in unknown[2:]]}, default=str),
+                json.dumps({"seq": 3, "readings": [r.model_dump() for r in readings[3:]]}, default=str),
+            ])
+            endpoint = asyncio.create_task(websocket_routes.websocket_sensor_ingest(device))
+            for _ in range(100):
+                if len(device.sent) == 4:
+                    break
+                await asyncio.sleep(0.02)
+            device.incoming.put_nowait(None)
+            await endpoint
+
+            replies = [(reply["type"], reply["data"]["seq"]) for reply in device.sent]
+            assert replies == [("ack", 1), ("error", None), ("error", 2), ("ack", 3)], replies
+            assert device.sent[0]["data"]["sensors_processed"] == 2
+            assert len(device.sent[3]["data"]["reading_ids"]) == 3
+            assert device.sent[3]["data"]["backpressure"] is False
+            print(f"✅ Replies in message order: {replies}")
+        finally:
+            await ingest_buffer.stop()
+            ingest_buffer.session_factory = default_factory
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_ingest_websocket_failures():
+    """Test 5: Binary frames get an error reply, and a dead acker ends the connection"""
+    print("\n" + "="*60)
+    print("Test 5: Ingest WebSocket Failures")
+    print("="*60)
+
+    async def run():
+        db, engine = await make_async_session()
+        await db.close()
+        default_factory = ingest_buffer.session_factory
+        default_in_flight = websocket_routes.INGEST_MAX_IN_FLIGHT
+        ingest_buffer.session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        ingest_buffer.start()
+        try:
+            sensors, readings = make_batch(sensor_count=2, readings_per_sensor=3)
+            message = json.dumps({"seq": 1, "sensors": [s.model_dump() for s in sensors],
+                                  "readings": [r.model_dump() for r in readings]}, default=str)
+            device = FakeDevice([b"\x00\x01", message])
+            endpoint = asyncio.create_task(websocket_routes.websocket_sensor_ingest(device))
+            for _ in range(100):
+                if len(device.sent) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            device.incoming.put_nowait(None)
+            await asyncio.wait_for(endpoint, timeout=5)
+            replies = [(reply["type"], reply["data"]["seq"]) for reply in device.sent]
+            assert replies == [("error", None), ("ack", 1)], replies
+            assert "text" in device.sent[0]["data"]["detail"]
+            print(f"✅ Binary frame rejected in place: {replies}")
+
+            # Acks cannot be sent, the queue fills up, and the device never disconnects
+            websocket_routes.INGEST_MAX_IN_FLIGHT = 1
+            messages = [json.dumps({"seq": seq, "readings": [r.model_dump() for r in readings[:1]]}, default=str)
+                        for seq in range(2, 12)]
+            device = FakeDevice(messages, fail_sends=True)
+            await asyncio.wait_for(websocket_routes.websocket_sensor_ingest(device), timeout=5)
+            assert device.close_code == 1011
+            assert not device.incoming.empty(), "Every message was read despite the dead acker"
+            print(f"✅ Dead acker closed the connection with {device.incoming.qsize()} messages unread")
+
+            # An idle device is dropped too, not left waiting on receive
+            device = FakeDevice([messages[0]], fail_sends=True)
+            await asyncio.wait_for(websocket_routes.websocket_sensor_ingest(device), timeout=5)
+            assert device.close_code == 1011
+            print("✅ Idle connection closed once its acker failed")
+        finally:
+            websocket_routes.INGEST_MAX_IN_FLIGHT = default_in_flight
+            await ingest_buffer.stop()
+            ingest_buffer.session_factory = default_factory
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    """Run all ingest WebSocket tests"""
+    print("🧪 Ingest WebSocket Tests")
+    tests = [
+        test_micro_batching,
+        test_bad_submission_fails_alone,
+        test_backpressure,
+        test_ingest_websocket,
+        test_ingest_websocket_failures,
+    ]
+    results = []
+    for test in tests:
+        try:
+            test()
+            results.append(True)
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            results.append(False)
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
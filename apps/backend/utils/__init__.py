@@ -1,3 +1,3 @@
-from .context_injection import build_sensor_context
+from .context_injection import build_sensor_context, build_sensor_context_async
 
-__all__ = ["build_sensor_context"]
+__all__ = ["build_sensor_context", "build_sensor_context_async"]
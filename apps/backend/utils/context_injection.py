@@ -1,5 +1,8 @@
 from sqlalchemy.orm import Session
-from services.readings_service import ReadingsService
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.readings_service import AsyncReadingsService, ReadingsService
+from services.reading_window import context_fields, reading_window
+from models.reading import READING_COLUMNS
 from schemas.reading import ReadingOut
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
@@ -9,69 +12,38 @@ def build_sensor_context(
     component: str,
     location_prefix: str,
     window_sec: int = 60,
-    db: Session = None
+    db: Session = None,
+    reading_type: Optional[str] = None,
+    limit: int = 50
 ) -> List[Dict[str, Any]]:
     """
     Build sensor context for Realtime integration.
-    Returns recent sensor readings as context for AI models.
+    Returns recent sensor readings as context for AI models, most recent first.
+    Answered from the reading window without a database query when it covers
+    window_sec; otherwise db is queried, with the filters applied in SQL.
     
     Args:
-        component: The component/system being analyzed (e.g., "roofing", "plumbing")
-        location_prefix: Location prefix to filter readings (e.g., "roof", "basement")
+        component: The component/system being analyzed (e.g., "roofing", "plumbing");
+            readings are not tagged with components, so it does not filter them
+        location_prefix: Only readings at locations containing this, case-insensitive (e.g., "roof", "basement")
         window_sec: Time window in seconds to look back for readings
         db: Database session
+        reading_type: Only readings of this type (e.g., "moisture_level")
+        limit: Maximum number of readings
     
     Returns:
         List of recent sensor readings formatted for AI context
     """
+    # Served from the in-memory window of recent readings when it reaches back far enough
+    if reading_window.covers(window_sec):
+        return reading_window.recent(location_prefix, window_sec, reading_type, limit)
+
     if not db:
         return []
     
     try:
-        # Calculate time window
-        since = datetime.utcnow() - timedelta(seconds=window_sec)
-        
-        # Initialize readings service
-        readings_service = ReadingsService(db)
-        
-        # Get recent readings
-        readings = readings_service.get_recent_readings(window_sec, limit=50)
-        
-        # Filter readings by location prefix if specified
-        if location_prefix:
-            readings = [
-                r for r in readings 
-                if location_prefix.lower() in r.location.lower()
-            ]
-        
-        # Format readings for AI context
-        context_readings = []
-        for reading in readings:
-            context_reading = {
-                "sensor_id": reading.sensor_id,
-                "type": reading.type,
-                "location": reading.location,
-                "value": reading.value,
-                "unit": reading.unit,
-                "confidence": reading.confidence,
-                "timestamp": reading.timestamp.isoformat(),
-                "age_seconds": (datetime.utcnow() - reading.timestamp).total_seconds()
-            }
-            
-            # Add calibration data if available
-            if reading.calibration_json:
-                context_reading["calibration"] = reading.calibration_json
-            
-            # Add extras data if available
-            if reading.extras_json:
-                context_reading["extras"] = reading.extras_json
-            
-            context_readings.append(context_reading)
-        
-        # Sort by timestamp (most recent first)
-        context_readings.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        return context_readings
+        readings = ReadingsService(db).get_recent_readings(window_sec, limit, location_prefix, reading_type)
+        return _context_rows(readings)
         
     except Exception as e:
         # Return empty context on error to avoid breaking the AI flow
@@ -79,6 +51,46 @@ def build_sensor_context(
         return []
 
 
+async def build_sensor_context_async(
+    component: str,
+    location_prefix: str,
+    window_sec: int = 60,
+    db: AsyncSession = None,
+    reading_type: Optional[str] = None,
+    limit: int = 50
+) -> List[Dict[str, Any]]:
+    """
+    build_sensor_context() for async routes: the database fallback runs on an
+    AsyncSession instead of blocking the event loop.
+    """
+    if reading_window.covers(window_sec):
+        return reading_window.recent(location_prefix, window_sec, reading_type, limit)
+
+    if not db:
+        return []
+
+    try:
+        readings = await AsyncReadingsService(db).get_recent_readings(window_sec, limit, location_prefix, reading_type)
+        return _context_rows(readings)
+
+    except Exception as e:
+        # Return empty context on error to avoid breaking the AI flow
+        print(f"Error building sensor context: {e}")
+        return []
+
+
+def _context_rows(readings: List[Any]) -> List[Dict[str, Any]]:
+    """Format readings for AI context"""
+    now = datetime.utcnow()
+    return [
+        {
+            **context_fields({column.name: getattr(reading, column.name) for column in READING_COLUMNS}),
+            "age_seconds": (now - reading.timestamp).total_seconds()
+        }
+        for reading in readings
+    ]
+
+
 def get_sensor_summary(
     component: str,
     location_prefix: str,
@@ -88,10 +100,12 @@ def get_sensor_summary(
     """
     Get a summary of sensor data for a specific component and location.
     Useful for providing high-level context to AI models.
+    Statistics cover every matching reading in the window and are aggregated
+    in the database.
     
     Args:
         component: The component/system being analyzed
-        location_prefix: Location prefix to filter readings
+        location_prefix: Only readings at locations containing this, case-insensitive
         window_sec: Time window in seconds
         db: Database session
     
@@ -103,42 +117,25 @@ def get_sensor_summary(
     
     try:
         readings_service = ReadingsService(db)
+        since = datetime.utcnow() - timedelta(seconds=window_sec)
         
-        # Get statistics
-        stats = readings_service.get_reading_stats()
-        
-        # Get recent readings for context
-        recent_readings = build_sensor_context(component, location_prefix, window_sec, db)
-        
-        # Group readings by type
-        readings_by_type = {}
-        for reading in recent_readings:
-            reading_type = reading["type"]
-            if reading_type not in readings_by_type:
-                readings_by_type[reading_type] = []
-            readings_by_type[reading_type].append(reading)
+        # Overall and per-type statistics for the location and window
+        stats = readings_service.get_reading_stats(location_prefix=location_prefix, since=since)
+        by_type = readings_service.get_reading_stats(
+            group_by=["type"], location_prefix=location_prefix, since=since
+        )
         
-        # Calculate summary statistics by type
         type_summaries = {}
-        for reading_type, readings in readings_by_type.items():
-            if readings:
-                values = [r["value"] for r in readings]
-                confidences = [r["confidence"] for r in readings]
-                
-                type_summaries[reading_type] = {
-                    "count": len(readings),
-                    "avg_value": sum(values) / len(values),
-                    "min_value": min(values),
-                    "max_value": max(values),
-                    "avg_confidence": sum(confidences) / len(confidences),
-                    "latest_reading": readings[0] if readings else None
-                }
+        for group in by_type["groups"]:
+            reading_type = group.pop("type")
+            latest = build_sensor_context(component, location_prefix, window_sec, db, reading_type, limit=1)
+            type_summaries[reading_type] = {**group, "latest_reading": latest[0] if latest else None}
         
         return {
             "component": component,
             "location_prefix": location_prefix,
             "window_seconds": window_sec,
-            "total_readings": len(recent_readings),
+            "total_readings": stats["count"],
             "readings_by_type": type_summaries,
             "overall_stats": stats,
             "timestamp": datetime.utcnow().isoformat()
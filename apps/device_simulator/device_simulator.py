@@ -17,6 +17,9 @@ Usage:
 
     # Custom backend URL
     python device_simulator.py --backend http://localhost:8000
+
+    # Stream over one WebSocket connection instead of an HTTP request per batch
+    python device_simulator.py --continuous --transport ws
 """
 
 import os
@@ -24,6 +27,7 @@ import sys
 import time
 import random
 import argparse
+import json
 import requests
 from datetime import datetime
 from typing import List, Dict, Any
@@ -31,14 +35,24 @@ from typing import List, Dict, Any
 # Default configuration
 DEFAULT_BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 DEFAULT_INTERVAL = 5  # seconds
+TRANSPORTS = ("http", "ws")
 
 
 class DeviceSimulator:
     """Simulates a home inspection device with multiple sensors"""
 
-    def __init__(self, backend_url: str = DEFAULT_BACKEND_URL):
+    def __init__(self, backend_url: str = DEFAULT_BACKEND_URL, transport: str = "http"):
         self.backend_url = backend_url.rstrip('/')
         self.api_url = f"{self.backend_url}/api/sensor/data"
+        self.ingest_url = self.backend_url.replace("http", "ws", 1) + "/api/ws/sensor/ingest"
+        self.transport = transport
+
+        # WebSocket ingest state: one connection, sensors sent once per connection
+        self._ws = None
+        self._seq = 0
+        self._sensors_sent = False
+        # Set when the backend's acks ask devices to slow down
+        self.slow_down = False
 
         # Define the three sensors as per project requirements
         self.sensors = [
@@ -133,6 +147,8 @@ class DeviceSimulator:
 
     def send_batch(self, batch: Dict[str, Any]) -> bool:
         """Send a batch of sensor data to the backend"""
+        if self.transport == "ws":
+            return self.send_batch_ws(batch)
         try:
             response = requests.post(
                 self.api_url,
@@ -150,6 +166,49 @@ class DeviceSimulator:
                 print(f"   Response: {e.response.text}")
             return False
 
+    def send_batch_ws(self, batch: Dict[str, Any]) -> bool:
+        """Send a batch over the ingest WebSocket, opening it if needed, and wait for its ack"""
+        try:
+            import websocket
+        except ImportError:
+            print("❌ The ws transport needs websocket-client: pip install websocket-client")
+            sys.exit(1)
+
+        try:
+            if self._ws is None:
+                self._ws = websocket.create_connection(self.ingest_url, timeout=10)
+                self._sensors_sent = False
+            self._seq += 1
+            message = {"seq": self._seq, "readings": batch["readings"]}
+            if not self._sensors_sent:
+                message["sensors"] = batch["sensors"]
+            self._ws.send(json.dumps(message))
+            reply = json.loads(self._ws.recv())
+        except (websocket.WebSocketException, OSError) as e:
+            print(f"❌ Error sending data: {e}")
+            self.close()
+            return False
+
+        data = reply.get("data", {})
+        if reply.get("type") != "ack":
+            print(f"❌ Batch {data.get('seq')} rejected: {data.get('detail')}")
+            return False
+        self._sensors_sent = True
+        self.slow_down = data.get("backpressure", False)
+        print(f"✅ Sent {data.get('readings_processed', 0)} readings (seq {data.get('seq')})")
+        if self.slow_down:
+            print("   Backend is busy; slowing down")
+        return True
+
+    def close(self):
+        """Close the ingest WebSocket, if open"""
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
     def test_connection(self) -> bool:
         """Test connection to backend"""
         try:
@@ -178,6 +237,7 @@ class DeviceSimulator:
 
         if self.send_batch(batch):
             print("\n✅ Successfully sent sensor data!")
+            self.close()
         else:
             print("\n❌ Failed to send sensor data")
             sys.exit(1)
@@ -185,7 +245,7 @@ class DeviceSimulator:
     def run_continuous(self, interval: int = DEFAULT_INTERVAL):
         """Run continuously, sending readings at specified interval"""
         print(f"\n📡 Device Simulator - Continuous mode (interval: {interval}s)")
-        print(f"   Backend: {self.backend_url}")
+        print(f"   Backend: {self.backend_url} ({self.transport})")
         print("=" * 60)
         print("Press Ctrl+C to stop\n")
 
@@ -199,14 +259,17 @@ class DeviceSimulator:
                 print(f"\n[{count}] Generating and sending sensor readings...")
                 batch = self.generate_batch()
                 
+                # Back off to twice the interval while the backend reports backpressure
+                delay = interval * 2 if self.slow_down else interval
                 if self.send_batch(batch):
-                    print(f"   Next reading in {interval} seconds...")
+                    print(f"   Next reading in {delay} seconds...")
                 else:
-                    print(f"   Retrying in {interval} seconds...")
+                    print(f"   Retrying in {delay} seconds...")
                 
-                time.sleep(interval)
+                time.sleep(delay)
         except KeyboardInterrupt:
             print("\n\n🛑 Stopped by user")
+            self.close()
             sys.exit(0)
 
 
@@ -224,6 +287,9 @@ Examples:
 
   # Custom interval and backend
   python device_simulator.py --continuous --interval 10 --backend http://localhost:8000
+
+  # Keep one WebSocket open instead of a request per batch
+  python device_simulator.py --continuous --transport ws
         """
     )
     parser.add_argument(
@@ -244,9 +310,16 @@ Examples:
         help=f"Backend API URL (default: {DEFAULT_BACKEND_URL})"
     )
 
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="http",
+        help="http: POST each batch; ws: stream batches over the ingest WebSocket (default: http)"
+    )
+
     args = parser.parse_args()
 
-    simulator = DeviceSimulator(backend_url=args.backend)
+    simulator = DeviceSimulator(backend_url=args.backend, transport=args.transport)
 
     if args.continuous:
         simulator.run_continuous(interval=args.interval)
@@ -1,5 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import BrowserCompatibilityCheck from './BrowserCompatibilityCheck';
+import { newStreamId } from '../services/streamId';
 
 interface RealtimeCameraStreamProps {
   onStreamAnalysis?: (analysis: any) => void;
@@ -58,6 +59,7 @@ const RealtimeCameraStream: React.FC<RealtimeCameraStreamProps> = ({
   const analysisIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const frameCaptureIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const isStreamingRef = useRef(false);
+  const streamIdRef = useRef(newStreamId()); // This camera's stream, for backend sampling and queueing
 
   // Start real-time camera stream
   const startRealtimeStream = async () => {
@@ -434,6 +436,7 @@ const RealtimeCameraStream: React.FC<RealtimeCameraStreamProps> = ({
         body: JSON.stringify({
           frame: base64Data,
           streamType: 'realtime_inspection',
+          streamId: streamIdRef.current,
           location: 'current_inspection_site',
           timestamp: new Date().toISOString(),
           quality: streamQuality
@@ -442,6 +445,11 @@ const RealtimeCameraStream: React.FC<RealtimeCameraStreamProps> = ({
 
       if (response.ok) {
         const analysis = await response.json();
+        if (analysis.frameStatus === 'skipped') {
+          // Same view as the last analyzed frame; its results stay on screen
+          console.log(`⏭️ Frame skipped (${analysis.sampling?.reason})`);
+          return;
+        }
         const result: StreamAnalysisResult = {
           timestamp: new Date().toISOString(),
           frameAnalysis: analysis.frameAnalysis || { objects: [], issues: [] },
@@ -1,4 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
+import { newStreamId } from '../services/streamId';
 
 interface DetectedIssue {
   id: string;
@@ -55,6 +56,7 @@ const iPhoneRealtimeStream: React.FC<iPhoneRealtimeStreamProps> = ({
   const issueIdCounter = useRef(0);
   const audioContextRef = useRef<AudioContext | null>(null);
   const isAnalyzingRef = useRef(false); // Use ref to track analyzing state in intervals
+  const streamIdRef = useRef(newStreamId()); // This camera's stream, for backend sampling and queueing
 
   // Start real-time stream using iPhone camera
   const startRealtimeStream = async () => {
@@ -432,6 +434,7 @@ const iPhoneRealtimeStream: React.FC<iPhoneRealtimeStreamProps> = ({
         body: JSON.stringify({
           frame: base64Data,
           streamType: 'realtime_inspection',
+          streamId: streamIdRef.current,
           location: 'current_inspection_site',
           timestamp: new Date().toISOString(),
           quality: streamQuality
@@ -443,6 +446,12 @@ const iPhoneRealtimeStream: React.FC<iPhoneRealtimeStreamProps> = ({
 
       if (response.ok) {
         const analysis = await response.json();
+        if (analysis.frameStatus === 'skipped') {
+          // Same view as the last analyzed frame; its results stay on screen
+          console.log(`⏭️ Frame skipped (${analysis.sampling?.reason})`);
+          setCurrentAnalysis('✅ 畫面無變化，沿用上次分析結果');
+          return;
+        }
         // Increment analysis count only when analysis succeeds
         setAnalysisCount(prev => {
           const newCount = prev + 1;
@@ -707,6 +716,7 @@ const iPhoneRealtimeStream: React.FC<iPhoneRealtimeStreamProps> = ({
         body: JSON.stringify({
           frame: base64Data,
           streamType: 'photo_inspection',
+          streamId: streamIdRef.current,
           location: 'current_inspection_site',
           timestamp: new Date().toISOString(),
           quality: streamQuality
@@ -862,7 +872,8 @@ const iPhoneRealtimeStream: React.FC<iPhoneRealtimeStreamProps> = ({
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          frame: base64
+          frame: base64,
+          streamId: streamIdRef.current
         })
       });
 
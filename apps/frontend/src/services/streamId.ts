@@ -0,0 +1,9 @@
+// Identifies one camera session to the backend, which samples frames and
+// queues vision calls per stream. crypto.randomUUID is only available in
+// secure contexts; phones reaching a LAN dev server over http fall back.
+export function newStreamId(): string {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}